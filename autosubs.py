@@ -0,0 +1,168 @@
+"""
+Scoring squads and transfer plans the way FPL does, with automatic substitutions, the vice captain and hits, without a solve.
+
+Each plan is a (num_gws, 15) array of player ids in FPL's pick order: the starting 11, then the bench goalkeeper, then
+the outfield bench in the order they come on. If a starter doesn't play, the bench goalkeeper replaces the goalkeeper,
+and each outfield bench player who played replaces the first starter who didn't that leaves a valid formation, in bench
+order. The captain's points are doubled, or the vice captain's if the captain doesn't play. Transfers beyond the free
+ones cost hit_cost points each, with a free transfer added each week and up to MAX_FREE_TRANSFERS rolled over.
+
+A player plays in a gameweek if their {gw}_mins column is more than 0, or if there is no minutes column, if their
+{gw}_pts column is more than 0. With realised points and minutes this scores a plan as it would have scored, and with
+projections it is a quick estimate that accounts for players who are expected to miss a gameweek:
+
+    points, table = evaluate(*plan_picks([optimiser.optimise(..., show=False)], df, gws), df, gws, current=current_team_IDs)
+
+Every plan is scored at once, with a handful of numpy operations on (num_plans * num_gws, 15) arrays per bench slot,
+so thousands of plans can be ranked in well under a second.
+"""
+import numpy as np
+import pandas as pd
+
+from model_builder import MAX_FREE_TRANSFERS, PlayerGroups
+from results import PlanResult
+from warm_start import MIN_STARTING
+
+
+def gameweek_data(df, gws):
+    """
+    returns the points of every player in each gameweek, and whether they played
+    :param df - DataFrame: the player data, with a {gw}_pts column and optionally a {gw}_mins column for each of gws
+    :param gws - list<int>: the gameweeks to score
+    returns float arrays of points and boolean arrays of whether they played, both of shape (num_players, len(gws))
+    """
+    pts = df[[f"{gw}_pts" for gw in gws]].to_numpy(dtype=float)
+    played = np.column_stack([df[f"{gw}_mins"].to_numpy() > 0 if f"{gw}_mins" in df.columns else pts[:, j] > 0 for j, gw in enumerate(gws)])
+    return pts, played
+
+
+def rows_of(df, ids):
+    """returns the row of df of every id in an array of player ids, with the same shape"""
+    rows = pd.Index(df.id).get_indexer(np.ravel(ids)).reshape(np.shape(ids))
+    assert (rows >= 0).all(), f"players {np.unique(np.asarray(ids)[rows < 0]).tolist()} are not in the data"
+    return rows
+
+
+def plan_picks(results, df, gws):
+    """
+    turns squads and plans into picks and captains for evaluate(), with the bench and the vice captain chosen by points
+    :param results - list<SquadResult or PlanResult>: the squads or plans. A squad is kept for every gameweek
+    :param df - DataFrame: the player data whose {gw}_pts columns order the bench and pick the vice captain
+    :param gws - list<int>: the gameweeks to score, which must all be in each plan
+    returns int arrays of the player ids of shape (len(results), len(gws), 15), and of the captain and vice captain
+    of shape (len(results), len(gws), 2)
+    """
+    pts, _ = gameweek_data(df, gws)
+    is_gk = PlayerGroups(df).pos_codes == 0
+    ids = df.id.to_numpy()
+    picks = np.zeros((len(results), len(gws), 15), dtype=np.int64)
+    captains = np.zeros((len(results), len(gws), 2), dtype=np.int64)
+    for k, result in enumerate(results):
+        for j, gw in enumerate(gws):
+            gameweek = result.gameweeks[gw] if isinstance(result, PlanResult) else result
+            start, bench = rows_of(df, gameweek.starting), rows_of(df, gameweek.bench)
+            bench = np.concatenate([bench[is_gk[bench]], bench[~is_gk[bench]][np.argsort(-pts[bench[~is_gk[bench]], j], kind="stable")]])
+            captain = rows_of(df, gameweek.captain)
+            others = start[start != captain]
+            picks[k, j] = ids[np.concatenate([start, bench])]
+            captains[k, j] = ids[captain], ids[others[np.argmax(pts[others, j])]]
+    return picks, captains
+
+
+def plan_hits(picks, current=None, free_transfers=1, wildcard=False):
+    """
+    counts the transfers and hits before each gameweek of every plan, as warm_start.transfer_hits does for one
+    :param picks - array<int>: the player ids of each plan's squads, of shape (num_plans, num_gws, 15)
+    :param current - array<int>: the ids of the current squad, or of each plan's current squad with shape (num_plans, 15).
+        If left blank, each plan's first squad is picked freely
+    returns int arrays of the transfers and the hits, both of shape (num_plans, num_gws)
+    """
+    num_plans, num_gws, _ = picks.shape
+    transfers = np.zeros((num_plans, num_gws), dtype=np.int64)
+    hits = np.zeros((num_plans, num_gws), dtype=np.int64)
+    previous = None if current is None else np.broadcast_to(current, (num_plans, 15))
+    free = np.full(num_plans, free_transfers)
+    for gw in range(num_gws):
+        if previous is not None:
+            transfers[:, gw] = 15 - (picks[:, gw, :, None] == previous[:, None, :]).sum(axis=(1, 2))
+        if previous is None or (gw == 0 and wildcard):
+            free[:] = 1
+        else:
+            hits[:, gw] = np.maximum(transfers[:, gw] - free, 0)
+            free = np.minimum(np.maximum(free - transfers[:, gw], 0) + 1, MAX_FREE_TRANSFERS)
+        previous = picks[:, gw]
+    return transfers, hits
+
+
+def gameweek_points(rows, captain_rows, pos_codes, pts, played):
+    """
+    scores every gameweek of every plan after automatic substitutions and the vice captain
+    :param rows - array<int>: the rows of each plan's picks in the player data, of shape (num_plans, num_gws, 15)
+    :param captain_rows - array<int>: the rows of the captain and vice captain, of shape (num_plans, num_gws, 2)
+    :param pos_codes - array<int>: the position code of every player, as in PlayerGroups
+    :param pts, played - array: the points of every player in each gameweek and whether they played, as returned by gameweek_data()
+    returns the points and the number of substitutions in each gameweek of each plan, both of shape (num_plans, num_gws)
+    """
+    num_plans, num_gws, _ = rows.shape
+    rows = rows.reshape(-1, 15)
+    gw = np.tile(np.arange(num_gws), num_plans)[:, None]
+    p, on, pos = pts[rows, gw], played[rows, gw], pos_codes[rows]
+    assert (pos[:, 11] == 0).all(), "the first player on the bench must be a goalkeeper"
+    in_11 = np.zeros(rows.shape, dtype=bool)
+    in_11[:, :11] = True
+    counts = np.stack([(pos[:, :11] == code).sum(axis=1) for code in range(len(MIN_STARTING))], axis=1)
+    plans = np.arange(len(rows))
+
+    # the bench goalkeeper can only replace the goalkeeper, who never affects the formation
+    keeper = np.argmax(pos[:, :11] == 0, axis=1)
+    swap = ~on[plans, keeper] & on[:, 11]
+    in_11[plans[swap], keeper[swap]] = False
+    in_11[swap, 11] = True
+
+    for slot in range(12, 15):
+        # a starter can be replaced by a player in the same position, or by anyone if it leaves enough in their position
+        absent = in_11[:, :11] & ~on[:, :11] & (pos[:, :11] != 0)
+        spare = np.take_along_axis(counts, pos[:, :11], axis=1) > MIN_STARTING[pos[:, :11]]
+        allowed = absent & ((pos[:, :11] == pos[:, slot, None]) | spare)
+        sub = np.flatnonzero(on[:, slot] & allowed.any(axis=1))
+        out = allowed[sub].argmax(axis=1)
+        in_11[sub, out] = False
+        in_11[sub, slot] = True
+        np.subtract.at(counts, (sub, pos[sub, out]), 1)
+        np.add.at(counts, (sub, pos[sub, slot]), 1)
+
+    # the captain's points are doubled if they play, and the vice captain's if not
+    captain_rows = captain_rows.reshape(-1, 2)
+    captain_on, vice_on = played[captain_rows[:, 0], gw[:, 0]], played[captain_rows[:, 1], gw[:, 0]]
+    doubled = np.where(captain_on, pts[captain_rows[:, 0], gw[:, 0]], np.where(vice_on, pts[captain_rows[:, 1], gw[:, 0]], 0))
+    points = (p * in_11).sum(axis=1) + doubled
+    return points.reshape(num_plans, num_gws), in_11[:, 11:].sum(axis=1).reshape(num_plans, num_gws)
+
+
+def evaluate(picks, captains, df, gws, current=None, free_transfers=1, wildcard=False, hit_cost=4):
+    """
+    scores squads and plans as FPL would, with automatic substitutions, the vice captain and hits
+    :param picks - array<int>: the player ids of each plan's squads in FPL's pick order, of shape (num_plans, num_gws, 15)
+    :param captains - array<int>: the ids of each gameweek's captain and vice captain, of shape (num_plans, num_gws, 2)
+    :param df - DataFrame: the player data, with a {gw}_pts column and optionally a {gw}_mins column for each of gws
+    :param gws - list<int>: the gameweeks that the plans cover
+    :param current, free_transfers, wildcard: the squad before the first gameweek and the transfers available, as in plan_hits()
+    :param hit_cost - float: the points that each hit costs
+    returns the points of each plan in each gameweek, before hits, and a dataframe with a row for each plan
+    """
+    picks, captains = np.asarray(picks), np.asarray(captains)
+    assert picks.shape[1:] == (len(gws), 15), "picks must have shape (num_plans, len(gws), 15)"
+    pts, played = gameweek_data(df, gws)
+    points, subs = gameweek_points(rows_of(df, picks), rows_of(df, captains), PlayerGroups(df).pos_codes, pts, played)
+    transfers, hits = plan_hits(picks, current, free_transfers, wildcard)
+
+    table = pd.DataFrame(
+        {
+            "total": points.sum(axis=1) - hit_cost * hits.sum(axis=1),
+            "points": points.sum(axis=1),
+            "transfers": transfers.sum(axis=1),
+            "hits": hits.sum(axis=1),
+            "subs": subs.sum(axis=1),
+        }
+    )
+    return points, table
@@ -0,0 +1,113 @@
+"""
+Times scoring many plans with autosubs.py against scoring them one at a time in python.
+
+usage: python benchmarks/autosub_scoring.py [num_plans] [num_gws] [num_players]
+
+Each plan keeps a random squad from a synthetic player pool, with a random formation, bench order, captain and
+vice captain each gameweek, and one in five players don't play in each gameweek. The plans are scored against a
+different current squad, so the first gameweek takes hits. loop_ms follows FPL's substitution rules one plan and
+gameweek at a time, and the script fails if it disagrees with autosubs.evaluate.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+import autosubs
+from model_builder import PlayerGroups
+from synthetic import gameweek_pool
+from warm_start import MIN_STARTING, SQUAD_COUNTS
+
+
+def timed(function, repeat=3):
+    """returns what function returns, and the fastest of repeat calls in milliseconds"""
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return result, best * 1000
+
+
+def random_plans(df, num_plans, num_gws, seed=0):
+    """returns random picks and captains in the format autosubs.evaluate takes"""
+    rng = np.random.default_rng(seed)
+    pos_rows = PlayerGroups(df).pos_rows
+    ids = df.id.to_numpy()
+    picks = np.zeros((num_plans, num_gws, 15), dtype=np.int64)
+    captains = np.zeros((num_plans, num_gws, 2), dtype=np.int64)
+    for k in range(num_plans):
+        squad = [rng.choice(pos_rows[pos], count, replace=False) for pos, count in zip("GDMF", SQUAD_COUNTS)]
+        for j in range(num_gws):
+            d, m = rng.integers(3, 6), rng.integers(2, 6)
+            while d + m > 9 or d + m < 7:
+                d, m = rng.integers(3, 6), rng.integers(2, 6)
+            counts = [1, d, m, 10 - d - m]
+            blocks = [rng.permutation(rows) for rows in squad]
+            start = np.concatenate([rows[:count] for rows, count in zip(blocks, counts)])
+            bench = np.concatenate([rows[count:] for rows, count in zip(blocks[1:], counts[1:])])
+            picks[k, j] = ids[np.concatenate([start, blocks[0][1:], rng.permutation(bench)])]
+            captains[k, j] = ids[rng.choice(start[1:], 2, replace=False)]
+    return picks, captains
+
+
+def loop_points(df, gws, picks, captains):
+    """scores each plan and gameweek in turn, following the substitution rules one player at a time"""
+    pts, played = autosubs.gameweek_data(df, gws)
+    pos = PlayerGroups(df).pos_codes
+    row_of = dict(zip(df.id, range(len(df))))
+    points = np.zeros(picks.shape[:2])
+    for k in range(len(picks)):
+        for j in range(len(gws)):
+            rows = [row_of[i] for i in picks[k, j]]
+            team, bench = rows[:11], rows[11:]
+            keeper = [pos[r] for r in team].index(0)
+            if not played[team[keeper], j] and played[bench[0], j]:
+                team[keeper] = bench[0]
+            for sub in bench[1:]:
+                if not played[sub, j]:
+                    continue
+                for s, starter in enumerate(team):
+                    if pos[starter] == 0 or played[starter, j]:
+                        continue
+                    changed = team[:s] + [sub] + team[s + 1 :]
+                    if all(sum(pos[r] == code for r in changed) >= MIN_STARTING[code] for code in range(4)):
+                        team = changed
+                        break
+            captain, vice = row_of[captains[k, j, 0]], row_of[captains[k, j, 1]]
+            doubled = captain if played[captain, j] else vice if played[vice, j] else None
+            points[k, j] = sum(pts[r, j] for r in team) + (pts[doubled, j] if doubled is not None else 0)
+    return points
+
+
+def main(num_plans, num_gws, num_players):
+    gws = list(range(1, num_gws + 1))
+    df = gameweek_pool(num_players, num_gws, first_gw=1, seed=0)
+    rng = np.random.default_rng(1)
+    for gw in gws:
+        df[f"{gw}_mins"] = np.where(rng.random(len(df)) < 0.2, 0, 90)
+    picks, captains = random_plans(df, num_plans, num_gws)
+    current = random_plans(df, 1, 1, seed=1)[0][0, 0]
+
+    (points, table), evaluate_ms = timed(lambda: autosubs.evaluate(picks, captains, df, gws, current=current))
+    looped = min(num_plans, 500)
+    expected, loop_ms = timed(lambda: loop_points(df, gws, picks[:looped], captains[:looped]), repeat=1)
+    loop_ms *= num_plans / looped
+    assert np.allclose(points[:looped], expected), "autosubs.evaluate differs from scoring each plan in turn"
+
+    result = pd.DataFrame(
+        [[num_plans, num_gws, evaluate_ms, loop_ms, num_plans / evaluate_ms * 1000, table.subs.mean(), table.hits.mean()]],
+        columns=["plans", "gws", "evaluate_ms", "loop_ms", "plans_per_s", "subs", "hits"],
+    )
+    result["speedup"] = result.loop_ms / result.evaluate_ms
+    print(f"{num_players} players, loop_ms estimated from {looped} plans")
+    print(result.to_string(index=False, float_format="%.2f"))
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [10000, 5, 600][len(args) :]))
@@ -0,0 +1,93 @@
+"""
+Checks that optimiser_B's branch and bound solver finds the same optimum as the mip solver on random player pools,
+and compares how long each takes.
+
+usage: python benchmarks/branch_and_bound.py [num_pools] [num_players]
+
+Each pool has random costs, and points that go up with cost, and is solved with a random budget, max_from_team,
+bench_strength and captain setting. The script fails if any pool's objective values differ.
+"""
+import contextlib
+import io
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import optimiser_B
+
+
+def random_pool(num_players, rng):
+    """returns a dataframe in the format of players_data.csv, with random costs and points"""
+    pos = rng.choice(["G", "D", "M", "F"], num_players, p=[0.1, 0.35, 0.38, 0.17])
+    cost = rng.integers(40, 126, num_players) / 10
+    points = np.round(rng.gamma(4, 1, num_players) * cost * 6)
+    return pd.DataFrame(
+        {
+            "id": np.arange(1, num_players + 1),
+            "team": rng.choice([f"Team {k}" for k in range(20)], num_players),
+            "pos": pos,
+            "name": [f"Player {k}" for k in range(num_players)],
+            "cost": cost,
+            "points": points,
+        }
+    )
+
+
+@contextlib.contextmanager
+def silenced():
+    """sends everything printed, including the solver's log, which is written straight to the file descriptor, to devnull"""
+    sys.stdout.flush()
+    saved, devnull = os.dup(1), os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            yield output
+    finally:
+        os.dup2(saved, 1)
+        os.close(saved)
+        os.close(devnull)
+
+
+def objective(squad, bench_strength):
+    """returns the objective value of a squad returned by optimiser_B, whose captain's points are already doubled"""
+    return (1 - bench_strength) * squad.iloc[:11].points.sum() + bench_strength * squad.iloc[11:].points.sum()
+
+
+def main(num_pools, num_players, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for pool in range(num_pools):
+        df = random_pool(num_players, rng)
+        params = {
+            "budget": float(rng.choice([85, 90, 95, 100])),
+            "max_from_team": int(rng.choice([2, 3])),
+            "bench_strength": float(rng.choice([0, 0.1, 0.3])),
+            "captain": bool(rng.choice([True, False])),
+        }
+        row = dict(pool=pool, **params)
+        for solver in ["mip", "branch_and_bound"]:
+            start = time.perf_counter()
+            with silenced() as output:
+                squad = optimiser_B.optimise(filepath=df, solver=solver, cache=False, **params).squad
+            row[f"{solver}_s"] = time.perf_counter() - start
+            row[solver] = objective(squad, params["bench_strength"])
+            nodes = re.search(r"searching (\d+) nodes", output.getvalue())
+            if nodes:
+                row["nodes"] = int(nodes.group(1))
+        rows.append(row)
+
+    result = pd.DataFrame(rows)
+    result["match"] = np.isclose(result.mip, result.branch_and_bound, rtol=1e-6)
+    print(result.to_string(index=False, float_format="%.4f"))
+    print(f"\n{result.match.sum()} of {num_pools} pools match")
+    assert result.match.all(), "the branch and bound solver didn't find the same optimum as the mip solver"
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [20, 400][len(args):]))
@@ -0,0 +1,66 @@
+"""
+Checks how close the heuristic solver's squads and lineups come to the mip solver's optimum on random player pools,
+and how long the heuristic takes.
+
+usage: python benchmarks/heuristic_gap.py [num_pools] [num_players]
+
+Each pool is a synthetic player pool with its own seed. optimiser_A picks its default lineup, and optimiser_B is solved
+with a random budget, max_from_team, bench_strength and captain setting. mip_ms and heuristic_ms are the times of the
+whole calls, so heuristic_ms includes solving the LP relaxation that the heuristic's gap is reported against. The script
+fails if any heuristic objective is less than MIN_RATIO of the optimum.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+import optimiser_A
+import optimiser_B
+from synthetic import players_pool
+from top_k import silenced
+
+# the heuristic is meant to find squads within 5% of the optimum
+MIN_RATIO = 0.95
+
+
+def timed(function):
+    """returns what function returns, and how long it took in milliseconds"""
+    start = time.perf_counter()
+    result = function()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main(num_pools, num_players, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for pool in range(num_pools):
+        df = players_pool(num_players, seed=pool)
+        params = {
+            "budget": float(rng.choice([85, 90, 95, 100])),
+            "max_from_team": int(rng.choice([2, 3])),
+            "bench_strength": float(rng.choice([0, 0.1, 0.3, 0.5])),
+            "captain": bool(rng.choice([True, False])),
+        }
+        for name, optimise, kwargs in [("A", optimiser_A.optimise, {}), ("B", optimiser_B.optimise, params)]:
+            row = dict(pool=pool, optimiser=name, **(params if kwargs else {}))
+            with silenced():
+                optimum, row["mip_ms"] = timed(lambda: optimise(filepath=df, show=False, cache=False, **kwargs))
+            with silenced():
+                heuristic, row["heuristic_ms"] = timed(lambda: optimise(filepath=df, solver="heuristic", show=False, cache=False, **kwargs))
+            row["mip"], row["heuristic"] = optimum.objective, heuristic.objective
+            rows.append(row)
+
+    result = pd.DataFrame(rows)
+    result["ratio"] = result.heuristic / result.mip
+    print(result.to_string(index=False, float_format="%.4f"))
+    print(f"\n{num_players} players: ratio min {result.ratio.min():.4f}, mean {result.ratio.mean():.4f}; heuristic_ms mean {result.heuristic_ms.mean():.0f}, max {result.heuristic_ms.max():.0f}")
+    assert (result.ratio >= MIN_RATIO).all(), f"the heuristic scored less than {MIN_RATIO:.0%} of the optimum on some pools"
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [10, 600][len(args):]))
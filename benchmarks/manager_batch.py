@@ -0,0 +1,86 @@
+"""
+Times optimising many managers with with_transfers/batch.py against calling optimiser.optimise for each of them.
+
+usage: python benchmarks/manager_batch.py [num_managers] [num_gws] [num_players] [formulation]
+
+Each manager has a random squad from the same synthetic player pool, with 1 or 2 free transfers. loop_s builds,
+loads and solves a model for each manager, and batch_s builds the model once and patches each manager into it.
+overhead_ms is how much longer each manager takes than its solve alone, and the script fails if the two ways
+disagree on any manager's objective.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [ROOT, os.path.join(ROOT, "with_transfers")]
+import batch
+import optimiser
+from synthetic import fake_squad, gameweek_pool
+from top_k import silenced
+
+
+def timed(function):
+    """returns what function returns, and how long it took in seconds"""
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def loop(squads, num_gws, df, free_transfers, formulation):
+    """optimises each manager in turn, returning their objectives"""
+    objectives = []
+    for user_id in squads.index:
+        with silenced():
+            plan = optimiser.optimise(
+                user_id,
+                num_gws,
+                free_transfers=free_transfers[user_id],
+                filepath=df,
+                assembly="sparse",
+                formulation=formulation,
+                max_hits=1,
+                squads=squads,
+                show=False,
+                cache=False,
+            )
+        objectives.append(plan.objective)
+    return np.array(objectives)
+
+
+def main(num_managers, num_gws, num_players, formulation):
+    df = gameweek_pool(num_players, num_gws, first_gw=2, seed=0)
+    squads = pd.concat([fake_squad(df, 1, user_id=user_id, seed=user_id) for user_id in range(1, num_managers + 1)])
+    free_transfers = {user_id: 1 + user_id % 2 for user_id in squads.index}
+
+    looped, loop_s = timed(lambda: loop(squads, num_gws, df, free_transfers, formulation))
+    with silenced():
+        (table, _), batch_s = timed(
+            lambda: batch.optimise_managers(
+                num_gws, squads=squads, free_transfers=free_transfers, filepath=df, formulation=formulation, max_hits=1, show=False
+            )
+        )
+    assert np.allclose(table.objective.to_numpy(), looped, atol=1e-4), "the batch and optimiser.optimise disagree on a plan"
+
+    solve_ms = table.seconds.mean() * 1000
+    result = pd.DataFrame(
+        [
+            ["loop", loop_s, loop_s / num_managers * 1000],
+            ["batch", batch_s, batch_s / num_managers * 1000],
+        ],
+        columns=["method", "total_s", "per_manager_ms"],
+    )
+    result["overhead_ms"] = result.per_manager_ms - solve_ms
+    print(f"{num_managers} managers, {num_gws} gameweeks, {num_players} players, {formulation} formulation, {os.cpu_count()} cores")
+    print(f"solve alone: {solve_ms:.1f} ms per manager")
+    print(result.to_string(index=False, float_format="%.2f"))
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    defaults = [50, 3, 400, "overlap"]
+    args = [int(arg) for arg in args[:3]] + args[3:]
+    main(*(args + defaults[len(args) :]))
@@ -0,0 +1,60 @@
+"""
+Compares building the with_transfers model one mip expression at a time against assembling it
+with numpy and loading it into the solver in bulk.
+
+usage: python benchmarks/model_assembly.py [filepath] [num_gws ...]
+
+The points columns in the csv are repeated as many times as needed to reach the longest horizon.
+Each model is built in a fresh process, so peak_mb is the growth in resident memory caused by that
+build alone, including memory allocated inside the solver.
+"""
+from multiprocessing import Pool
+import os
+import resource
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [ROOT, os.path.join(ROOT, "with_transfers")]
+from model_builder import PlayerGroups
+from optimiser_preseason import build_model
+
+
+def time_build(groups, value, pts, assembly):
+    """returns the wall time in seconds, the peak memory growth in MB and the size of one model"""
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    model, x, y, z = build_model(groups, value, pts, assembly=assembly)
+    elapsed = time.perf_counter() - start
+    peak = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) / 2 ** 10
+    return elapsed, peak, model.num_rows, model.num_cols
+
+
+def main(filepath, horizons):
+    df = pd.read_csv(filepath)
+    pts_cols = [col for col in df.columns if col.endswith("_pts")]
+    all_pts = df[pts_cols].to_numpy()
+    all_pts = np.tile(all_pts, (1, -(-max(horizons) // all_pts.shape[1])))
+    value = (df.cost if "cost" in df.columns else df.sale_value).to_numpy()
+    groups = PlayerGroups(df)
+
+    rows = []
+    for num_gws in horizons:
+        for assembly in ["expr", "sparse"]:
+            with Pool(1) as pool:
+                elapsed, peak, num_rows, num_cols = pool.apply(
+                    time_build, (groups, value, all_pts[:, :num_gws], assembly)
+                )
+            rows.append([num_gws, assembly, num_rows, num_cols, elapsed, peak])
+
+    result = pd.DataFrame(rows, columns=["gws", "assembly", "rows", "cols", "build_s", "peak_mb"])
+    print(result.to_string(index=False, float_format="%.3f"))
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    filepath = args.pop(0) if args and not args[0].isdigit() else os.path.join(ROOT, "with_transfers", "cleaned_data.csv")
+    main(filepath, [int(arg) for arg in args] or [1, 3, 5, 10])
@@ -0,0 +1,73 @@
+"""
+Compares loading player data from csv against memory-mapping the .npz file written alongside it.
+
+usage: python benchmarks/player_data.py [num_players] [num_gws]
+
+A file of random projections is written to a temporary directory in both formats. Each load runs
+in a fresh process, and takes the points for the first 5 gameweeks as an optimiser would, so
+peak_mb is the growth in resident memory caused by that load alone.
+"""
+from multiprocessing import Pool
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from player_data import read_players, save_players
+
+
+def random_players(num_players, num_gws, seed=0):
+    """returns a dataframe in the format of with_transfers/cleaned_data.csv, with random costs and points"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(
+        {
+            "id": np.arange(1, num_players + 1),
+            "team": rng.choice([f"Team {k}" for k in range(20)], num_players),
+            "pos": rng.choice(["G", "D", "M", "F"], num_players),
+            "name": [f"Player {k}" for k in range(num_players)],
+            "buy_cost": rng.integers(40, 130, num_players) / 10,
+        }
+    )
+    df["sale_value"] = df.buy_cost
+    pts = rng.gamma(1.5, 1.5, (num_players, num_gws)).round(3)
+    return pd.concat([df, pd.DataFrame(pts, columns=[f"{gw}_pts" for gw in range(1, num_gws + 1)])], axis=1)
+
+
+def time_load(filepath):
+    """returns the wall time in seconds and the peak memory growth in MB of loading a file and taking 5 gameweeks of points"""
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    df = read_players(filepath)
+    df[[f"{gw}_pts" for gw in range(1, 6)]].to_numpy()
+    elapsed = time.perf_counter() - start
+    peak = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) / 2 ** 10
+    return elapsed, peak
+
+
+def main(num_players, num_gws):
+    df = random_players(num_players, num_gws)
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        # different names, so that reading the csv doesn't pick up the .npz file next to it
+        csv, npz = os.path.join(tmp, "text.csv"), os.path.join(tmp, "columnar.npz")
+        df.to_csv(csv, float_format="%.3f", index=False)
+        save_players(df, npz)
+        for name, filepath in [("csv", csv), ("npz", npz)]:
+            with Pool(1) as pool:
+                elapsed, peak = pool.apply(time_load, (filepath,))
+            rows.append([name, os.path.getsize(filepath) / 2 ** 20, elapsed, peak])
+
+    result = pd.DataFrame(rows, columns=["format", "file_mb", "load_s", "peak_mb"])
+    print(f"{num_players} players, {num_gws} gameweeks")
+    print(result.to_string(index=False, float_format="%.3f"))
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [20000, 38][len(args):]))
@@ -0,0 +1,122 @@
+"""
+Compares a repeated optimise call answered from the result cache against solving it again, for all four optimisers.
+
+usage: python benchmarks/result_cache.py [num_players]
+
+A random player pool with 3 gameweeks of points is written to a temporary csv, and the results are kept in a temporary
+cache. Each optimiser is called twice with the same arguments, and the second call must return the same squads and print
+the same output as the first. The csv is then written again unchanged, which must still hit the cache, and with one
+player's points changed, which must miss it.
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "with_transfers"))
+import optimiser as optimiser_with_transfers
+import optimiser_A
+import optimiser_B
+import optimiser_preseason
+import result_cache
+from top_k import random_pool, silenced
+
+
+def gameweek_pool(num_players, gws):
+    """returns a random pool with a sale_value column and a points column for each gameweek, as in cleaned_data.csv"""
+    df = random_pool(num_players)
+    rng = np.random.default_rng(1)
+    df["sale_value"] = df.cost
+    for gw in gws:
+        df[f"{gw}_pts"] = np.round(df.points / 38 * rng.uniform(0.5, 1.5, num_players), 3)
+    return df
+
+
+def squad_of(df):
+    """returns a cheap squad that meets every rule, as fpl_api.fetch_squads would"""
+    picks, teams = [], {}
+    quota = {"G": 2, "D": 5, "M": 5, "F": 3}
+    for _, player in df.sort_values("cost").iterrows():
+        if quota[player.pos] and teams.get(player.team, 0) < 3:
+            quota[player.pos] -= 1
+            teams[player.team] = teams.get(player.team, 0) + 1
+            picks.append(int(player.id))
+    return pd.DataFrame([[1, 0.0] + picks], index=[1], columns=["gw", "bank"] + [f"pick_{k}" for k in range(1, 16)])
+
+
+def same(a, b):
+    """returns whether two results of an optimiser are the same"""
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(same(a[k], b[k]) for k in a)
+    if isinstance(a, pd.DataFrame):
+        return a.equals(b)
+    if isinstance(a, (list, tuple)):
+        return len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+    if isinstance(a, np.ndarray):
+        return np.array_equal(a, b)
+    if hasattr(a, "__dict__"):
+        return type(a) is type(b) and same(vars(a), vars(b))
+    return a == b
+
+
+def call(optimise, **params):
+    """returns what optimise returns, what it printed, and how long it took in milliseconds"""
+    out = io.StringIO()
+    start = time.perf_counter()
+    with silenced(), contextlib.redirect_stdout(out):
+        result = optimise(**params)
+    return result, out.getvalue(), (time.perf_counter() - start) * 1000
+
+
+def main(num_players):
+    df = gameweek_pool(num_players, range(2, 5))
+    squads = squad_of(df)
+    runs = {
+        "optimiser_A": (optimiser_A.optimise, {"budget": 83, "teamsize": 11}),
+        "optimiser_B": (optimiser_B.optimise, {}),
+        "with_transfers": (optimiser_with_transfers.optimise, {"user_id": 1, "num_gws": 3, "squads": squads}),
+        "optimiser_preseason": (optimiser_preseason.optimise, {"start_gw": 2, "end_gw": 4}),
+    }
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        result_cache.default_cache = result_cache.ResultCache(os.path.join(tmp, "results"))
+        filepath = os.path.join(tmp, "players_data.csv")
+        df.to_csv(filepath, index=False)
+        # the first model built loads the solver libraries, which shouldn't count towards the first solve
+        with silenced():
+            optimiser_B.optimise(filepath=df, cache=False)
+
+        for name, (optimise, params) in runs.items():
+            solved, solved_out, solve_ms = call(optimise, filepath=filepath, **params)
+            hit, hit_out, hit_ms = call(optimise, filepath=filepath, **params)
+            assert same(solved, hit) and solved_out == hit_out, f"{name}: the cached result differs from the solved one"
+            rows.append([name, solve_ms, hit_ms])
+
+        def stored():
+            return len(os.listdir(result_cache.default_cache.directory))
+
+        count = stored()
+        df.to_csv(filepath, index=False)
+        call(optimiser_B.optimise, filepath=filepath)
+        assert stored() == count, "re-saving the same data missed the cache"
+        df.loc[0, "points"] += 1
+        df.to_csv(filepath, index=False)
+        call(optimiser_B.optimise, filepath=filepath)
+        assert stored() == count + 1, "changing the data hit the cache"
+
+    result = pd.DataFrame(rows, columns=["optimiser", "solve_ms", "cached_ms"])
+    print(f"{num_players} players")
+    print(result.to_string(index=False, float_format="%.1f"))
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [600][len(args):]))
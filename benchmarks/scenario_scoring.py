@@ -0,0 +1,74 @@
+"""
+Times scoring candidate squads against points scenarios, as scenarios.evaluate does.
+
+usage: python benchmarks/scenario_scoring.py [num_scenarios] [num_budgets] [num_players]
+
+The candidates are the squads optimiser_B picks on a synthetic player pool for num_budgets budgets and 10 bench
+strengths, which is 100 squads by default. draw_ms is the time taken to draw the scenarios for every player who starts
+in one of them, weights_ms to build the matrix of how much each player counts towards each squad, and score_ms to
+score every squad in every scenario with one matrix product. loop_ms scores the same squads one at a time by summing
+their starters' columns, and the script fails if the two disagree.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+import optimiser_B
+import scenarios
+from synthetic import players_pool
+from top_k import silenced
+
+
+def timed(function, repeat=5):
+    """returns what function returns, and the fastest of repeat calls in milliseconds"""
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return result, best * 1000
+
+
+def loop_scores(draws, picked, results):
+    """scores each squad in turn, as the scores would be worked out without the weights matrix"""
+    row_of = pd.Index(picked)
+    scores = np.empty((len(draws), len(results)), dtype=np.float32)
+    for k, result in enumerate(results):
+        scores[:, k] = draws[:, row_of.get_indexer(result.starting), 0].sum(axis=1) + draws[:, row_of.get_loc(result.captain), 0]
+    return scores
+
+
+def main(num_scenarios, num_budgets, num_players):
+    df = players_pool(num_players)
+    with silenced():
+        results = [
+            optimiser_B.optimise(df, budget=budget, bench_strength=bench_strength, show=False, cache=False)
+            for budget in np.linspace(85, 100, num_budgets)
+            for bench_strength in np.linspace(0, 0.45, 10)
+        ]
+    picked = np.unique(np.concatenate([scenarios.starters(result) for result in results]))
+    players = df.set_index("id").loc[picked]
+
+    draws, draw_ms = timed(lambda: scenarios.draw(players[["points"]].to_numpy(dtype=float), scenarios.spread(players, ["points"]), num_scenarios))
+    (weights, penalty), weights_ms = timed(lambda: scenarios.squad_weights(results, picked, ["points"]))
+    scores, score_ms = timed(lambda: scenarios.score(draws, weights, penalty))
+    looped, loop_ms = timed(lambda: loop_scores(draws, picked, results))
+    assert np.allclose(scores, looped, rtol=1e-5), "the matrix product differs from scoring each squad in turn"
+
+    result = pd.DataFrame(
+        [[num_scenarios, len(results), len(picked), draw_ms, weights_ms, score_ms, loop_ms]],
+        columns=["scenarios", "squads", "players", "draw_ms", "weights_ms", "score_ms", "loop_ms"],
+    )
+    result["speedup"] = result.loop_ms / result.score_ms
+    print(f"{num_players} players")
+    print(result.to_string(index=False, float_format="%.2f"))
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [10000, 10, 600][len(args) :]))
@@ -0,0 +1,104 @@
+"""
+Compares running optimiser_B jobs through service.py against starting a new python process for each one.
+
+usage: python benchmarks/service.py [num_jobs] [num_players]
+
+A random player pool is written to a temporary csv. Each job is an optimiser_B call with a different budget.
+The cold run starts one python process per job, as a cron job shelling out to optimiser_B.py does. The service
+runs are sent over HTTP to a local service, one job at a time for latency, and then all at once with 1 worker and
+with one worker for every core for throughput.
+"""
+from http.server import ThreadingHTTPServer
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from service import Handler, JobQueue
+from top_k import random_pool, silenced
+
+COLD_JOB = "import optimiser_B; optimiser_B.optimise(filepath={filepath!r}, budget={budget}, cache=False)"
+
+
+def request(port, method, path, body=None):
+    """sends a request to the service and returns its json response"""
+    data = None if body is None else json.dumps(body).encode()
+    with urllib.request.urlopen(urllib.request.Request(f"http://127.0.0.1:{port}{path}", data=data, method=method)) as response:
+        return json.loads(response.read())
+
+
+def run_jobs(port, budgets):
+    """sends a job for each budget at once and waits for them all, returning the total points of every result"""
+    ids = [request(port, "POST", "/jobs", {"optimiser": "B", "params": {"budget": budget, "cache": False}})["id"] for budget in budgets]
+    points = []
+    for job_id in ids:
+        while (status := request(port, "GET", f"/jobs/{job_id}"))["status"] in ["queued", "running"]:
+            time.sleep(0.005)
+        assert status["status"] == "done", status.get("error")
+        points.append(status["result"]["points"])
+    return points
+
+
+def with_service(filepath, processes, run):
+    """starts a service on a free port, calls run with the port, and returns what it returns"""
+    with silenced():
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        server.queue, server.quiet = JobQueue({"B": filepath}, processes, max_queue=1000), True
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        return run(server.server_address[1])
+    finally:
+        server.shutdown()
+        server.server_close()
+        server.queue.close()
+
+
+def main(num_jobs, num_players):
+    budgets = [90 + k * 10 / num_jobs for k in range(num_jobs)]
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        filepath = os.path.join(tmp, "players_data.csv")
+        random_pool(num_players).to_csv(filepath, index=False)
+
+        start = time.perf_counter()
+        for budget in budgets:
+            subprocess.run([sys.executable, "-c", COLD_JOB.format(filepath=filepath, budget=budget)], cwd=ROOT,
+                           check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        rows.append(["new process per job", 1, time.perf_counter() - start])
+
+        def one_at_a_time(port):
+            start = time.perf_counter()
+            points = [run_jobs(port, [budget])[0] for budget in budgets]
+            return time.perf_counter() - start, points
+
+        seconds, expected = with_service(filepath, 1, one_at_a_time)
+        rows.append(["service, one job at a time", 1, seconds])
+
+        for processes in sorted({1, os.cpu_count()}):
+            def all_at_once(port):
+                start = time.perf_counter()
+                points = run_jobs(port, budgets)
+                return time.perf_counter() - start, points
+
+            seconds, points = with_service(filepath, processes, all_at_once)
+            assert points == expected, "the service's results changed with the number of workers"
+            rows.append(["service, all at once", processes, seconds])
+
+    result = pd.DataFrame(rows, columns=["run", "workers", "seconds"])
+    result["ms_per_job"] = result.seconds / num_jobs * 1000
+    print(f"{num_jobs} jobs, {num_players} players")
+    print(result.to_string(index=False, float_format="%.3f"))
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [20, 600][len(args):]))
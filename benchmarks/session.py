@@ -0,0 +1,97 @@
+"""
+Compares a run of what-if queries answered by one OptimiserSession against calling optimiser_B.optimise for each.
+
+usage: python benchmarks/session.py [num_players]
+
+Each query changes one thing from the one before it. overhead_ms is the time of each query less the time spent in
+the solver. The script fails if the session and optimiser_B disagree on any query's objective value.
+"""
+import os
+import sys
+import time
+
+import mip
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import optimiser_B
+from session import OptimiserSession
+from top_k import random_pool, silenced
+
+QUERIES = [
+    ("base", {}),
+    ("budget 90", {"budget": 90}),
+    ("lock a player", {"in_team": [1]}),
+    ("bench_strength 0.3", {"bench_strength": 0.3}),
+    ("DEF 4", {"DEF": 4}),
+    ("ban a team", {"banned_teams": ["Team 0"]}),
+    ("no captain", {"captain": False}),
+    ("max_from_team 2", {"max_from_team": 2}),
+    ("ban a player", {"out_team": [2]}),
+]
+
+
+def timed_solves():
+    """returns a function that returns the total time spent in Model.optimize since it was last called"""
+    spent = [0]
+    optimize = mip.Model.optimize
+
+    def timed_optimize(model, *args, **kwargs):
+        start = time.perf_counter()
+        result = optimize(model, *args, **kwargs)
+        spent[0] += time.perf_counter() - start
+        return result
+
+    mip.Model.optimize = timed_optimize
+
+    def take():
+        seconds, spent[0] = spent[0], 0
+        return seconds
+
+    return take
+
+
+def main(num_players):
+    df = random_pool(num_players)
+    solve_time = timed_solves()
+    with silenced():
+        session = OptimiserSession(df)
+    edits = {
+        "budget": session.set_budget,
+        "in_team": session.lock,
+        "bench_strength": session.set_bench_strength,
+        "DEF": lambda DEF: session.set_formation(DEF=DEF),
+        "banned_teams": session.ban_teams,
+        "captain": session.set_captain,
+        "max_from_team": session.set_max_from_team,
+        "out_team": session.ban,
+    }
+
+    rows, params = [], {}
+    for name, change in QUERIES:
+        params.update(change)
+        solve_time()
+        start = time.perf_counter()
+        for param, value in change.items():
+            edits[param](value)
+        result = session.solve()
+        session_s, session_solve_s = time.perf_counter() - start, solve_time()
+
+        start = time.perf_counter()
+        with silenced():
+            squad = optimiser_B.optimise(filepath=df, cache=False, **params).squad
+        optimise_s, optimise_solve_s = time.perf_counter() - start, solve_time()
+
+        bench_strength = params.get("bench_strength", 0.1)
+        objective = (1 - bench_strength) * squad.points.iloc[:11].sum() + bench_strength * squad.points.iloc[11:].sum()
+        assert abs(objective - result.objective) < 1e-6, f"{name}: the session found {result.objective}, optimiser_B found {objective}"
+        rows.append([name, session_s, (session_s - session_solve_s) * 1000, optimise_s, (optimise_s - optimise_solve_s) * 1000])
+
+    result = pd.DataFrame(rows, columns=["query", "session_s", "session_overhead_ms", "optimise_s", "optimise_overhead_ms"])
+    print(f"{num_players} players")
+    print(result.to_string(index=False, float_format="%.3f"))
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [600][len(args):]))
@@ -0,0 +1,70 @@
+"""
+Compares reading a solved plan one python-mip variable at a time against reading the whole solution at once.
+
+usage: python benchmarks/solution_read.py [num_players] [num_gws ...]
+
+Each horizon's optimiser_preseason model is built on a synthetic player pool, with every squad fixed to one the heuristic
+picks, so that the solver quickly has a solution to read. per_var_ms reads the squad, starting 11 and
+captain with a .x call for each variable, as the optimisers used to, and bulk_ms reads them with results.read_binary.
+result_ms is the time results.plan_result takes to turn the arrays into a PlanResult, and frames_ms the time its
+squad dataframes take to build, which only happens when the plan is printed or its squads are used.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [ROOT, os.path.join(ROOT, "with_transfers")]
+from model_builder import PlayerGroups
+from optimiser_preseason import build_model, held_plan
+from results import columns, plan_result, read_binary
+from synthetic import gameweek_pool
+from top_k import silenced
+
+
+def timed(function, repeat=5):
+    """returns what function returns, and the fastest of repeat calls in milliseconds"""
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return result, best * 1000
+
+
+def main(num_players, horizons):
+    rows = []
+    for num_gws in horizons:
+        df = gameweek_pool(num_players, num_gws, first_gw=1, seed=0)
+        df["cost"] = df.sale_value
+        groups = PlayerGroups(df)
+        value = df.cost.to_numpy()
+        pts = df[[f"{1 + gw}_pts" for gw in range(num_gws)]].to_numpy()
+        model, x, y, z = build_model(groups, value, pts, assembly="sparse")
+        model.verbose = 0
+        for var, held in zip(np.ravel(x), held_plan(groups, value, pts).ravel()):
+            var.lb = var.ub = float(held)
+        with silenced():
+            model.optimize()
+        assert model.num_solutions > 0, f"no solution was found for {num_gws} gameweeks"
+
+        cols = [columns(var) for var in (x, y, z)]
+        per_var, per_var_ms = timed(lambda: [np.array([[v.x > 0.5 for v in row] for row in var]) for var in (x, y, z)])
+        bulk, bulk_ms = timed(lambda: read_binary(model, *cols))
+        assert all((a == b).all() for a, b in zip(per_var, bulk)), "the bulk read differs from reading each variable"
+        result, result_ms = timed(lambda: plan_result(df, 1, *bulk, model.objective_value, "cost"))
+        _, frames_ms = timed(lambda: [gameweek.squad for gameweek in plan_result(df, 1, *bulk, 0, "cost").gameweeks.values()], repeat=1)
+        rows.append([num_gws, model.num_cols, per_var_ms, bulk_ms, result_ms, frames_ms])
+
+    result = pd.DataFrame(rows, columns=["gws", "cols", "per_var_ms", "bulk_ms", "result_ms", "frames_ms"])
+    result["speedup"] = result.per_var_ms / result.bulk_ms
+    print(f"{num_players} players")
+    print(result.to_string(index=False, float_format="%.2f"))
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(args[0] if args else 600, args[1:] or [5, 19, 38])
@@ -0,0 +1,170 @@
+"""
+Times every optimiser on synthetic player pools of several sizes and horizons, and compares the times against a stored baseline.
+
+usage:
+    python benchmarks/suite.py --save                  runs the matrix and stores the results as the baseline
+    python benchmarks/suite.py                         runs the matrix and compares it against the baseline
+    python benchmarks/suite.py --players 300 600 --gws 1 3 5 --teams 20 --optimisers B with_transfers
+
+optimiser_A and optimiser_B are run once for each number of players, and with_transfers/optimiser.py and
+optimiser_preseason once for each number of players and gameweeks, with a fake current squad for the former.
+Every run happens in a fresh process that has already loaded the solver, with the result cache turned off, and its
+build and solve times come from the run's profiling record. peak_mb is the growth in resident memory during the run.
+No network is needed.
+
+A case has regressed if its build time, solve time or peak memory is more than --threshold above the baseline, and by
+more than a small absolute amount, so that noise in very short runs isn't reported. A case whose objective value has
+changed is also reported, as the data is the same every time. The script exits with status 1 if anything has regressed.
+"""
+from multiprocessing import Pool
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [ROOT, os.path.join(ROOT, "with_transfers")]
+from synthetic import fake_squad, gameweek_pool, players_pool
+from top_k import silenced
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+OPTIMISERS = ["A", "B", "with_transfers", "preseason"]
+METRICS = ["build_s", "solve_s", "peak_mb"]
+# differences smaller than these are never counted as regressions
+NOISE = {"build_s": 0.025, "solve_s": 0.05, "peak_mb": 10}
+
+
+def _start_worker():
+    """worker initialiser - imports the optimisers and loads the solver, so that neither counts towards the first run"""
+    from mip import Model
+    import optimiser, optimiser_A, optimiser_B, optimiser_preseason
+
+    Model()
+
+
+def run_case(optimiser, filepath, params):
+    """runs one optimiser in the worker, returning its build and solve times, peak memory growth and objective value"""
+    import optimiser as optimiser_with_transfers
+    import optimiser_A
+    import optimiser_B
+    import optimiser_preseason
+    import profiling
+
+    optimise = {
+        "A": optimiser_A.optimise,
+        "B": optimiser_B.optimise,
+        "with_transfers": optimiser_with_transfers.optimise,
+        "preseason": optimiser_preseason.optimise,
+    }[optimiser]
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with profiling.profiled() as records, silenced():
+        optimise(filepath=filepath, cache=False, **params)
+    record = records[0]
+    phases = record["phases"]
+    return {
+        "build_s": phases["build"]["wall_s"],
+        "solve_s": phases["solve"]["wall_s"],
+        "total_s": record["wall_s"],
+        "peak_mb": (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) / 2**10,
+        # the last solve is the model itself rather than a bound, except for the windows of a rolling horizon
+        "objective": [solve["objective"] for solve in record["solves"] if not solve.get("relax")][-1],
+    }
+
+
+def cases(optimisers, players, gws, teams, seed, tmp):
+    """writes the synthetic data for every case to tmp, and yields the case's key, optimiser, data file and arguments"""
+    for num_players in players:
+        if {"A", "B"} & set(optimisers):
+            filepath = os.path.join(tmp, f"players_{num_players}.csv")
+            players_pool(num_players, teams, seed).to_csv(filepath, index=False)
+            if "A" in optimisers:
+                yield ("A", num_players, None), "A", filepath, {"budget": 83, "teamsize": 11}
+            if "B" in optimisers:
+                yield ("B", num_players, None), "B", filepath, {}
+
+        for num_gws in gws:
+            df = gameweek_pool(num_players, num_gws, teams, first_gw=2, seed=seed)
+            filepath = os.path.join(tmp, f"gameweeks_{num_players}_{num_gws}.csv")
+            df.to_csv(filepath, index=False)
+            if "with_transfers" in optimisers:
+                squads = fake_squad(df, gw=1, seed=seed)
+                yield ("with_transfers", num_players, num_gws), "with_transfers", filepath, {"user_id": 1, "num_gws": num_gws, "squads": squads}
+            if "preseason" in optimisers:
+                yield ("preseason", num_players, num_gws), "preseason", filepath, {"start_gw": 2, "end_gw": num_gws + 1}
+
+
+def compare(result, baseline, threshold):
+    """adds the baseline's values to the results, and marks each case that has regressed or whose objective has changed"""
+    flags = []
+    for row in result.itertuples():
+        old = baseline.get(row.key)
+        if old is None:
+            flags.append("new")
+            continue
+        flag = [
+            f"{metric} +{getattr(row, metric) / old[metric] - 1:.0%}"
+            for metric in METRICS
+            if getattr(row, metric) > old[metric] * (1 + threshold) and getattr(row, metric) - old[metric] > NOISE[metric]
+        ]
+        if abs(row.objective - old["objective"]) > 1e-6 * max(1, abs(old["objective"])):
+            flag.append("objective changed")
+        flags.append(", ".join(flag) or "ok")
+    for metric in METRICS:
+        result[f"base_{metric}"] = [baseline.get(key, {}).get(metric) for key in result.key]
+    result["check"] = flags
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time every optimiser on synthetic data and compare against a baseline")
+    parser.add_argument("--optimisers", nargs="+", choices=OPTIMISERS, default=OPTIMISERS)
+    parser.add_argument("--players", type=int, nargs="+", default=[300, 600])
+    parser.add_argument("--gws", type=int, nargs="+", default=[1, 3, 5], help="horizons for with_transfers and preseason")
+    parser.add_argument("--teams", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=BASELINE, help="the json file the baseline is kept in")
+    parser.add_argument("--save", action="store_true", help="store these results as the baseline instead of comparing against it")
+    parser.add_argument("--threshold", type=float, default=0.25, help="how much slower or bigger than the baseline counts as a regression")
+    args = parser.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for key, optimiser, filepath, params in cases(args.optimisers, args.players, args.gws, args.teams, args.seed, tmp):
+            # a fresh process for every case, so that peak memory isn't carried over from the one before
+            with Pool(1, initializer=_start_worker) as pool:
+                measured = pool.apply(run_case, (optimiser, filepath, params))
+            name = f"{key[0]}/{key[1]}p" + (f"/{key[2]}gw" if key[2] else "") + f"/{args.teams}t/s{args.seed}"
+            rows.append({"key": name, "optimiser": optimiser, "players": key[1], "gws": key[2], **measured})
+            print(f"{name}: build {measured['build_s']:.3f} s, solve {measured['solve_s']:.3f} s, {measured['peak_mb']:.1f} MB", flush=True)
+
+    result = pd.DataFrame(rows)
+    if args.save:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update({row["key"]: {k: row[k] for k in METRICS + ["objective"]} for row in rows})
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"\nSaved {len(rows)} cases to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        parser.error(f"there is no baseline at {args.baseline} - run with --save first")
+    with open(args.baseline) as f:
+        result = compare(result, json.load(f), args.threshold)
+    columns = ["key", "build_s", "base_build_s", "solve_s", "base_solve_s", "peak_mb", "base_peak_mb", "check"]
+    print()
+    print(result[columns].to_string(index=False, float_format="%.3f"))
+    regressed = result.check.ne("ok") & result.check.ne("new")
+    if regressed.any():
+        print(f"\n{regressed.sum()} of {len(result)} cases regressed by more than {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
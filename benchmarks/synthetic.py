@@ -0,0 +1,88 @@
+"""
+Seeded synthetic player data, so that every optimiser can be run and timed without the FPL API or a real data file.
+
+players_pool() follows players_data.csv, and gameweek_pool() follows with_transfers/cleaned_data.csv, with a cost
+column added for optimiser_preseason. fake_squad() makes a current squad for with_transfers/optimiser.py in the format
+of fpl_api.fetch_squads. The same arguments always give the same data.
+"""
+import numpy as np
+import pandas as pd
+
+POSITIONS = ["G", "D", "M", "F"]
+# roughly the share of players in each position in a real season
+POSITION_SHARES = [0.1, 0.35, 0.38, 0.17]
+SQUAD_COUNTS = {"G": 2, "D": 5, "M": 5, "F": 3}
+
+
+def _players(rng, num_players, num_teams):
+    """returns the id, team, pos, name and cost columns shared by both formats"""
+    assert num_teams >= 5, "there have to be at least 5 teams to pick a squad with at most 3 players from each"
+    # every position gets enough players for a squad, and the rest are drawn in the usual shares
+    pos = np.concatenate([np.repeat(POSITIONS, [2, 5, 5, 3]), rng.choice(POSITIONS, num_players - 15, p=POSITION_SHARES)])
+    rng.shuffle(pos)
+    return pd.DataFrame(
+        {
+            "id": np.arange(1, num_players + 1),
+            "team": [f"Team {k}" for k in rng.permutation(np.arange(num_players) % num_teams)],
+            "pos": pos,
+            "name": [f"Player {k}" for k in range(num_players)],
+            "cost": rng.integers(40, 126, num_players) / 10,
+        }
+    )
+
+
+def players_pool(num_players=600, num_teams=20, seed=0):
+    """
+    returns a dataframe in the format of players_data.csv, with points that go up with cost
+    :param num_players - int: the number of players, at least 15
+    :param num_teams - int: the number of teams, which the players are spread evenly across
+    :param seed - int: the seed of the random numbers
+    """
+    rng = np.random.default_rng(seed)
+    df = _players(rng, num_players, num_teams)
+    df["points"] = np.round(rng.gamma(4, 1, num_players) * df.cost * 6)
+    return df
+
+
+def gameweek_pool(num_players=600, num_gws=5, num_teams=20, first_gw=1, seed=0):
+    """
+    returns a dataframe in the format of with_transfers/cleaned_data.csv, with a points column for each gameweek and a cost
+    column for optimiser_preseason. Each player has an underlying rate that goes up with cost, which each gameweek
+    varies around, as a fixture would
+    :param num_gws - int: the number of gameweeks
+    :param first_gw - int: the gameweek of the first points column
+    All other parameters are as in players_pool()
+    """
+    rng = np.random.default_rng(seed)
+    df = _players(rng, num_players, num_teams)
+    df["buy_cost"] = df.cost
+    # a player sells for less than they were bought for if their price has gone up since
+    df["sale_value"] = df.cost - rng.choice([0, 0, 0, 0.1], num_players)
+    rate = rng.gamma(4, 1, num_players) * df.cost.to_numpy() / 12
+    fixtures = rng.uniform(0.6, 1.4, (num_gws, num_players))
+    for j in range(num_gws):
+        df[f"{first_gw + j}_pts"] = np.round(rate * fixtures[j], 3)
+    return df[["id", "team", "pos", "name", "buy_cost", "sale_value"] + [f"{first_gw + j}_pts" for j in range(num_gws)] + ["cost"]]
+
+
+def fake_squad(df, gw, user_id=1, budget=100, seed=0):
+    """
+    returns a random squad that meets every rule, in the format of fpl_api.fetch_squads, to pass to with_transfers/optimiser.py as squads
+    :param df - DataFrame: the player data that the squad is picked from
+    :param gw - int: the gameweek that the squad last played, so that the optimiser plans from gw + 1
+    :param user_id - int: the manager id that the squad is stored under
+    :param budget - int or float: the squad and bank add up to this, so it should be at least the cost of the squad
+    """
+    rng = np.random.default_rng(seed)
+    # cheaper players are more likely to be picked, so that the squad stays within the budget
+    order = np.argsort(df.sale_value.to_numpy() * rng.uniform(0.5, 1.5, len(df)))
+    left, per_team, picks = dict(SQUAD_COUNTS), {}, []
+    for player in df.iloc[order].itertuples():
+        if left[player.pos] and per_team.get(player.team, 0) < 3:
+            left[player.pos] -= 1
+            per_team[player.team] = per_team.get(player.team, 0) + 1
+            picks.append(int(player.id))
+    assert len(picks) == 15, "there aren't enough players to pick a squad from"
+    bank = round(budget - df.set_index("id").sale_value[picks].sum(), 1)
+    assert bank >= 0, "the squad costs more than the budget"
+    return pd.DataFrame([[gw, bank] + picks], index=pd.Index([user_id], name="user_id"), columns=["gw", "bank"] + [f"pick_{k}" for k in range(1, 16)])
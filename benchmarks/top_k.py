@@ -0,0 +1,92 @@
+"""
+Compares finding the top_k best squads in one call against solving the model from scratch top_k times.
+
+usage: python benchmarks/top_k.py [top_k] [num_players]
+
+A random player pool is solved by optimiser_A and optimiser_B, once with top_k and then top_k times without it.
+The cold solves don't have the cuts that top_k adds, so they are easier than the runs they stand in for, and the
+comparison flatters them. The script fails if the best squad of the two differs, or if the top_k squads get better.
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import optimiser_A
+import optimiser_B
+
+
+def random_pool(num_players, seed=0):
+    """returns a dataframe in the format of players_data.csv, with random costs and points"""
+    rng = np.random.default_rng(seed)
+    cost = rng.integers(40, 126, num_players) / 10
+    return pd.DataFrame(
+        {
+            "id": np.arange(1, num_players + 1),
+            "team": rng.choice([f"Team {k}" for k in range(20)], num_players),
+            "pos": rng.choice(["G", "D", "M", "F"], num_players, p=[0.1, 0.35, 0.38, 0.17]),
+            "name": [f"Player {k}" for k in range(num_players)],
+            "cost": cost,
+            "points": np.round(rng.gamma(4, 1, num_players) * cost * 6),
+        }
+    )
+
+
+@contextlib.contextmanager
+def silenced():
+    """sends everything printed, including the solver's log, which is written straight to the file descriptor, to devnull"""
+    sys.stdout.flush()
+    saved, devnull = os.dup(1), os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        os.dup2(saved, 1)
+        os.close(saved)
+        os.close(devnull)
+
+
+def timed(optimise, **params):
+    """returns what optimise returns, and how long it took in seconds"""
+    start = time.perf_counter()
+    with silenced():
+        result = optimise(cache=False, **params)
+    return result, time.perf_counter() - start
+
+
+def main(top_k, num_players):
+    df = random_pool(num_players)
+    runs = {
+        "A": (optimiser_A.optimise, {"budget": 83, "teamsize": 11}, lambda result: result.points),
+        "B": (optimiser_B.optimise, {}, lambda result: 0.9 * result.points + 0.1 * result.bench_points),
+    }
+    # the first model built loads the solver libraries, which shouldn't count towards either time
+    timed(optimiser_A.optimise, filepath=df)
+    rows = []
+    for name, (optimise, params, objective) in runs.items():
+        for min_difference in [1, 3]:
+            squads, top_k_s = timed(optimise, filepath=df, top_k=top_k, min_difference=min_difference, **params)
+            values = np.array([objective(squad) for squad in squads])
+            cold_s = 0
+            for k in range(top_k):
+                best, seconds = timed(optimise, filepath=df, **params)
+                cold_s += seconds
+            assert np.isclose(values[0], objective(best)), f"optimiser_{name}'s best squad differs with top_k"
+            assert (np.diff(values) <= 1e-9).all(), f"optimiser_{name}'s top_k squads get better"
+            rows.append([name, min_difference, len(squads), values[0], values[-1], top_k_s, cold_s])
+
+    result = pd.DataFrame(rows, columns=["optimiser", "min_difference", "found", "best", "worst", "top_k_s", "cold_s"])
+    result["speedup"] = result.cold_s / result.top_k_s
+    print(f"top_k={top_k}, {num_players} players")
+    print(result.to_string(index=False, float_format="%.3f"))
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [20, 600][len(args):]))
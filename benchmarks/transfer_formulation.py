@@ -0,0 +1,106 @@
+"""
+Compares the overlap and flow transfer formulations of with_transfers/optimiser.py on horizons of 5 to 10 gameweeks.
+
+usage:
+    python benchmarks/transfer_formulation.py
+    python benchmarks/transfer_formulation.py --players 600 --gws 5 8 10 --max_hits 0 2 --max_seconds 300
+    python benchmarks/transfer_formulation.py --filepath with_transfers/cleaned_data.csv --gws 5 8
+
+Each case is solved from the same fake current squad, in a fresh process that has already loaded the solver, with the
+result cache turned off, and its build time, solve time and node count come from the run's profiling record. The data
+is synthetic unless --filepath is given, in which case its points columns are repeated as many times as needed to reach
+the longest horizon.
+
+The two formulations don't have quite the same rules. overlap allows at most 2 transfers each week and n + free_transfers
+after n weeks, while flow rolls over at most 2 free transfers, so flow with --max_hits 0 can score a little less.
+With more hits allowed, flow can also score more, as it takes a hit wherever one pays for itself.
+"""
+from multiprocessing import Pool
+import argparse
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [ROOT, os.path.join(ROOT, "with_transfers")]
+from synthetic import fake_squad, gameweek_pool
+from top_k import silenced
+
+
+def _start_worker():
+    """worker initialiser - imports the optimiser and loads the solver, so that neither counts towards the run"""
+    from mip import Model
+    import optimiser
+
+    Model()
+
+
+def run_case(filepath, squads, num_gws, params):
+    """solves one case in the worker, returning its objective, status, node count and build and solve times"""
+    import optimiser
+    import profiling
+
+    with profiling.profiled() as records, silenced():
+        optimiser.optimise(1, num_gws, filepath=filepath, squads=squads, assembly="sparse", cache=False, **params)
+    record = records[0]
+    solve = record["solves"][-1]
+    return {
+        "objective": solve["objective"],
+        "status": solve["status"],
+        "gap": solve["gap"],
+        "nodes": solve["nodes"],
+        "build_s": record["phases"]["build"]["wall_s"],
+        "solve_s": record["phases"]["solve"]["wall_s"],
+    }
+
+
+def player_data(filepath, num_players, num_gws, seed, first_gw=2):
+    """returns the player data for the longest horizon, either synthetic or read from filepath with its points repeated"""
+    if filepath is None:
+        return gameweek_pool(num_players, num_gws, first_gw=first_gw, seed=seed)
+    df = pd.read_csv(filepath)
+    pts_cols = [col for col in df.columns if col.endswith("_pts")]
+    pts = np.tile(df[pts_cols].to_numpy(), (1, -(-num_gws // len(pts_cols))))[:, :num_gws]
+    df = df.drop(columns=pts_cols)
+    for j in range(num_gws):
+        df[f"{first_gw + j}_pts"] = pts[:, j]
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the overlap and flow transfer formulations")
+    parser.add_argument("--players", type=int, default=300, help="the number of synthetic players")
+    parser.add_argument("--gws", type=int, nargs="+", default=[5, 8, 10])
+    parser.add_argument("--max_hits", type=int, nargs="+", default=[0, 2], help="the max_hits to run the flow formulation with")
+    parser.add_argument("--max_seconds", type=float, default=600, help="the time limit for each case")
+    parser.add_argument("--filepath", help="a csv in the format of with_transfers/cleaned_data.csv to use instead of synthetic data")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    df = player_data(args.filepath, args.players, max(args.gws), args.seed)
+    squads = fake_squad(df, gw=1, seed=args.seed)
+    formulations = [("overlap", {})] + [("flow", {"max_hits": max_hits}) for max_hits in args.max_hits]
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        filepath = os.path.join(tmp, "gameweeks.csv")
+        df.to_csv(filepath, index=False)
+        for num_gws in args.gws:
+            for formulation, params in formulations:
+                params = {"formulation": formulation, "max_seconds": args.max_seconds, **params}
+                with Pool(1, initializer=_start_worker) as pool:
+                    measured = pool.apply(run_case, (filepath, squads, num_gws, params))
+                rows.append({"gws": num_gws, "formulation": formulation, "max_hits": params.get("max_hits"), **measured})
+                print(f"{num_gws} gws, {formulation} {params.get('max_hits', '')}: solve {measured['solve_s']:.2f} s, {measured['nodes']} nodes", flush=True)
+
+    result = pd.DataFrame(rows)
+    result["max_hits"] = result.max_hits.astype("Int64")
+    print()
+    print(result.to_string(index=False, float_format="%.3f"))
+
+
+if __name__ == "__main__":
+    main()
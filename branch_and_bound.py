@@ -0,0 +1,374 @@
+"""
+An exact solver for optimiser_B's single gameweek problem that doesn't need a mip solver.
+
+Costs are counted in whole tenths of a million, so within each position the best value of picking
+its players can be found by dynamic programming over the exact amount spent. Each position's players
+are considered in order of points, which means the starters are always the first players picked,
+and only the number picked so far, whether the captain has been picked and the amount spent
+need to be tracked. The positions are then combined, keeping only the amounts spent at which the
+value goes up, and the best combination within the budget is the best squad if max_from_team is ignored.
+
+max_from_team is handled by Lagrangian relaxation. Each team is charged a price for every player picked
+from it, which gives an upper bound for any price, and the prices are moved towards the lowest bound by
+subgradient steps. If a team still has too many players, the search branches on one of them, either
+leaving them out or forcing them in, and a branch is dropped as soon as its bound is no better than the
+best squad found so far. The heuristic's squad is used as the first best squad.
+
+The starters are always the best players picked in each position, so bench_strength can be no more than 0.5.
+"""
+import heapq
+import time
+
+import numpy as np
+
+from heuristic import SQUAD_COUNTS
+from model_builder import POSITIONS
+
+
+def tenths(cost):
+    """returns costs in whole tenths of a million"""
+    return np.rint(np.asarray(cost, dtype=float) * 10).astype(np.int64)
+
+
+def position_table(cost, start_value, bench_value, captain_bonus, forced, role, count, starters, budget, history=False):
+    """
+    returns the best value of picking `count` players of a position for each number of starters and each exact amount
+    spent up to budget, as a (len(starters), 2, budget + 1) array without and with the captain among them.
+    Players are considered in the order given, and the first players picked start. If history is True,
+    the table before each player and after the last are returned as well, for recover_players
+    :param cost - array<int>: the cost of each player in tenths
+    :param start_value, bench_value - array<float>: the value of each player when starting and when on the bench
+    :param captain_bonus - array<float>: the value added to a starter by being captain, or None if there is no captain
+    :param forced - array<bool>: the players who have to be picked
+    :param role - array<int>: 1 for players who must start, -1 for players who must be on the bench, and 0 otherwise
+    :param starters - array<int>: the numbers of starters to find the best values for
+    """
+    table = np.full((len(starters), count + 1, 2, budget + 1), -np.inf)
+    table[:, 0, 0, 0] = 0
+    starting = np.arange(count)[None, :] < np.asarray(starters)[:, None]
+    tables = []
+    for i, c in enumerate(cost):
+        if history:
+            tables.append(table.copy())
+        if c > budget:
+            if forced[i]:
+                table[:] = -np.inf
+            continue
+        value = np.where(starting, start_value[i], bench_value[i])
+        if role[i] == 1:
+            value[~starting] = -np.inf
+        elif role[i] == -1:
+            value[starting] = -np.inf
+        # both ways of picking the player are worked out from the table before the player, and then written into it
+        picked = table[:, :-1, :, : budget + 1 - c] + value[:, :, None, None]
+        captained = None
+        if captain_bonus is not None and role[i] != -1:
+            value = np.where(starting, start_value[i] + captain_bonus[i], -np.inf)
+            captained = table[:, :-1, 0, : budget + 1 - c] + value[:, :, None]
+        if forced[i]:
+            table[:] = -np.inf
+        np.maximum(table[:, 1:, :, c:], picked, out=table[:, 1:, :, c:])
+        if captained is not None:
+            np.maximum(table[:, 1:, 1, c:], captained, out=table[:, 1:, 1, c:])
+    tables.append(table)
+    return table[:, count], tables
+
+
+def recover_players(tables, cost, start_value, bench_value, captain_bonus, forced, role, count, starters, captain, spent):
+    """
+    follows the tables returned by position_table for one number of starters back from `count` players, `captain` and `spent`,
+    returning the indices of the players picked, of those who start, and of the captain
+    """
+    k, picked, starting, captain_i = count, [], [], None
+    for i in reversed(range(len(cost))):
+        before, value = tables[i], tables[i + 1][k, captain, spent]
+        if not forced[i] and before[k, captain, spent] == value:
+            continue
+        c, starts = cost[i], k - 1 < starters
+        if starts and role[i] == -1 or not starts and role[i] == 1:
+            raise AssertionError("the tables don't match the players")
+        if c > spent:
+            raise AssertionError("the tables don't match the players")
+        if before[k - 1, captain, spent - c] + (start_value[i] if starts else bench_value[i]) == value:
+            pass
+        elif captain and before[k - 1, 0, spent - c] + start_value[i] + captain_bonus[i] == value:
+            captain, captain_i = 0, i
+        else:
+            raise AssertionError("the tables don't match the players")
+        picked.append(i)
+        if starts:
+            starting.append(i)
+        k, spent = k - 1, spent - c
+    return picked, starting, captain_i
+
+
+def frontier(best):
+    """returns the amounts at which the best value of spending at most each amount goes up, and those values"""
+    up = np.isfinite(best) & np.concatenate([[True], best[1:] > best[:-1]])
+    spent = np.flatnonzero(up)
+    return spent, best[spent]
+
+
+def convolve(left, spent, value, width):
+    """
+    returns the best value of spending at most each amount up to width on two sets of positions
+    :param left - array<float>: the best value of spending at most each amount on the first set
+    :param spent, value - array: the frontier of the second set
+    """
+    best = np.full(width + 1, -np.inf)
+    low = np.argmax(np.isfinite(left)) + spent[0]
+    if low > width:
+        return best
+    # pad left so that every amount it is read at is in range, as nothing can be spent below zero and it can't go down above its end
+    top = width - spent[0]
+    padded = np.concatenate([np.full(spent[-1], -np.inf), left[: top + 1], np.full(max(top + 1 - len(left), 0), left[-1])])
+    shifted = np.arange(low, width + 1)[None, :] - spent[:, None] + spent[-1]
+    best[low:] = (padded[shifted] + value[:, None]).max(axis=0)
+    return best
+
+
+def combine(left, right, width):
+    """
+    combines the choices for two sets of positions, each a dict from (starters, captains) to the best value of spending
+    at most each amount, returning the combined choices and the pairs of keys that each of them came from
+    """
+    combined, sources = {}, {}
+    for (s1, c1), best1 in left.items():
+        for (s2, c2), best2 in right.items():
+            if c1 + c2 > 1:
+                continue
+            best = convolve(best1, *frontier(best2), width)
+            key = (s1 + s2, c1 + c2)
+            combined[key] = np.maximum(combined[key], best) if key in combined else best
+            sources.setdefault(key, []).append(((s1, c1), (s2, c2)))
+    return combined, sources
+
+
+def split(left, right, sources, key, spent, target):
+    """
+    returns the keys and the amounts spent on each set of positions that give a value of `target` for `key`
+    within `spent` in the result of combine(left, right)
+    """
+    for left_key, right_key in sources[key]:
+        best1, (spent2, value2) = left[left_key], frontier(right[right_key])
+        ok = np.flatnonzero(spent2 <= spent)
+        values = best1[np.minimum(spent - spent2[ok], len(best1) - 1)] + value2[ok]
+        match = np.flatnonzero(values == target)
+        if len(match):
+            j = ok[match[0]]
+            return left_key, right_key, spent - spent2[j], spent2[j]
+    raise AssertionError("the combined values don't match their sources")
+
+
+class BranchAndBound:
+    """
+    solves a SquadProblem with a lineup exactly
+    :param problem - SquadProblem: the problem, as built for the heuristic
+    """
+
+    def __init__(self, problem):
+        lineup = problem.lineup
+        assert lineup is not None, "the branch and bound solver is only for problems with a lineup"
+        assert lineup["bench_strength"] <= 0.5, "the branch and bound solver needs a bench_strength of no more than 0.5"
+        self.problem = problem
+        self.cost = tenths(problem.cost)
+        self.budget = int(np.floor(problem.budget * 10 + 1e-6))
+        b = lineup["bench_strength"]
+        self.start_value, self.bench_value = (1 - b) * problem.pts, b * problem.pts
+        self.captain_bonus = (1 - b) * problem.pts if lineup["captain"] else None
+        self.role = np.zeros(len(problem.pts), dtype=np.int64)
+        self.role[lineup["starting"]] = 1
+        self.role[lineup["on_bench"]] = -1
+        self.num_teams = problem.team_codes.max() + 1
+        # must start first and must be on the bench last, then by points, as in SquadProblem
+        self.order = [
+            np.flatnonzero(problem.pos_codes == code)[np.argsort(-problem.key[problem.pos_codes == code], kind="stable")]
+            for code in range(len(POSITIONS))
+        ]
+        self.starters = [np.unique(lineup["formations"][:, code]) for code in range(len(POSITIONS))]
+        self.nodes = 0
+
+    def _position_args(self, rows, prices, forced):
+        team_price = prices[self.problem.team_codes[rows]]
+        bonus = None if self.captain_bonus is None else self.captain_bonus[rows]
+        return (
+            self.cost[rows],
+            self.start_value[rows] - team_price,
+            self.bench_value[rows] - team_price,
+            bonus,
+            forced[rows],
+            self.role[rows],
+        )
+
+    def relax(self, prices, forced, available):
+        """
+        returns the value and squad of the best squad when each player's value is reduced by their team's price
+        and max_from_team is ignored, or None if there isn't a valid squad
+        """
+        position_rows = [self.order[code][available[self.order[code]]] for code in range(len(POSITIONS))]
+        if any(len(rows) < count for rows, count in zip(position_rows, SQUAD_COUNTS)):
+            return None
+        costs = [np.sort(self.cost[rows]) for rows in position_rows]
+        cheapest = np.array([cost[:count].sum() for cost, count in zip(costs, SQUAD_COUNTS)])
+
+        choices, widths = [], []
+        for code, rows in enumerate(position_rows):
+            # no position can spend more than its most expensive players cost, or more than is left after the cheapest other players
+            width = min(self.budget - cheapest.sum() + cheapest[code], costs[code][-SQUAD_COUNTS[code] :].sum())
+            if width < cheapest[code]:
+                return None
+            table, _ = position_table(*self._position_args(rows, prices, forced), SQUAD_COUNTS[code], self.starters[code], width)
+            position_choices = {}
+            for s, starters in enumerate(self.starters[code]):
+                for captain in range(2 if self.captain_bonus is not None else 1):
+                    best = np.maximum.accumulate(table[s, captain])
+                    if np.isfinite(best[-1]):
+                        position_choices[(starters, captain)] = best
+            choices.append(position_choices)
+            widths.append(width)
+
+        # combine defenders with goalkeepers and midfielders with forwards, then find the best way to split the budget.
+        # Goalkeepers and forwards are the second of each pair, as combine's cost grows with the second's frontier
+        front_width = min(self.budget - cheapest[2:].sum(), widths[0] + widths[1])
+        back_width = min(self.budget - cheapest[:2].sum(), widths[2] + widths[3])
+        front, front_sources = combine(choices[1], choices[0], front_width)
+        back, back_sources = combine(choices[2], choices[3], back_width)
+        captains = 1 if self.captain_bonus is not None else 0
+        best_value, best = -np.inf, None
+        for (s1, c1), best1 in front.items():
+            if (11 - s1, captains - c1) not in back:
+                continue
+            best2 = back[(11 - s1, captains - c1)]
+            spent = np.arange(len(best1))
+            values = best1 + best2[np.minimum(self.budget - spent, len(best2) - 1)]
+            i = np.argmax(values)
+            if values[i] > best_value:
+                best_value = values[i]
+                best = ((s1, c1), (11 - s1, captains - c1), i, min(self.budget - i, len(best2) - 1))
+        if best is None or not np.isfinite(best_value):
+            return None
+
+        front_key, back_key, front_spent, back_spent = best
+        keys, spends = [], []
+        for sets, sources, key, spent in [(front, front_sources, front_key, front_spent), (back, back_sources, back_key, back_spent)]:
+            left, right = (choices[1], choices[0]) if sets is front else (choices[2], choices[3])
+            left_key, right_key, left_spent, right_spent = split(left, right, sources, key, spent, sets[key][spent])
+            keys += [right_key, left_key] if sets is front else [left_key, right_key]
+            spends += [right_spent, left_spent] if sets is front else [left_spent, right_spent]
+
+        squad = []
+        for code, rows in enumerate(position_rows):
+            (starters, captain), spent = keys[code], spends[code]
+            args = self._position_args(rows, prices, forced)
+            table, tables = position_table(*args, SQUAD_COUNTS[code], [starters], spent, history=True)
+            tables = [table[0] for table in tables]
+            exact = np.argmax(table[0, captain])
+            picked, _, _ = recover_players(tables, *args, SQUAD_COUNTS[code], starters, captain, exact)
+            squad += rows[picked].tolist()
+        return best_value, np.array(squad)
+
+    def _no_better(self, bound, best_value):
+        return np.isfinite(best_value) and bound <= best_value + self.gap * abs(best_value)
+
+    def bound(self, prices, forced, available, steps, best_value):
+        """
+        lowers the Lagrangian bound of a node by subgradient steps on the team prices, starting from prices.
+        returns the lowest bound, the prices and relaxed squad that gave it, and the best valid squad found along the way
+        with its value, or None for the bound if the node has no valid squad
+        """
+        problem, cap = self.problem, self.problem.max_from_team
+        bound, bound_prices, bound_squad, found = np.inf, prices, None, None
+        scale, misses = 2.0, 0
+        for step in range(steps):
+            relaxed = self.relax(prices, forced, available)
+            if relaxed is None:
+                return None, prices, None, found
+            value, squad = relaxed
+            counts = np.bincount(problem.team_codes[squad], minlength=self.num_teams)
+            step_bound = value + cap * prices.sum()
+            if step_bound < bound - 1e-12:
+                bound, bound_prices, bound_squad, misses = step_bound, prices, squad, 0
+            else:
+                misses += 1
+                if misses == 2:
+                    scale, misses = scale / 2, 0
+
+            # a squad that breaks max_from_team is repaired by the heuristic, to find better squads sooner
+            valid = squad if (counts <= cap).all() else problem.repair(squad)
+            if valid is not None:
+                valid_value = problem.values(valid[None, :])[0]
+                if valid_value > best_value:
+                    found, best_value = (valid, valid_value), valid_value
+            if self._no_better(bound, best_value):
+                break
+            # raising the price of teams with too many players and lowering the rest moves towards the lowest bound.
+            # Aiming a little below the best squad's value takes bigger steps, which get close to the lowest bound sooner
+            gradient = cap - counts
+            if not gradient.any():
+                break
+            target = best_value - 0.01 * abs(best_value) if np.isfinite(best_value) else step_bound - 0.05 * abs(step_bound)
+            prices = np.maximum(prices - scale * (step_bound - target) / (gradient @ gradient) * gradient, 0)
+        return bound, bound_prices, bound_squad, found
+
+    def solve(self, root_steps=30, steps=3, gap=1e-6, max_seconds=None, max_nodes=None, on_incumbent=None):
+        """
+        returns the best squad and its objective value
+        :param root_steps - int: the number of subgradient steps on the team prices at the first node
+        :param steps - int: the number of subgradient steps at every other node, which start from their parent's prices
+        :param gap - float: a node is dropped once its bound is within this fraction of the best squad's value, as the
+            subgradient steps only approach the lowest bound slowly. It should be no more than the mip solver's max_mip_gap
+        :param max_seconds - float: the search stops after this long, returning the best squad found so far
+        :param max_nodes - int: the search stops after this many nodes, returning the best squad found so far
+        :param on_incumbent - function: called as on_incumbent(squad, value, bound) with each better squad found, where bound
+            is the highest value any squad could have, or inf before the first node is searched
+
+        self.bound is the highest value any squad could have once the search ends, which is the returned value unless it stopped early
+        """
+        problem = self.problem
+        deadline = None if max_seconds is None else time.perf_counter() + max_seconds
+        best_squad, best_value = problem.search()
+        if best_squad is not None and on_incumbent is not None:
+            on_incumbent(best_squad, best_value, np.inf)
+        self.gap = gap
+
+        forced = np.zeros(len(problem.pts), dtype=bool)
+        forced[problem.forced] = True
+        # each node is (bound, tiebreak, forced, available, prices), and the node with the highest bound is searched first
+        nodes = [(-np.inf, 0, forced, problem.available.copy(), np.zeros(self.num_teams))]
+        self.nodes = 0
+        while nodes:
+            if (max_nodes is not None and self.nodes >= max_nodes) or (deadline is not None and time.perf_counter() >= deadline):
+                # nodes is a heap, so the first node has the highest bound of every node left
+                self.bound = max(-nodes[0][0], best_value)
+                break
+            parent_bound, _, forced, available, prices = heapq.heappop(nodes)
+            if self._no_better(-parent_bound, best_value):
+                continue
+            self.nodes += 1
+
+            bound, prices, squad, found = self.bound(prices, forced, available, root_steps if self.nodes == 1 else steps, best_value)
+            if found is not None:
+                best_squad, best_value = found
+                if on_incumbent is not None:
+                    on_incumbent(best_squad, best_value, max([best_value if bound is None else bound] + [-node[0] for node in nodes[:1]]))
+            if bound is None or self._no_better(bound, best_value):
+                continue
+            # branch on the player with the most points from the team that is furthest over max_from_team, who is
+            # either left out or forced in. If every player is forced in, the only squad left has already been checked
+            free = squad[~forced[squad]]
+            if not len(free):
+                continue
+            counts = np.bincount(problem.team_codes[squad], minlength=self.num_teams)
+            player = free[np.lexsort((-problem.pts[free], -counts[problem.team_codes[free]]))[0]]
+            left_out = available.copy()
+            left_out[player] = False
+            forced_in = forced.copy()
+            forced_in[player] = True
+            heapq.heappush(nodes, (-bound, 2 * self.nodes, forced, left_out, prices))
+            heapq.heappush(nodes, (-bound, 2 * self.nodes + 1, forced_in, available, prices))
+
+        else:
+            self.bound = best_value
+
+        assert best_squad is not None, "there is no valid squad"
+        return best_squad, best_value
@@ -0,0 +1,327 @@
+"""
+A small client for the FPL API that keeps its connection open, caches responses on disk, and can
+serve recorded responses from a directory instead of the network.
+
+Every response is cached as <cache_dir>/<endpoint>.json, e.g. cache/entry/352/history.json, along with
+its ETag. A cached response is used as it is until its endpoint's time to live runs out, after which
+the API is asked whether it has changed, so an unchanged bootstrap-static costs a few hundred bytes
+instead of the whole download. Because the cache is laid out the same way as a fixture directory,
+a cache directory can be copied and passed as fixture_dir to run the optimisers with no network.
+
+fetch_squads() loads the squads of many managers at once, e.g. a whole mini-league, with a fixed
+number of connections fetching picks concurrently. Those picks skip the cache, as they are only
+needed once per run.
+"""
+from urllib.parse import urlsplit
+import asyncio
+import gzip
+import http.client
+import json
+import os
+import random
+import ssl
+import time
+
+import numpy as np
+import pandas as pd
+
+BASE_URL = "https://fantasy.premierleague.com/api/"
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "fpl_optimiser")
+
+# seconds before a cached response is checked again. Picks can't change once a gameweek has started
+TTL = {
+    "bootstrap-static": 60 * 60,
+    "history": 10 * 60,
+    "picks": 7 * 24 * 60 * 60,
+}
+
+
+class FPLAPIError(IOError):
+    """raised when the API returns anything other than a successful response"""
+
+
+class FPLClient:
+    """
+    :param cache_dir - str: the directory that responses are cached in. If set to None, nothing is cached
+    :param fixture_dir - str: a directory of recorded responses to serve instead of using the network.
+        Defaults to the FPL_FIXTURE_DIR environment variable, if it is set
+    :param ttl - dict<str, int>: seconds before a cached response is checked again, by the last part of its endpoint's name
+    :param timeout - float: seconds to wait for the API before giving up
+    :param base_url - str: the root of the API, which can be changed to point at a local server
+    """
+
+    def __init__(
+        self,
+        cache_dir=CACHE_DIR,
+        fixture_dir=None,
+        ttl=TTL,
+        timeout=10,
+        base_url=BASE_URL,
+    ):
+        self.cache_dir = cache_dir
+        self.fixture_dir = fixture_dir or os.environ.get("FPL_FIXTURE_DIR")
+        self.ttl = ttl
+        self.timeout = timeout
+        self.base_url = base_url
+        self._connection = None
+        self._bootstrap = None
+
+    def __getstate__(self):
+        # an open connection can't be sent to another process, so workers open their own
+        state = self.__dict__.copy()
+        state["_connection"] = None
+        return state
+
+    def _path(self, directory, endpoint):
+        return os.path.join(directory, *endpoint.replace("?", "_").strip("/").split("/")) + ".json"
+
+    def _request(self, endpoint, etag=None):
+        """makes a single GET request on the open connection, reconnecting once if the server has closed it"""
+        url = urlsplit(self.base_url + endpoint)
+        headers = {"Accept-Encoding": "gzip", "User-Agent": "FPL_Optimiser"}
+        if etag:
+            headers["If-None-Match"] = etag
+        for attempt in range(2):
+            if self._connection is None:
+                connection = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+                self._connection = connection(url.netloc, timeout=self.timeout)
+            try:
+                self._connection.request("GET", url.path + (f"?{url.query}" if url.query else ""), headers=headers)
+                response = self._connection.getresponse()
+                body = response.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                self._connection.close()
+                self._connection = None
+                if attempt:
+                    raise
+        if response.getheader("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        return response.status, response.getheader("ETag"), body
+
+    def get(self, endpoint):
+        """
+        returns the parsed json for an endpoint, e.g. "entry/352/history/", using the fixtures or the cache where possible
+        :raises FPLAPIError: if the API returns an error
+        :raises FileNotFoundError: if there is a fixture directory that doesn't have a response for the endpoint
+        """
+        if self.fixture_dir:
+            path = self._path(self.fixture_dir, endpoint)
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"There is no recorded response for {endpoint} in {self.fixture_dir}")
+            with open(path, "rb") as f:
+                return json.loads(f.read())
+
+        if self.cache_dir is None:
+            status, etag, body = self._request(endpoint)
+            if status != 200:
+                raise FPLAPIError(f"{self.base_url}{endpoint} returned {status}")
+            return json.loads(body)
+
+        path = self._path(self.cache_dir, endpoint)
+        etag = None
+        if os.path.exists(path):
+            ttl = self.ttl.get(endpoint.split("?")[0].strip("/").split("/")[-1], 0)
+            if time.time() - os.path.getmtime(path) < ttl:
+                with open(path, "rb") as f:
+                    return json.loads(f.read())
+            if os.path.exists(path + ".etag"):
+                with open(path + ".etag") as f:
+                    etag = f.read()
+
+        status, new_etag, body = self._request(endpoint, etag)
+        if status == 304:
+            # unchanged, so start the time to live again
+            os.utime(path)
+            with open(path, "rb") as f:
+                return json.loads(f.read())
+        if status != 200:
+            raise FPLAPIError(f"{self.base_url}{endpoint} returned {status}")
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as out:
+            out.write(body)
+        if new_etag:
+            with open(path + ".etag", "w") as out:
+                out.write(new_etag)
+        return json.loads(body)
+
+    def bootstrap(self):
+        """returns bootstrap-static, which is only fetched once per client"""
+        if self._bootstrap is None:
+            self._bootstrap = self.get("bootstrap-static/")
+        return self._bootstrap
+
+    def next_gw(self):
+        """returns the id of the next gameweek"""
+        return next(x["id"] for x in self.bootstrap()["events"] if x["is_next"])
+
+    def history(self, user_id):
+        """returns a manager's history, including every gameweek played and the chips used"""
+        return self.get(f"entry/{user_id}/history/")
+
+    def picks(self, user_id, gw):
+        """returns a manager's picks and bank for a gameweek"""
+        return self.get(f"entry/{user_id}/event/{gw}/picks/")
+
+    def league_entries(self, league_id):
+        """returns the ids of every manager in a classic league, fetching each page of the standings"""
+        entries, page, has_next = [], 1, True
+        while has_next:
+            standings = self.get(f"leagues-classic/{league_id}/standings/?page_standings={page}")["standings"]
+            entries += [x["entry"] for x in standings["results"]]
+            has_next, page = standings["has_next"], page + 1
+        return entries
+
+
+async def _read_response(reader):
+    """reads one HTTP/1.1 response, returning its status, body and whether the server is closing the connection"""
+    line = await reader.readline()
+    if not line:
+        raise ConnectionResetError("the connection was closed before a response")
+    status = int(line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, value = line.decode("latin-1").split(":", 1)
+        headers[name.strip().lower()] = value.strip()
+
+    if headers.get("transfer-encoding") == "chunked":
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            if size == 0:
+                # skip any trailers
+                while (await reader.readline()) not in (b"\r\n", b""):
+                    pass
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()
+        body = b"".join(chunks)
+    elif "content-length" in headers:
+        body = await reader.readexactly(int(headers["content-length"]))
+    else:
+        # with neither, the body is everything until the server closes the connection
+        body = await reader.read()
+        headers["connection"] = "close"
+
+    if headers.get("content-encoding") == "gzip":
+        body = gzip.decompress(body)
+    return status, body, headers.get("connection", "").lower() == "close"
+
+
+async def _fetch_picks(queue, results, failures, url, gw, timeout, retries, backoff):
+    """keeps one connection open and fetches picks for user ids from the queue until it is empty"""
+    port = url.port or (443 if url.scheme == "https" else 80)
+    context = ssl.create_default_context() if url.scheme == "https" else None
+    reader = writer = None
+
+    while not queue.empty():
+        user_id = queue.get_nowait()
+        request = (
+            f"GET {url.path}entry/{user_id}/event/{gw}/picks/ HTTP/1.1\r\nHost: {url.netloc}\r\n"
+            "Accept-Encoding: gzip\r\nUser-Agent: FPL_Optimiser\r\n\r\n"
+        ).encode()
+        for attempt in range(retries + 1):
+            status, reason = None, None
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.wait_for(
+                        asyncio.open_connection(url.hostname, port, ssl=context), timeout
+                    )
+                writer.write(request)
+                await writer.drain()
+                status, body, close = await asyncio.wait_for(_read_response(reader), timeout)
+                if close:
+                    writer.close()
+                    writer = None
+                # a body cut short or that isn't json, such as an error page, fails like a dropped connection
+                picks = json.loads(body) if status == 200 else None
+            except (OSError, EOFError, ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+                status = None
+                reason = f"{type(e).__name__}: {e}"
+                if writer is not None:
+                    writer.close()
+                writer = None
+
+            if status == 200:
+                results[user_id] = picks
+                break
+            if status is not None:
+                reason = f"returned {status}"
+                # only rate limiting and server errors are worth trying again
+                if status != 429 and status < 500:
+                    break
+            if attempt < retries:
+                await asyncio.sleep(backoff * 2 ** attempt * (1 + random.random()))
+        if user_id not in results:
+            failures[user_id] = reason
+
+    if writer is not None:
+        writer.close()
+
+
+async def _fetch_all_picks(user_ids, base_url, gw, concurrency, timeout, retries, backoff):
+    queue = asyncio.Queue()
+    for user_id in user_ids:
+        queue.put_nowait(user_id)
+    results, failures = {}, {}
+    url = urlsplit(base_url)
+    workers = min(concurrency, len(user_ids))
+    await asyncio.gather(
+        *[_fetch_picks(queue, results, failures, url, gw, timeout, retries, backoff) for _ in range(workers)]
+    )
+    return results, failures
+
+
+def fetch_squads(
+    user_ids=None,
+    league_id=None,
+    gw=None,
+    client=None,
+    concurrency=50,
+    retries=3,
+    backoff=0.5,
+):
+    """
+    fetches the squads and banks of many managers concurrently, returning them as a dataframe indexed by user_id,
+    with columns gw, bank and pick_1 to pick_15. Managers whose squads couldn't be fetched are left out, and reported
+    :param user_ids - list<int>: the managers to fetch
+    :param league_id - int: a classic league whose managers are fetched as well as any in user_ids
+    :param gw - int: the gameweek to fetch picks for. If left blank, the most recent gameweek is used
+    :param client - FPLClient: the client used for bootstrap-static, the league standings and fixtures. If it has
+        a fixture directory, the picks are read from there too instead of the network
+    :param concurrency - int: the number of connections fetching picks at the same time
+    :param retries - int: the number of times a request is tried again after a connection error, rate limit or server error
+    :param backoff - float: seconds to wait before the first retry, which doubles for each retry after it
+    """
+    client = client or FPLClient()
+    user_ids = list(user_ids or [])
+    if league_id is not None:
+        user_ids += [entry for entry in client.league_entries(league_id) if entry not in user_ids]
+    if gw is None:
+        gw = client.next_gw() - 1
+
+    if client.fixture_dir:
+        results, failures = {}, {}
+        for user_id in user_ids:
+            try:
+                results[user_id] = client.picks(user_id, gw)
+            except FileNotFoundError as e:
+                failures[user_id] = str(e)
+    else:
+        results, failures = asyncio.run(
+            _fetch_all_picks(user_ids, client.base_url, gw, concurrency, client.timeout, retries, backoff)
+        )
+
+    if failures:
+        print(f"Couldn't fetch {len(failures)} of {len(user_ids)} squads, e.g. {next(iter(failures.items()))}\n")
+
+    fetched = [user_id for user_id in user_ids if user_id in results]
+    picks = np.array([[x["element"] for x in results[user_id]["picks"]] for user_id in fetched], dtype=np.int32)
+    squads = pd.DataFrame(picks.reshape(-1, 15), index=pd.Index(fetched, name="user_id"), columns=[f"pick_{k}" for k in range(1, 16)])
+    squads.insert(0, "gw", np.int16(gw))
+    squads.insert(1, "bank", np.array([results[user_id]["entry_history"]["bank"] / 10 for user_id in fetched], dtype=np.float64))
+    return squads
@@ -1,6 +1,7 @@
-from urllib.request import urlopen
-from json import loads
 from csv import writer
+import pandas as pd
+from fpl_api import FPLClient
+from player_data import save_players
 
 
 def team_converter(team_id):
@@ -42,8 +43,8 @@ def position_converter(position):
     return position_map[position]
 
 
-def main():
-    all_data = loads(urlopen("https://fantasy.premierleague.com/api/bootstrap-static/").read())
+def main(client=None):
+    all_data = (client or FPLClient()).bootstrap()
     players = all_data["elements"]
 
     important_data = [
@@ -64,5 +65,8 @@ def main():
         w.writerow(headers)
         w.writerows(important_data)
 
+    # also save a typed copy that the optimisers can load without parsing the csv
+    save_players(pd.DataFrame(important_data, columns=headers), "players_data.npz")
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,370 @@
+"""
+A fast heuristic for the single gameweek squad problems in optimiser_A and optimiser_B, using only numpy.
+
+A squad is built greedily, always leaving enough budget to fill the remaining places with the
+cheapest players available, and is then improved by local search. Each step tries every swap
+of one squad player for one player outside it and takes the best, and when no single swap helps,
+pairs of swaps are tried, from any positions that keep the position limits, so that one player can
+be downgraded to pay for upgrading another. For each pair of squad players and each player that
+could come in, the best partner the budget allows is found by a binary search over cost.
+Every candidate squad of a step is scored at once as a (num_squads, squad_size) array. The whole
+thing is repeated from a few different greedy starts, which trade points against cost differently.
+
+The result is not guaranteed to be optimal. The starting 11 is picked by points within each formation,
+which is the best lineup for a squad as long as bench_strength is no more than 0.5.
+"""
+from itertools import product
+
+import numpy as np
+
+from model_builder import POSITIONS
+
+SQUAD_COUNTS = np.array([2, 5, 5, 3])
+
+
+def formations(DEF=None, MID=None, FWD=None):
+    """returns every valid number of starting players in each position, as a (num_formations, 4) array"""
+    ranges = [
+        [1],
+        [DEF] if DEF else range(3, 6),
+        [MID] if MID else range(2, 6),
+        [FWD] if FWD else range(1, 4),
+    ]
+    return np.array([f for f in product(*ranges) if sum(f) == 11])
+
+
+class SquadProblem:
+    """
+    the data and rules of a single gameweek squad problem. Squads are (num_squads, size) arrays of player rows
+    :param pos_codes, team_codes - array<int>: the position and team code of each player, as in PlayerGroups
+    :param cost - array<float>: the cost of each player
+    :param pts - array<float>: the points of each player
+    :param budget - float: the maximum cost of a squad
+    :param lo, hi - array<int>: the minimum and maximum number of players from each position in a squad
+    :param size - int: the number of players in a squad
+    :param max_from_team - int: the maximum number of players allowed from a single team
+    :param forced - array<int>: rows of players who must be in the squad
+    :param available - array<bool>: the players that can be picked
+    :param lineup - dict: if given, squads are scored by their best starting 11 and captain instead of their total points,
+        with the keys formations, bench_strength, captain, and the rows of players that must start or must be on the bench
+    """
+
+    def __init__(self, pos_codes, team_codes, cost, pts, budget, lo, hi, size, max_from_team, forced, available, lineup=None):
+        self.pos_codes, self.team_codes = pos_codes, team_codes
+        self.cost, self.pts = np.asarray(cost, dtype=float), np.asarray(pts, dtype=float)
+        self.budget, self.size, self.max_from_team = budget, size, max_from_team
+        self.lo, self.hi = np.asarray(lo), np.asarray(hi)
+        self.forced = np.asarray(forced, dtype=np.int64)
+        self.available = np.asarray(available, dtype=bool).copy()
+        self.available[self.forced] = True
+        self.lineup = lineup
+        if lineup is not None:
+            # must start sorts first and must be on the bench sorts last within each position
+            self.key = self.pts.copy()
+            self.key[lineup["starting"]] += 1e9
+            self.key[lineup["on_bench"]] -= 1e9
+
+    def values(self, squads):
+        """returns the objective value of each squad"""
+        if self.lineup is None:
+            return self.pts[squads].sum(axis=1)
+        return self.best_lineups(squads)[0]
+
+    def best_lineups(self, squads):
+        """
+        returns the objective value of each squad, along with its players sorted by position and then by points,
+        and the number of players from each position in its best starting 11
+        """
+        b = self.lineup["bench_strength"]
+        order = np.lexsort((-self.key[squads], self.pos_codes[squads]))
+        sorted_rows = np.take_along_axis(squads, order, axis=1)
+        pts, key = self.pts[sorted_rows], self.key[sorted_rows]
+
+        # prefix sums and running maxima of points within each position's block of the sorted squad
+        starts = np.concatenate([[0], np.cumsum(SQUAD_COUNTS)[:-1]])
+        block_sum, block_max = np.empty_like(pts), np.empty_like(pts)
+        for start, count in zip(starts, SQUAD_COUNTS):
+            block_sum[:, start : start + count] = np.cumsum(pts[:, start : start + count], axis=1)
+            block_max[:, start : start + count] = np.maximum.accumulate(pts[:, start : start + count], axis=1)
+
+        best = np.full(len(squads), -np.inf)
+        best_formation = np.zeros((len(squads), len(POSITIONS)), dtype=np.int64)
+        for f in self.lineup["formations"]:
+            last = starts + f - 1
+            starting = block_sum[:, last].sum(axis=1)
+            value = b * pts.sum(axis=1) + (1 - 2 * b) * starting
+            if self.lineup["captain"]:
+                value += (1 - b) * block_max[:, last].max(axis=1)
+            # no one who must be on the bench can start, and no one who must start can be left out of the formation
+            fits = (key[:, last] > -1e8).all(axis=1)
+            full = f == SQUAD_COUNTS
+            fits &= ((key[:, np.minimum(last + 1, SQUAD_COUNTS.sum() - 1)] < 1e8) | full).all(axis=1)
+            value[~fits] = -np.inf
+            better = value > best
+            best[better] = value[better]
+            best_formation[better] = f
+        return best, sorted_rows, best_formation
+
+    def lineup_of(self, squad):
+        """returns the rows of the starting 11 and the captain of a single squad"""
+        _, sorted_rows, formation = self.best_lineups(squad[None, :])
+        starts = np.concatenate([[0], np.cumsum(SQUAD_COUNTS)[:-1]])
+        starting = np.concatenate([sorted_rows[0, s : s + k] for s, k in zip(starts, formation[0])])
+        return starting, starting[np.argmax(self.pts[starting])]
+
+    def greedy(self, cost_weight, start=None):
+        """
+        builds a squad one player at a time, picking the player with the highest pts - cost_weight * cost that still leaves enough budget,
+        or returns None if there isn't one
+        :param start - array<int>: rows of players to build the squad from, which must include the forced players. Defaults to the forced players
+        """
+        squad = list(self.forced if start is None else start)
+        counts = np.bincount(self.pos_codes[squad], minlength=len(POSITIONS))
+        team_counts = np.bincount(self.team_codes[squad], minlength=self.team_codes.max() + 1)
+        spent = self.cost[squad].sum()
+        score = self.pts - cost_weight * self.cost
+        free = self.available.copy()
+        free[squad] = False
+
+        while len(squad) < self.size:
+            left = self.size - len(squad) - 1
+            open_ = free & (counts[self.pos_codes] < self.hi[self.pos_codes]) & (team_counts[self.team_codes] < self.max_from_team)
+            by_cost = np.flatnonzero(free)[np.argsort(self.cost[free], kind="stable")]
+            # the cost of filling the places left after this pick, for a pick from each position
+            reserve = np.zeros(len(POSITIONS))
+            for code in range(len(POSITIONS)):
+                rows = self.fill(by_cost, counts + (np.arange(len(POSITIONS)) == code), team_counts, left)
+                reserve[code] = np.inf if rows is None else self.cost[rows].sum()
+            ok = open_ & (spent + self.cost + reserve[self.pos_codes] <= self.budget + 1e-9)
+
+            # the reserve doesn't know the pick's team, so the places left are filled again once the pick is known
+            pick = None
+            for row in np.flatnonzero(ok)[np.argsort(-score[ok], kind="stable")]:
+                after = team_counts.copy()
+                after[self.team_codes[row]] += 1
+                counts[self.pos_codes[row]] += 1
+                rows = self.fill(by_cost[by_cost != row], counts, after, left)
+                counts[self.pos_codes[row]] -= 1
+                if rows is not None and spent + self.cost[row] + self.cost[rows].sum() <= self.budget + 1e-9:
+                    pick = row
+                    break
+            if pick is None:
+                # fall back on the first player of the cheapest way to fill every place left
+                rows = self.fill(by_cost, counts, team_counts, left + 1)
+                if rows is None or spent + self.cost[rows].sum() > self.budget + 1e-9:
+                    return None
+                pick = rows[0]
+            squad.append(pick)
+            counts[self.pos_codes[pick]] += 1
+            team_counts[self.team_codes[pick]] += 1
+            spent += self.cost[pick]
+            free[pick] = False
+        return np.array(squad)
+
+    def fill(self, by_cost, counts, team_counts, places):
+        """
+        returns the rows of a cheap set of players that fills the places left in a squad without breaking the position
+        or team limits, taking the cheapest players who meet the minimum of each position first, or None if there isn't one
+        :param by_cost - array<int>: the rows of the players who can be picked, from cheapest to most expensive
+        :param counts, team_counts - array<int>: the number of players already in the squad from each position and team
+        :param places - int: the number of places left
+        """
+        need = np.maximum(self.lo - counts, 0)
+        if need.sum() > places:
+            return None
+        counts, team_room = counts.copy(), self.max_from_team - team_counts
+        picked = []
+        for minimum in [True, False]:
+            for row in by_cost.tolist():
+                if len(picked) == places or (minimum and not need.any()):
+                    break
+                pos, team = self.pos_codes[row], self.team_codes[row]
+                wanted = need[pos] > 0 if minimum else counts[pos] < self.hi[pos] and row not in picked
+                if wanted and team_room[team] > 0:
+                    picked.append(row)
+                    need[pos] -= minimum
+                    counts[pos] += 1
+                    team_room[team] -= 1
+        return np.array(picked, dtype=np.int64) if len(picked) == places and not need.any() else None
+
+    def repair(self, squad):
+        """
+        returns a valid squad close to one that breaks max_from_team, by dropping the players with the fewest points
+        from every team with too many, filling their places greedily and improving it by local search, or None
+        """
+        keep = np.ones(len(squad), dtype=bool)
+        for position in np.argsort(self.pts[squad]):
+            team = self.team_codes[squad] == self.team_codes[squad[position]]
+            if (team & keep).sum() > self.max_from_team and not np.isin(squad[position], self.forced):
+                keep[position] = False
+        if self.cost[squad[keep]].sum() > self.budget:
+            return None
+        repaired = self.greedy(0, squad[keep])
+        return None if repaired is None else self.local_search(repaired)[0]
+
+    def swaps(self, squad):
+        """returns every single swap that keeps the squad valid, as arrays of the squad position swapped out and the row swapped in"""
+        movable = ~np.isin(squad, self.forced)
+        outside = self.available.copy()
+        outside[squad] = False
+        out_pos, in_rows = np.nonzero(movable[:, None] & outside[None, :])
+        old, new = squad[out_pos], in_rows
+
+        counts = np.bincount(self.pos_codes[squad], minlength=len(POSITIONS))
+        team_counts = np.bincount(self.team_codes[squad], minlength=self.team_codes.max() + 1)
+        same_pos = self.pos_codes[old] == self.pos_codes[new]
+        same_team = self.team_codes[old] == self.team_codes[new]
+        ok = (self.cost[new] - self.cost[old] <= self.budget - self.cost[squad].sum() + 1e-9)
+        ok &= same_pos | (
+            (counts[self.pos_codes[new]] < self.hi[self.pos_codes[new]])
+            & (counts[self.pos_codes[old]] > self.lo[self.pos_codes[old]])
+        )
+        ok &= same_team | (team_counts[self.team_codes[new]] < self.max_from_team)
+        return out_pos[ok], new[ok]
+
+    def valid(self, squads):
+        """returns whether each squad keeps to the budget, positions and max_from_team"""
+        ok = self.cost[squads].sum(axis=1) <= self.budget + 1e-9
+        for code in range(len(POSITIONS)):
+            count = (self.pos_codes[squads] == code).sum(axis=1)
+            ok &= (self.lo[code] <= count) & (count <= self.hi[code])
+        team_counts = np.zeros((len(squads), self.team_codes.max() + 1), dtype=np.int64)
+        np.add.at(team_counts, (np.arange(len(squads))[:, None], self.team_codes[squads]), 1)
+        ok &= (team_counts <= self.max_from_team).all(axis=1)
+        ok &= (np.diff(np.sort(squads, axis=1), axis=1) != 0).all(axis=1)
+        return ok
+
+    def pair_swaps(self, squad, width=100):
+        """
+        returns squads made by swapping two squad players for two others, from any positions that keep the position limits.
+        For each pair swapped out and each player swapped in, the other player swapped in is the one with the most points
+        that the budget left allows, found by a binary search over the players of their position sorted by cost. The width
+        pairs that gain the most points are kept, and any of them that break max_from_team are dropped
+        """
+        movable = np.flatnonzero(~np.isin(squad, self.forced))
+        outside = self.available.copy()
+        outside[squad] = False
+        first, second = np.triu_indices(len(movable), 1)
+        out_a, out_b = movable[first], movable[second]
+        old_a, old_b = squad[out_a], squad[out_b]
+        counts = np.bincount(self.pos_codes[squad], minlength=len(POSITIONS))
+        eye = np.eye(len(POSITIONS), dtype=np.int64)
+        left = counts - eye[self.pos_codes[old_a]] - eye[self.pos_codes[old_b]]
+        cap = self.budget - self.cost[squad].sum() + self.cost[old_a] + self.cost[old_b] + 1e-9
+
+        found = []
+        for pos_a in range(len(POSITIONS)):
+            for pos_b in range(pos_a, len(POSITIONS)):
+                after = left + eye[pos_a] + eye[pos_b]
+                pairs = np.flatnonzero(((self.lo <= after) & (after <= self.hi)).all(axis=1))
+                rows_a = np.flatnonzero(outside & (self.pos_codes == pos_a))
+                rows_b = np.flatnonzero(outside & (self.pos_codes == pos_b))
+                if not len(pairs) or not len(rows_a) or not len(rows_b):
+                    continue
+                rows_a, rows_b = rows_a[np.argsort(self.cost[rows_a], kind="stable")], rows_b[np.argsort(self.cost[rows_b], kind="stable")]
+                # best_b[k] is the position in rows_b of the player with the most points among the k + 1 cheapest
+                best_b = np.maximum.accumulate(np.where(self.pts[rows_b] == np.maximum.accumulate(self.pts[rows_b]), np.arange(len(rows_b)), 0))
+                k = np.searchsorted(self.cost[rows_b], cap[pairs, None] - self.cost[rows_a][None, :], side="right") - 1
+                if pos_a == pos_b:
+                    # both come from the same players, so the second is always the cheaper one to count each pair once
+                    k = np.minimum(k, np.arange(len(rows_a))[None, :] - 1)
+                pair_i, a_i = np.nonzero(k >= 0)
+                new_a, new_b = rows_a[a_i], rows_b[best_b[k[pair_i, a_i]]]
+                gain = self.pts[new_a] + self.pts[new_b] - self.pts[old_a[pairs[pair_i]]] - self.pts[old_b[pairs[pair_i]]]
+                found.append((pairs[pair_i], new_a, new_b, gain))
+        if not found:
+            return np.zeros((0, len(squad)), dtype=np.int64)
+
+        pair, new_a, new_b, gain = (np.concatenate(arrays) for arrays in zip(*found))
+        best = np.argsort(-gain, kind="stable")[:width]
+        squads = np.repeat(squad[None, :], len(best), axis=0)
+        squads[np.arange(len(best)), out_a[pair[best]]] = new_a[best]
+        squads[np.arange(len(best)), out_b[pair[best]]] = new_b[best]
+        return squads[self.valid(squads)]
+
+    def local_search(self, squad, max_steps=200):
+        """improves a squad with the best single swap, or pair of swaps, until neither helps"""
+        value = self.values(squad[None, :])[0]
+        for step in range(max_steps):
+            out_pos, new = self.swaps(squad)
+            candidates = np.repeat(squad[None, :], len(out_pos), axis=0)
+            candidates[np.arange(len(out_pos)), out_pos] = new
+            values = self.values(candidates)
+            if not len(values) or values.max() <= value + 1e-9:
+                candidates = self.pair_swaps(squad)
+                values = self.values(candidates)
+            if not len(values) or values.max() <= value + 1e-9:
+                break
+            best = np.argmax(values)
+            squad, value = candidates[best], values[best]
+        return squad, value
+
+    def next_squad(self, found, min_difference=1, width=3):
+        """
+        returns a good squad that differs from every squad in found in at least min_difference players, and its objective value,
+        or None and -inf if there isn't one. The last squad in found is changed one swap at a time, keeping the best width
+        squads after each swap
+        :param found - list<array<int>>: the rows of each squad found so far
+        """
+        member = np.zeros((len(found), len(self.cost)), dtype=bool)
+        for k, squad in enumerate(found):
+            member[k, squad] = True
+        beam = np.asarray(found[-1])[None, :]
+        for step in range(1, min_difference + 1):
+            candidates = []
+            for squad in beam:
+                out_pos, new = self.swaps(squad)
+                swapped = np.repeat(squad[None, :], len(new), axis=0)
+                swapped[np.arange(len(new)), out_pos] = new
+                candidates.append(swapped)
+            candidates = np.concatenate(candidates)
+            values = self.values(candidates)
+
+            # each swap changes the difference from a squad by at most one, so anything nearer than step can't catch up.
+            # the differences are only worked out for the best candidates, until width different squads are far enough away
+            keep, seen = [], set()
+            for chunk in np.array_split(np.argsort(-values, kind="stable"), np.arange(1000, len(values), 1000)):
+                difference = self.size - member[:, candidates[chunk]].sum(axis=2)
+                for row in chunk[(difference >= step).all(axis=0)]:
+                    squad = tuple(np.sort(candidates[row]))
+                    if squad not in seen:
+                        seen.add(squad)
+                        keep.append(row)
+                    if len(keep) == width:
+                        break
+                if len(keep) == width:
+                    break
+            if not keep:
+                return None, -np.inf
+            beam = candidates[keep]
+        return beam[0], values[keep[0]]
+
+    def search(self, cost_weights=(0, 0.5, 1)):
+        """
+        returns the best squad found from a greedy start for each cost weight, and its objective value,
+        or None and -inf if no greedy start was valid. Each cost weight is relative to the average points per unit of cost
+        """
+        scale = self.pts[self.available].mean() / self.cost[self.available].mean()
+        best, best_value = None, -np.inf
+        for weight in cost_weights:
+            squad = self.greedy(weight * scale)
+            if squad is None:
+                continue
+            squad, value = self.local_search(squad)
+            if value > best_value:
+                best, best_value = squad, value
+        return best, best_value
+
+    def solve(self, cost_weights=(0, 0.5, 1)):
+        """returns the best squad found by search() and its objective value"""
+        assert self.lineup is None or self.lineup["bench_strength"] <= 0.5, "the heuristic solver needs a bench_strength of no more than 0.5"
+        best, best_value = self.search(cost_weights)
+        assert best is not None, "the heuristic couldn't find a valid squad"
+        return best, best_value
+
+
+def report_gap(value, bound, seconds):
+    """prints how far a heuristic solution's objective value is below the bound from solving the model's linear relaxation"""
+    print(f"Heuristic solution found in {seconds * 1000:.0f} ms")
+    # as mip measures the gap, so that a bound of 0 doesn't divide by 0
+    print(f"Objective value: {value:.4f}, LP bound: {bound:.4f}, gap: {(bound - value) / max(abs(bound), 1e-10):.2%}\n")
@@ -0,0 +1,115 @@
+"""
+Limits on how long the optimisers search, for when a good squad is needed by a deadline rather than the best one.
+
+Each optimise call takes max_seconds, max_gap and max_nodes, and max_seconds covers every solve in the call rather than
+each one. When a limit stops the search before the best squad found is proved optimal, that squad is still returned,
+with a line printed to say so, and the solve attribute of the result returned says how far it could be from the optimum:
+
+    result = optimiser_B.optimise(max_seconds=5)
+    result.solve  # {"status": "FEASIBLE", "objective": 5.21, "bound": 5.27, "gap": 0.0115}
+
+on_incumbent is called with the objective, the best bound known at the time and the squad each time the optimiser
+has a better squad than before. python-mip doesn't pass CBC's incumbents out while it is searching, so for the mip
+solver these are the squad a solve is started from, when there is one, and the squad each solve ends with.
+optimiser_B's branch_and_bound solver passes on every squad it finds as it finds it.
+"""
+import time
+
+from mip import INF, INT_MAX, OptimizationStatus
+
+# python-mip's default max_mip_gap, so a solution within this of the bound counts as optimal
+OPTIMAL_GAP = 1e-4
+
+
+class Limits:
+    """
+    the limits of one optimise call, which start counting when it is created
+    :param max_seconds - float: the most time that all the solves together can take
+    :param max_gap - float: the solver stops once the best solution is within this fraction of the bound
+    :param max_nodes - int: the most branch and bound nodes that each solve can search
+    :param on_incumbent - function: called as on_incumbent(objective, bound, squad) with each better solution found,
+        where bound is None if it isn't known yet. What squad is depends on the optimiser
+    """
+
+    def __init__(self, max_seconds=None, max_gap=None, max_nodes=None, on_incumbent=None):
+        assert max_seconds is None or max_seconds > 0, "max_seconds must be more than 0"
+        assert max_gap is None or max_gap >= 0, "max_gap can't be negative"
+        assert max_nodes is None or max_nodes >= 1, "max_nodes must be at least 1"
+        self.deadline = None if max_seconds is None else time.perf_counter() + max_seconds
+        self.max_gap = max_gap
+        self.max_nodes = max_nodes
+        self.on_incumbent = on_incumbent
+        self.best = None
+
+    @property
+    def given(self):
+        """whether the call has any limit or an on_incumbent, in which case it is worth having a solution to start from"""
+        return any(v is not None for v in (self.deadline, self.max_gap, self.max_nodes, self.on_incumbent))
+
+    def remaining(self):
+        """returns the seconds left before max_seconds runs out, or None if there is no max_seconds"""
+        return None if self.deadline is None else max(self.deadline - time.perf_counter(), 0)
+
+    def offer(self, objective, bound, squad):
+        """
+        passes a solution on to on_incumbent if it is better than every one passed on before
+        :param squad - function: returns the solution in the form on_incumbent takes, so that it is only worked out if needed
+        """
+        if self.on_incumbent is not None and (self.best is None or objective > self.best + 1e-9):
+            self.best = objective
+            self.on_incumbent(float(objective), None if bound is None else float(bound), squad())
+
+    def optimize(self, model, squad=None, max_seconds=None):
+        """
+        solves a model within the limits, and returns whether a solution was found
+        :param squad - function: returns the model's solution in the form on_incumbent takes
+        :param max_seconds - float: a time limit for this solve alone, which is cut short if the call's max_seconds runs out first
+        """
+        if self.max_gap is not None:
+            model.max_mip_gap = self.max_gap
+        remaining = min((s for s in (self.remaining(), max_seconds) if s is not None), default=None)
+        # with no time left, the solver still gets a moment to check the solution it was started from
+        model.optimize(
+            max_seconds=INF if remaining is None else max(remaining, 0.01),
+            max_nodes=INT_MAX if self.max_nodes is None else self.max_nodes,
+        )
+        if model.num_solutions == 0:
+            return False
+        if squad is not None:
+            self.offer(model.objective_value, self.outcome(model)["bound"], squad)
+        return True
+
+    def outcome(self, model):
+        """returns the status, objective, bound and gap of a model that has been solved within the limits and has a solution"""
+        objective, bound, gap = model.objective_value, model.objective_bound, model.gap
+        if self.max_gap is not None and self.max_gap > OPTIMAL_GAP and gap <= OPTIMAL_GAP:
+            # CBC can report its bound as the objective when it stops within max_gap, so all that is known is that it is within max_gap
+            bound = objective + self.max_gap * abs(objective)
+            gap = self.max_gap
+        return {
+            "status": "OPTIMAL" if model.status == OptimizationStatus.OPTIMAL and gap <= OPTIMAL_GAP else "FEASIBLE",
+            "objective": objective,
+            "bound": bound,
+            "gap": gap,
+        }
+
+
+def mark(result, solve, warn=True):
+    """
+    stores the outcome of a solve as the solve attribute of a result, printing a warning if it wasn't proved optimal
+    :param result - LineupResult, SquadResult or PlanResult: what the optimiser returns, see results.py
+    :param solve - dict: the outcome of the solve, as returned by Limits.outcome(), with bound and gap None if the solver
+        found nothing and the solution it was started from is used instead
+    :param warn - bool: denotes whether to print a warning if the solve wasn't proved optimal
+    """
+    if not warn:
+        pass
+    elif solve["status"] != "OPTIMAL" and solve["bound"] is None:
+        print(f"A limit stopped the search before it found anything better than the starting solution, objective {solve['objective']:.4f}\n")
+    elif solve["status"] != "OPTIMAL":
+        print(
+            f"A limit stopped the search before this was proved optimal: objective {solve['objective']:.4f}, "
+            f"bound {solve['bound']:.4f}, gap {solve['gap']:.2%}\n"
+        )
+    result.solve = dict(solve)
+    return result
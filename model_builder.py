@@ -0,0 +1,259 @@
+"""
+Shared helpers for building the optimisers' mip models.
+
+The player pool is indexed once with numpy, so each position and team constraint only
+touches the rows that belong to it instead of scanning every player for every group
+in every gameweek. Player names are also normalised once, so that in_team, out_team and
+the other lists of players can be looked up without scanning the pool for each player.
+"""
+from mip import LinExpr, xsum
+import numpy as np
+import pandas as pd
+import unicodedata
+import profiling
+from results import columns, read_binary
+
+POSITIONS = ["G", "D", "M", "F"]
+# the most free transfers that can be rolled over to a later gameweek
+MAX_FREE_TRANSFERS = 2
+# the chips that the flow formulation can play, each in one gameweek of a plan
+CHIPS = ["wildcard", "free_hit", "bench_boost"]
+
+
+def split_by_code(codes, n_groups):
+    """returns a list with the row indices of each code from 0 to n_groups - 1, in a single pass"""
+    order = np.argsort(codes, kind="stable")
+    bounds = np.cumsum(np.bincount(codes, minlength=n_groups))[:-1]
+    return np.split(order, bounds)
+
+
+class PlayerGroups:
+    """integer position and team codes for every row of a player dataframe, along with the rows in each group"""
+
+    def __init__(self, df):
+        self.n = len(df)
+        self.pos_codes = (
+            pd.Categorical(df.pos, categories=POSITIONS).codes.astype(np.int64)
+        )
+        assert (self.pos_codes >= 0).all(), "every player's pos must be one of G, D, M or F"
+        team_codes, teams = pd.factorize(df.team.str.lower())
+        self.team_codes = team_codes.astype(np.int64)
+        self.teams = list(teams)
+        self.pos_rows = dict(zip(POSITIONS, split_by_code(self.pos_codes, len(POSITIONS))))
+        self.team_rows = split_by_code(self.team_codes, len(self.teams))
+
+
+def normalise_name(name):
+    """lowercases a name and removes all diacritics from latin characters, so that names can be compared"""
+    nfkd_form = unicodedata.normalize("NFKD", name.lower())
+    return "".join([c for c in nfkd_form if not unicodedata.combining(c)])
+
+
+class PlayerIndex:
+    """
+    lookups from normalised name, id and team to the rows of a player dataframe
+    :param df - DataFrame: the player data
+    :param names - array<str>: the normalised name of every row, if they are already known from an earlier index
+    """
+
+    def __init__(self, df, names=None):
+        self.ids = df.id.to_numpy()
+        self.names = np.array([normalise_name(name) for name in df.name], dtype=object) if names is None else names
+        self.id_rows = {player_id: row for row, player_id in enumerate(self.ids.tolist())}
+        self.name_rows = {}
+        for row, name in enumerate(self.names):
+            self.name_rows.setdefault(name, []).append(row)
+        team_codes, teams = pd.factorize(df.team.str.lower())
+        self.team_codes = team_codes
+        self.team_code = {team: code for code, team in enumerate(teams)}
+
+    def subset(self, df, keep):
+        """returns the index of df, which holds the rows of this index's dataframe that are True in keep"""
+        return PlayerIndex(df, self.names[keep])
+
+    def rows(self, ids):
+        """returns the rows of a list of player ids"""
+        return np.array([self.id_rows[player_id] for player_id in ids], dtype=np.int64)
+
+    def mask(self, ids):
+        """returns a boolean array that is True for the rows of a list of player ids"""
+        return np.isin(self.ids, ids)
+
+    def select(self, teams={}, ignore_missing=["out_team"], **players):
+        """
+        finds every listed player and team in one pass, returning a dict of each list's name to the ids of its players.
+        The ids of every player in a list of teams are returned in the same way
+        :param teams - dict<str, list<str>>: lists of team names, e.g. {"banned_teams": banned_teams}, which are case insensitive
+        :param ignore_missing - list<str>: lists of players that can contain players who aren't in the data
+        :param players - list<int or str>: lists of player ids and names, e.g. in_team=in_team, out_team=out_team
+        :raises ValueError: listing every name that matches more than one player, and every player or team that isn't in the data
+        """
+        selected, problems = {}, []
+        for label, listed in players.items():
+            rows = []
+            for player in listed:
+                if isinstance(player, str):
+                    matches = self.name_rows.get(normalise_name(player), [])
+                else:
+                    matches = [self.id_rows[player]] if player in self.id_rows else []
+                if len(matches) > 1:
+                    options = ", ".join(str(self.ids[row]) for row in matches)
+                    problems.append(f"{label}: {player!r} matches {len(matches)} players, use one of their ids instead: {options}")
+                elif not matches and label not in ignore_missing:
+                    problems.append(f"{label}: {player!r} is not in the player data")
+                rows += matches[:1]
+            selected[label] = self.ids[rows]
+
+        for label, listed in teams.items():
+            codes = []
+            for team in listed:
+                if team.lower() not in self.team_code:
+                    problems.append(f"{label}: {team!r} is not a team in the player data")
+                codes.append(self.team_code.get(team.lower(), -1))
+            selected[label] = self.ids[np.isin(self.team_codes, codes)]
+
+        if problems:
+            raise ValueError("\n".join(problems))
+        return selected
+
+
+def linear_sum(variables, rows=None, coeffs=None):
+    """
+    builds sum(coeffs[k] * variables[rows[k]]) as a single LinExpr
+    :param variables - list<Var>: the variables to sum over, one per player
+    :param rows - array<int>: the rows of variables to include. If left blank, every row is included
+    :param coeffs - array<float>: a coefficient for every entry in rows. If left blank, every coefficient is 1
+    """
+    if rows is None:
+        rows = range(len(variables))
+    chosen = [variables[i] for i in rows]
+    if coeffs is None:
+        coeffs = np.ones(len(chosen))
+    return LinExpr(variables=chosen, coeffs=np.asarray(coeffs, dtype=float).tolist())
+
+
+def add_team_constraints(model, x, groups, max_from_team, banned_teams=[]):
+    """
+    adds the max_from_team constraint for every team in the player pool, teams being case insensitive
+    :param model - Model: the model to add the constraints to
+    :param x - list<Var>: squad variables, one per player
+    :param groups - PlayerGroups: the indexed player pool that x was created from
+    :param max_from_team - int: the maximum number of players allowed from a single team
+    :param banned_teams - list<str>: list of clubs for whom no players can be picked
+    """
+    banned_teams = [team.lower() for team in banned_teams]
+    for team, rows in zip(groups.teams, groups.team_rows):
+        if team in banned_teams:
+            model += linear_sum(x, rows) == 0
+        else:
+            model += linear_sum(x, rows) <= max_from_team
+
+
+def next_best(model, x, top_k, min_difference=1, start=None, limits=None):
+    """
+    solves a model up to top_k times, yielding the rows of x that are 1 after each solve, so that the caller can also read
+    the rest of the solution. After each solve a cut is added, so that every later solution differs from it in at least
+    min_difference players, and the model is kept rather than built again. Stops early if there are no more solutions
+    :param model - Model: the model to solve, which must fix how many of x are 1
+    :param x - list<Var>: squad variables, one per player
+    :param top_k - int: the most solutions to find
+    :param min_difference - int: the fewest players that any two solutions can differ in
+    :param start - function: given the rows of every solution so far, returns a list of (Var, value) pairs that meets
+        every cut, which the next solve is started from, or None if it can't find one
+    :param limits - Limits: the limits on the solves, with max_seconds covering all of them. Once it runs out, no more solves are started
+    """
+    assert top_k >= 1, "top_k must be at least 1"
+    assert min_difference >= 1, "min_difference must be at least 1"
+    found = []
+    x_cols = columns(x)
+    for k in range(top_k):
+        profiling.phase("solve")
+        if k > 0:
+            if limits is not None and limits.remaining() == 0:
+                return
+            # with a good solution to start from, generating cutting planes costs more than it saves
+            model.cuts = 0
+            model += linear_sum(x, found[-1]) <= len(found[-1]) - min_difference
+            if start is not None:
+                model.start = start(found)
+        if limits is not None:
+            limits.optimize(model)
+        else:
+            model.optimize()
+        profiling.solved(model)
+        if model.num_solutions == 0:
+            return
+        profiling.phase("extract")
+        found.append(np.flatnonzero(read_binary(model, x_cols)[0]))
+        yield found[-1]
+
+
+def identical_pairs(groups, value, pts, fixed_rows=[]):
+    """
+    returns the rows (i, j) of each pair of players who are interchangeable, with the same position, team, value and
+    points in every gameweek, with i before j. Since swapping them changes nothing, only solutions that pick i whenever
+    they pick j need to be searched. Each player is only paired with the next player like them, which orders them all
+    :param groups - PlayerGroups: the indexed player pool
+    :param value - array<float>: the value of each player that counts towards the budget
+    :param pts - array<float>: the points of each player, one column per gameweek
+    :param fixed_rows - list<int>: rows of players that aren't interchangeable with anyone, such as the current squad
+    """
+    free = np.ones(groups.n, dtype=bool)
+    free[np.asarray(fixed_rows, dtype=np.int64)] = False
+    rows = np.flatnonzero(free)
+    key = np.column_stack([groups.pos_codes[rows], groups.team_codes[rows], value[rows], pts[rows].reshape(len(rows), -1)])
+    inverse = np.unique(key, axis=0, return_inverse=True)[1].ravel()
+    order = np.lexsort((rows, inverse))
+    same = inverse[order][1:] == inverse[order][:-1]
+    return rows[order][:-1][same], rows[order][1:][same]
+
+
+def add_transfer_flow(model, x, current_rows=None, free_transfers=1, wildcard=False, max_hits=None):
+    """
+    adds the transfers between each gameweek's squad and the one before it as explicit transfer in and out variables,
+    with the free transfers rolled over from week to week, up to MAX_FREE_TRANSFERS, and a hit for every transfer beyond them.
+    returns a dict of gameweek to the variable counting the hits taken before that gameweek, which the objective should penalise
+    :param model - Model: the model to add the variables and constraints to
+    :param x - list<list<Var>>: squad variables, indexed [gw][player]
+    :param current_rows - array<int>: rows of the players in the current squad. If left blank, the first gameweek's squad
+        can be picked freely, as it can with a wildcard
+    :param free_transfers - int: the number of free transfers available before the first gameweek
+    :param wildcard - bool: denotes whether a wildcard is being played in the first gameweek
+    :param max_hits - int: the most hits that can be taken over the horizon. If left blank, there is no limit
+    """
+    I = range(len(x[0]))
+    hits = {}
+    # the free transfers available before the gameweek, which the solver keeps as high as the rules allow.
+    # hits and free transfers needn't be integers, as they always are once the squads are
+    free = 1 if current_rows is None or wildcard else free_transfers
+    for a in range(len(x)):
+        if a == 0 and (current_rows is None or wildcard):
+            continue
+        if a == 0:
+            transfers = 15 - linear_sum(x[0], current_rows)
+        else:
+            t_in = [model.add_var(ub=1) for i in I]
+            t_out = [model.add_var(ub=1) for i in I]
+            for i in I:
+                model += x[a][i] - x[a - 1][i] == t_in[i] - t_out[i]
+            transfers = linear_sum(t_in)
+        hits[a] = model.add_var()
+        # there is always at least 1 free transfer the week after, so any transfers beyond the free ones are hits
+        free_after = model.add_var(lb=1, ub=MAX_FREE_TRANSFERS)
+        model += free_after <= free - transfers + hits[a] + 1
+        free = free_after
+    if max_hits is not None:
+        model += xsum(hits.values()) <= max_hits
+    return hits
+
+
+def add_symmetry_breaking(model, pairs, *variables):
+    """
+    for every pair (i, j) from identical_pairs(), only lets player j be picked, start or captain in a gameweek if player i does
+    :param pairs - tuple<array<int>>: the rows of each pair of interchangeable players
+    :param variables - list<list<Var>>: the x, y and z variables, indexed [gw][player]
+    """
+    for var in variables:
+        for gw_vars in var:
+            for i, j in zip(*pairs):
+                model += gw_vars[j] <= gw_vars[i]
@@ -1,7 +1,18 @@
 from mip import BINARY, Model, xsum, maximize
+import numpy as np
 import pandas as pd
-import unicodedata
-
+import time
+from heuristic import SquadProblem, report_gap
+from limits import Limits, mark
+from player_data import read_players
+from model_builder import PlayerGroups, PlayerIndex, add_team_constraints, linear_sum, next_best
+from pruning import prune_players, top_k_slots
+from result_cache import cached
+from results import LineupResult
+import profiling
+
+@profiling.instrumented("A")
+@cached("A")
 def optimise(
     filepath="players_data.csv", 
     budget=100, 
@@ -13,10 +24,21 @@ def optimise(
     in_team=[], 
     out_team=[], 
     banned_teams=[],
-    max_from_team=3
+    max_from_team=3,
+    prune=True,
+    solver="mip",
+    top_k=None,
+    min_difference=1,
+    max_seconds=None,
+    max_gap=None,
+    max_nodes=None,
+    on_incumbent=None,
+    show=True,
+    cache=True
     ):
     '''
-    :param filepath - str: the filepath that points to the csv that contains the data you want to optimise
+    :param filepath - str or DataFrame: the filepath that points to the csv that contains the data you want to optimise,
+        or a dataframe that has already been read from it. If the .npz file written alongside the csv is up to date, it is used instead
     :param budget - int or float: the maximum sum of costs allowed in the optimised lineup
     :param teamsize - int: the number of players to include in the optimised lineup
     :param GK, DEF, MID, FWD - int: the number of players of this position to include in the optimised lineup
@@ -24,30 +46,77 @@ def optimise(
     :param out_team - list<int or str>: list of players that must not be included in the optimised lineup
     :param banned_teams - list<str>: list of clubs for whom no players in the optimised 15 man squad can play
     :param max_from_team - int: the maximum number of players from a single team allowed in the optimised lineup
+    :param prune - bool: denotes whether to remove players who can never be in the optimised lineup before building the model
+    :param solver - str: "mip" to solve the model exactly, or "heuristic" for a much faster lineup that may not be optimal,
+        which is compared against the bound from solving the model without its integer constraints
+    :param top_k - int: if given, the top_k best lineups are found with the mip solver instead of just the best one,
+        and returned as a list of LineupResults
+    :param min_difference - int: the fewest players that any two of the top_k lineups can differ in
+    :param max_seconds - float: the most time the call can take, after which the best lineup found so far is used.
+        A lineup that hasn't been proved optimal is marked as such in its solve attribute, see limits.py
+    :param max_gap - float: stop once the best lineup is within this fraction of the bound on the best objective
+    :param max_nodes - int: the most branch and bound nodes to search in each solve
+    :param on_incumbent - function: called as on_incumbent(objective, bound, ids) with the ids of each better lineup found.
+        The limits only apply to the mip solver
+    :param show - bool: denotes whether to print the lineup. Pass False to only return it
+    :param cache - bool: denotes whether to return the result of an earlier call with the same data and arguments if there is one,
+        and to keep this call's result for later calls. Pass False to always solve the model
+
+    returns the optimised lineup as a LineupResult, or a list of the top_k lineups if top_k is given. See results.py
 
     '''
 
-    def remove_accents(input_str):
-        '''a function that removes all diacritics from latin characters'''
-        nfkd_form = unicodedata.normalize('NFKD', input_str)
-        return u"".join([c for c in nfkd_form if not unicodedata.combining(c)])
-    
-    df = pd.read_csv(filepath)
-    names = df.name.str.lower().apply(remove_accents).copy()
+    assert solver in ["mip", "heuristic"], "solver must be either mip or heuristic"
+    assert top_k is None or solver == "mip", "top_k can only be used with the mip solver"
+    limits = Limits(max_seconds, max_gap, max_nodes, on_incumbent)
+
+    profiling.phase("read")
+    df = read_players(filepath)
+
+    # find every player in in_team and out_team, and every banned team, in one pass.
+    # note that using a player's name might run into problems if the name is shared by more than one player,
+    # so using a player's ID in in_team and out_team is also allowed.
+    profiling.phase("prune")
+    index = PlayerIndex(df)
+    selected = index.select(in_team=in_team, out_team=out_team, teams={"banned_teams": banned_teams})
+
+    # remove players in out_team, and players who are beaten on both cost and points by enough others that they can never be picked
+    keep = ~index.mask(selected["out_team"])
+    if prune:
+        slots = {"G": GK or 2, "D": DEF or 5, "M": MID or 5, "F": FWD or 3}
+        keep &= prune_players(
+            df,
+            ["points"],
+            "cost",
+            # with top_k, players who can only be in the runner-up lineups have to be kept as well
+            slots=top_k_slots(slots, top_k, min_difference) if top_k else slots,
+            squad_size=teamsize,
+            max_from_team=max_from_team,
+            keep=index.mask(selected["in_team"]),
+            unavailable=~keep | index.mask(selected["banned_teams"]),
+        )
+    df = df[keep].reset_index(drop=True)
+    index = index.subset(df, keep)
+
     I = range(len(df))
+    groups = PlayerGroups(df)
 
+    profiling.phase("build")
     model = Model()
+    profiling.family(model, "lineup")
 
     # add a binary value to the model for each player that defines if they are picked - 1 for in, 0 for out
     x = [model.add_var(var_type=BINARY) for i in I]
 
     # add objective function - points scored
-    model.objective = maximize(xsum(df.points[i] * x[i] for i in I))
+    model.objective = maximize(linear_sum(x, coeffs=df.points.to_numpy()))
 
     # add budget constraint
-    model += xsum(df.cost[i] * x[i] for i in I) <= budget
+    profiling.family(model, "budget")
+    model += linear_sum(x, coeffs=df.cost.to_numpy()) <= budget
 
     # add teamsize contraint
+    profiling.family(model, "lineup")
     model += xsum(x[i] for i in I) == teamsize
 
     # dict containing min/max num of players by position
@@ -59,57 +128,107 @@ def optimise(
     }
     
     # add constraint of min/max number of players from each position
+    profiling.family(model, "position")
+    lo, hi = [], []
     for pos in ["GK", "DEF", "MID", "FWD"]:
+        rows = groups.pos_rows[pos[0]]
         if eval(pos):
             assert(rules[pos][0] <= eval(pos) <= rules[pos][1]), f"That is not a valid value for {pos}"
-            model += xsum(x[i]for i in I if df.pos[i] == pos[0]) == eval(pos)
+            model += linear_sum(x, rows) == eval(pos)
+            lo.append(eval(pos))
+            hi.append(eval(pos))
         else:
-            model += rules[pos][0] <= xsum(x[i] for i in I if df.pos[i] == pos[0]) 
-            model += xsum(x[i] for i in I if df.pos[i] == pos[0]) <= rules[pos][1]
+            model += rules[pos][0] <= linear_sum(x, rows)
+            model += linear_sum(x, rows) <= rules[pos][1]
+            lo.append(rules[pos][0])
+            hi.append(rules[pos][1])
 
     # add constraint of maximum number of players from each team, teams being case insensitive
-    banned_teams = [x.lower() for x in banned_teams]
-    for team in df.team.unique():
-        team = team.lower()
-        if team in banned_teams:
-            model += xsum(x[i] for i in I if df.team[i].lower() == team) == 0
-        else:
-            model += xsum(x[i] for i in I if df.team[i].lower() == team) <= max_from_team
-
-    # add constraints so that players in in_team must be in the optimised lineup and players in out_team must not be in the optimised lineup.
-    # note that using a player's name might run into problems if the name is shared by more than one player,
-    # so using a player's ID in in_team and out_team is also allowed.
-    for player in in_team:
-        if isinstance(player, str):
-            player = remove_accents(player.lower())
-            model += xsum(x[i] for i in I if names[i] == player) == 1
-        elif isinstance(player, int):
-            model += xsum(x[i] for i in I if df.id[i] == player) == 1
-
-    for player in out_team:
-        if isinstance(player, str):
-            player = remove_accents(player.lower())
-            model += xsum(x[i] for i in I if df.name[i].lower() == player.lower()) == 0
-        elif isinstance(player, int):
-            model += xsum(x[i] for i in I if df.id[i] == player) == 0
-
-    model.optimize()
-
-    result = df.iloc[[i for i in I if x[i].x == 1]].copy()
+    profiling.family(model, "team")
+    add_team_constraints(model, x, groups, max_from_team, banned_teams)
+
+    # add constraints so that players in in_team must be in the optimised lineup
+    profiling.family(model, "locks")
+    for i in index.rows(selected["in_team"]):
+        model += x[i] == 1
+    profiling.family(model, None)
+
+    start_time = time.perf_counter()
+    if solver == "heuristic" or top_k or limits.given:
+        problem = SquadProblem(
+            groups.pos_codes,
+            groups.team_codes,
+            df.cost.to_numpy(),
+            df.points.to_numpy(),
+            budget,
+            lo,
+            hi,
+            teamsize,
+            max_from_team,
+            forced=index.rows(selected["in_team"]),
+            available=~index.mask(selected["banned_teams"]),
+        )
+
+    if solver == "heuristic":
+        profiling.phase("solve")
+        picked, value = problem.solve()
+        seconds = time.perf_counter() - start_time
+        profiling.solved(None, status="HEURISTIC", objective=value)
+        model.optimize(relax=True)
+        profiling.solved(model, relax=True)
+        report_gap(value, model.objective_value, seconds)
+        lineups, objectives = [picked], [float(value)]
+    else:
+
+        def start(found):
+            """starts the next solve from a lineup near the last one that meets every cut so far"""
+            picked, value = problem.next_squad(found, min_difference)
+            return None if picked is None else [(x[i], 1) for i in picked]
+
+        if limits.given:
+            # the heuristic's lineup is there to fall back on if a limit stops the first solve before it finds one
+            picked, value = problem.search()
+            if picked is not None:
+                model.start = [(x[i], 1) for i in picked]
+                limits.offer(value, None, lambda: df.id.to_numpy()[np.sort(picked)].tolist())
+
+        lineups, objectives, solves = [], [], []
+        for picked in next_best(model, x, top_k or 1, min_difference, start if top_k else None, limits):
+            lineups.append(picked)
+            objectives.append(model.objective_value)
+            limits.offer(model.objective_value, model.objective_bound, lambda: df.id.to_numpy()[picked].tolist())
+            solves.append(limits.outcome(model))
+        assert lineups, "there is no lineup that meets every constraint"
+
+    if top_k:
+        print(f"Found {len(lineups)} lineups in {time.perf_counter() - start_time:.2f} s\n")
+    profiling.phase("output")
+    results = [LineupResult(lineup_frame(df, picked), objective) for picked, objective in zip(lineups, objectives)]
+    if show:
+        for result in results:
+            result.show()
+    if limits.given and solver == "mip":
+        results = [mark(result, solve) for result, solve in zip(results, solves)]
+    return results if top_k else results[0]
+
+
+def lineup_frame(df, picked):
+    """returns the players in the rows picked of df as a dataframe, sorted by position and then points"""
+    result = df.iloc[np.sort(picked)].copy()
 
     result.pos = pd.Categorical(result.pos, categories=["G", "D", "M", "F"])
     result = result.sort_values(by=["pos", "points"], ascending=[True, False])
 
     result = result.reset_index(drop=True)
     result.index += 1
-
-    print(result)
-    print(f"\nTotal cost: £{result.cost.sum()}m")
-    print(f"Total points: {result.points.sum()}\n")
+    return result
 
 
-# example:
-optimise(
-    budget=83,
-    teamsize=11
-    )
+if __name__ == "__main__":
+    # pass --profile to write how long each phase of the run took, and the solver's statistics, as json
+    with profiling.profile_from_args():
+        # example:
+        optimise(
+            budget=83,
+            teamsize=11
+            )
@@ -1,8 +1,21 @@
 from mip import BINARY, Model, xsum, maximize
+import numpy as np
 import pandas as pd
-import unicodedata
+import time
+from branch_and_bound import BranchAndBound
+from heuristic import SQUAD_COUNTS, SquadProblem, formations, report_gap
+from limits import OPTIMAL_GAP, Limits, mark
+from model_builder import PlayerGroups, PlayerIndex, add_team_constraints, linear_sum, next_best
+from player_data import read_players
+import profiling
+from pruning import prune_players, top_k_slots
+from result_cache import cached
+from results import SquadResult, columns, read_binary
+import scenarios as sc
 
 
+@profiling.instrumented("B")
+@cached("B")
 def optimise(
     filepath="players_data.csv",
     col_to_max="points",
@@ -18,9 +31,24 @@ def optimise(
     out_team=[],
     banned_teams=[],
     max_from_team=3,
+    prune=True,
+    solver="mip",
+    top_k=None,
+    min_difference=1,
+    max_seconds=None,
+    max_gap=None,
+    max_nodes=None,
+    on_incumbent=None,
+    scenarios=None,
+    cvar_alpha=None,
+    risk_weight=0.5,
+    seed=0,
+    show=True,
+    cache=True,
 ):
     """
-    :param filepath - str: the filepath that points to the csv that contains the data you want to optimise
+    :param filepath - str or DataFrame: the filepath that points to the csv that contains the data you want to optimise,
+        or a dataframe that has already been read from it. If the .npz file written alongside the csv is up to date, it is used instead
     :param col_to_max - str: the name of the column in the csv that will be maximised
     :param budget - int or float: the maximum sum of costs allowed in the optimised 15 man squad
     :param captain - bool: denotes whether to consider that the captain's points get doubled when calculating the optimised 15 man squad
@@ -32,19 +60,86 @@ def optimise(
     :param out_team - list<int or str>: list of players that must not be included in the optimised 15 man squad
     :param banned_teams - list<str>: list of clubs for whom no players in the optimised 15 man squad can play
     :param max_from_team - int: maximum number of players allowed from a single team
+    :param prune - bool: denotes whether to remove players who can never be in the optimised 15 man squad before building the model
+    :param solver - str: "mip" to solve the model exactly, "heuristic" for a much faster squad that may not be optimal,
+        which is compared against the bound from solving the model without its integer constraints, or "branch_and_bound"
+        to solve it exactly without a mip solver. Both of the others need a bench_strength of no more than 0.5
+    :param top_k - int: if given, the top_k best squads are found with the mip solver instead of just the best one
+    :param min_difference - int: the fewest players that any two of the top_k squads can differ in
+    :param max_seconds - float: the most time the call can take, after which the best squad found so far is returned.
+        A squad that hasn't been proved optimal is marked as such in its attrs, see limits.py
+    :param max_gap - float: stop once the best squad is within this fraction of the bound on the best objective
+    :param max_nodes - int: the most branch and bound nodes to search in each solve
+    :param on_incumbent - function: called as on_incumbent(objective, bound, ids) with the ids of each better squad found
+    The limits apply to the mip and branch_and_bound solvers
+    :param scenarios - int: if given, this many points scenarios are drawn for every player, see scenarios.py,
+        and the squad maximises their average instead of col_to_max. Only the mip solver can be used with scenarios
+    :param cvar_alpha - float: if given with scenarios, the objective is (1 - risk_weight) times the average plus risk_weight
+        times the average of the worst cvar_alpha of the scenarios, so that squads which can score very few points are avoided
+    :param risk_weight - float: a number between 0 and 1 inclusive that denotes how much of the objective is the CVaR
+    :param seed - int: the seed that the scenarios are drawn with
+    :param show - bool: denotes whether to print the squad. Pass False to only return it
+    :param cache - bool: denotes whether to return the result of an earlier call with the same data and arguments if there is one,
+        and to keep this call's result for later calls. Pass False to always solve the model
 
+    returns the optimised squad as a SquadResult, whose squad dataframe has the starting 11 first, or a list of the top_k squads
+    if top_k is given. See results.py
     """
 
-    def remove_accents(input_str):
-        """a function that removes all diacritics from latin characters"""
-        nfkd_form = unicodedata.normalize("NFKD", input_str)
-        return "".join([c for c in nfkd_form if not unicodedata.combining(c)])
+    assert solver in ["mip", "heuristic", "branch_and_bound"], "solver must be one of mip, heuristic or branch_and_bound"
+    assert top_k is None or solver == "mip", "top_k can only be used with the mip solver"
+    assert scenarios is None or solver == "mip", "scenarios can only be used with the mip solver"
+    assert cvar_alpha is None or scenarios, "cvar_alpha needs scenarios to be given"
+    assert 0 <= risk_weight <= 1, "risk_weight must be between 0 and 1 inclusive"
+    limits = Limits(max_seconds, max_gap, max_nodes, on_incumbent)
+
+    profiling.phase("read")
+    df = read_players(filepath)
+
+    # find every listed player and banned team in one pass.
+    # note that using a player's name might run into problems if the name is shared by more than one player,
+    # so using a player's ID is also allowed.
+    profiling.phase("prune")
+    index = PlayerIndex(df)
+    selected = index.select(
+        in_team=in_team,
+        starting=starting,
+        on_bench=on_bench,
+        out_team=out_team,
+        teams={"banned_teams": banned_teams},
+    )
+
+    # remove players in out_team, and players who are beaten on both cost and points by enough others that they can never be picked
+    keep = ~index.mask(selected["out_team"])
+    if scenarios:
+        # the scenarios are drawn for every player, so that the same seed draws the same points whatever is pruned
+        draws = sc.draw(df[[col_to_max]].to_numpy(dtype=float), sc.spread(df, [col_to_max]), scenarios, seed)
+    if prune:
+        slots = {"G": 2, "D": 5, "M": 5, "F": 3}
+        keep &= prune_players(
+            df,
+            # with the CVaR, a player has to be beaten in every scenario to be beaten on the objective
+            (draws[:, :, 0].T if cvar_alpha else draws.mean(axis=0)) if scenarios else [col_to_max],
+            "cost",
+            # with top_k, players who can only be in the runner-up squads have to be kept as well
+            slots=top_k_slots(slots, top_k, min_difference) if top_k else slots,
+            max_from_team=max_from_team,
+            keep=index.mask(selected["in_team"]) | index.mask(selected["starting"]) | index.mask(selected["on_bench"]),
+            unavailable=~keep | index.mask(selected["banned_teams"]),
+        )
+    df = df[keep].reset_index(drop=True)
+    index = index.subset(df, keep)
 
-    df = pd.read_csv(filepath)
     df.points = df.points / 1000
-    names = df.name.str.lower().apply(remove_accents)
     I = range(len(df))
+    groups = PlayerGroups(df)
+    pts = df[col_to_max].to_numpy()
+    if scenarios:
+        draws = draws[:, keep] / (1000 if col_to_max == "points" else 1)
+        pts = draws.mean(axis=0)[:, 0]
+    profiling.phase("build")
     model = Model()
+    profiling.family(model, "squad")
 
     # add a binary value to the model for each player that defines if they are in the 15 man squad - 1 for in, 0 for out
     x = [model.add_var(var_type=BINARY) for i in I]
@@ -53,7 +148,7 @@ def optimise(
     y = [model.add_var(var_type=BINARY) for i in I]
 
     # ensure y only contains 11 players
-    model += xsum(y[i] for i in I) == 11
+    model += linear_sum(y) == 11
 
     # ensure players in y are also in x
     for i in I:
@@ -62,20 +157,13 @@ def optimise(
     # add constraints for the captain if necessary
     z = [model.add_var(var_type=BINARY) for i in I]
     if captain:
-        model += xsum(z[i] for i in I) == 1
+        model += linear_sum(z) == 1
         for i in I:
             model += y[i] >= z[i]
 
     # add constraint of maximum number of players from each team, teams being case insensitive
-    banned_teams = [x.lower() for x in banned_teams]
-    for team in df.team.unique():
-        team = team.lower()
-        if team in banned_teams:
-            model += xsum(x[i] for i in I if df.team[i].lower() == team) == 0
-        else:
-            model += (
-                xsum(x[i] for i in I if df.team[i].lower() == team) <= max_from_team
-            )
+    profiling.family(model, "team")
+    add_team_constraints(model, x, groups, max_from_team, banned_teams)
 
     # dict containing min/max num of players by position
     rules = {
@@ -85,80 +173,163 @@ def optimise(
     }
 
     # add position constraints
-    model += xsum(x[i] for i in I if df.pos[i] == "G") == 2
-    model += xsum(y[i] for i in I if df.pos[i] == "G") == 1
+    profiling.family(model, "position")
+    model += linear_sum(x, groups.pos_rows["G"]) == 2
+    model += linear_sum(y, groups.pos_rows["G"]) == 1
     for pos in ["DEF", "MID", "FWD"]:
-        model += xsum(x[i] for i in I if df.pos[i] == pos[0]) == rules[pos][1]
+        rows = groups.pos_rows[pos[0]]
+        model += linear_sum(x, rows) == rules[pos][1]
         if eval(pos):
             assert (
                 rules[pos][0] <= eval(pos) <= rules[pos][1]
             ), f"That is not a valid value for {pos}"
-            model += xsum(y[i] for i in I if df.pos[i] == pos[0]) == eval(pos)
+            model += linear_sum(y, rows) == eval(pos)
         else:
-            model += (
-                rules[pos][0]
-                <= xsum(y[i] for i in I if df.pos[i] == pos[0])
-                <= rules[pos][1]
-            )
+            model += linear_sum(y, rows) >= rules[pos][0]
+            model += linear_sum(y, rows) <= rules[pos][1]
 
     # add budget constraint
-    model += xsum(df.cost[i] * x[i] for i in I) <= budget
+    profiling.family(model, "budget")
+    model += linear_sum(x, coeffs=df.cost.to_numpy()) <= budget
 
-    # add constraints for in_team, on_bench, and out_team
-    # note that using a player's name might run into problems if the name is shared by more than one player,
-    # so using a player's ID is also allowed.
-    for player in in_team:
-        if isinstance(player, str):
-            player = remove_accents(player.lower())
-            model += xsum(x[i] for i in I if names[i] == player) == 1
-        elif isinstance(player, int):
-            model += xsum(x[i] for i in I if df.id[i] == player) == 1
-
-    for player in starting:
-        if isinstance(player, str):
-            player = remove_accents(player.lower())
-            model += xsum(x[i] for i in I if names[i] == player) == 1
-            model += xsum(y[i] for i in I if names[i] == player) == 1
-        elif isinstance(player, int):
-            model += xsum(x[i] for i in I if df.id[i] == player) == 1
-            model += xsum(y[i] for i in I if df.id[i] == player) == 1
-
-    for player in on_bench:
-        if isinstance(player, str):
-            player = remove_accents(player.lower())
-            model += xsum(x[i] for i in I if names[i] == player) == 1
-            model += xsum(y[i] for i in I if names[i] == player) == 0
-        elif isinstance(player, int):
-            model += xsum(x[i] for i in I if df.id[i] == player) == 1
-            model += xsum(y[i] for i in I if df.id[i] == player) == 0
-
-    for player in out_team:
-        player = remove_accents(player.lower())
-        if isinstance(player, str):
-            model += xsum(x[i] for i in I if names[i] == player) == 0
-        elif isinstance(player, int):
-            model += xsum(x[i] for i in I if df.id[i] == player) == 0
+    # add constraints for in_team, starting and on_bench
+    profiling.family(model, "locks")
+    for i in index.rows(selected["in_team"]):
+        model += x[i] == 1
+
+    for i in index.rows(selected["starting"]):
+        model += x[i] == 1
+        model += y[i] == 1
+
+    for i in index.rows(selected["on_bench"]):
+        model += x[i] == 1
+        model += y[i] == 0
 
     # add objective function - points scored by starting 11 + points scored by the bench,
     # with the weight of each term defined by the user in bench_strength
     assert 0 <= bench_strength <= 1, "that is not a valid value for bench strength"
 
     model.objective = maximize(
-        (1 - bench_strength) * xsum(df[col_to_max][i] * y[i] for i in I)
-        + bench_strength
-        * (
-            xsum(df[col_to_max][i] * x[i] for i in I)
-            - xsum(df[col_to_max][i] * y[i] for i in I)
-        )
-        + (1 - bench_strength) * xsum(df[col_to_max][i] * z[i] for i in I) * captain
+        (1 - bench_strength) * linear_sum(y, coeffs=pts)
+        + bench_strength * (linear_sum(x, coeffs=pts) - linear_sum(y, coeffs=pts))
+        + (1 - bench_strength) * linear_sum(z, coeffs=pts) * captain
     )
+    if cvar_alpha:
+        # each scenario's objective is the average objective plus how far each player's points are from their average
+        deviations = sc.deviations(draws, pts[:, None], bench_strength, 1, captain)
+        cvar = sc.add_cvar(model, y + z + x, deviations, model.objective, cvar_alpha)
+        model.objective = maximize((1 - risk_weight) * model.objective + risk_weight * cvar)
+    profiling.family(model, None)
 
-    model.optimize()
+    start_time = time.perf_counter()
+    if solver != "mip" or top_k or limits.given:
+        problem = SquadProblem(
+            groups.pos_codes,
+            groups.team_codes,
+            df.cost.to_numpy(),
+            pts,
+            budget,
+            SQUAD_COUNTS,
+            SQUAD_COUNTS,
+            15,
+            max_from_team,
+            forced=index.rows(np.unique(np.concatenate([selected["in_team"], selected["starting"], selected["on_bench"]]))),
+            available=~index.mask(selected["banned_teams"]),
+            lineup={
+                "formations": formations(DEF, MID, FWD),
+                "bench_strength": bench_strength,
+                "captain": captain,
+                "starting": index.rows(selected["starting"]),
+                "on_bench": index.rows(selected["on_bench"]),
+            },
+        )
+
+    # the rows of the starting 11, the bench and the captain of each squad found, and its objective and when it was found
+    lineups, objectives, found_at = [], [], []
+    # how each squad's solve ended, if it was limited
+    solves = []
+    if solver == "mip":
+
+        def start(found):
+            """starts the next solve from a squad near the last one that meets every cut so far"""
+            squad, value = problem.next_squad(found, min_difference)
+            if squad is None:
+                return None
+            start_i, captain_i = problem.lineup_of(squad)
+            return [(x[i], 1) for i in squad] + [(y[i], 1) for i in start_i] + ([(z[captain_i], 1)] if captain else [])
+
+        if limits.given:
+            # the heuristic's squad is there to fall back on if a limit stops the first solve before it finds one
+            squad, value = problem.search()
+            if squad is not None:
+                start_i, captain_i = problem.lineup_of(squad)
+                model.start = [(x[i], 1) for i in squad] + [(y[i], 1) for i in start_i] + ([(z[captain_i], 1)] if captain else [])
+                if cvar_alpha:
+                    # the heuristic only knows the average points, so its squad's objective is scored against the scenarios
+                    lineup = np.zeros((3, 1, len(df)), dtype=bool)
+                    lineup[0, 0, squad], lineup[1, 0, start_i], lineup[2, 0, captain_i] = True, True, True
+                    scores = sc.lineup_scores(draws, *lineup, bench_strength, 1, captain)
+                    value = float(sc.blended(scores[:, None], cvar_alpha, risk_weight)[0])
+                limits.offer(value, None, lambda: df.id.to_numpy()[np.sort(squad)].tolist())
+
+        y_cols, z_cols = columns(y), columns(z)
+        for squad in next_best(model, x, top_k or 1, min_difference, start if top_k else None, limits):
+            in_y, in_z = read_binary(model, y_cols, z_cols)
+            start_i = np.flatnonzero(in_y)
+            captain_i = int(np.flatnonzero(in_z)[0]) if captain else None
+            lineups.append((start_i, np.setdiff1d(squad, start_i), captain_i))
+            objectives.append(model.objective_value)
+            found_at.append(time.perf_counter() - start_time)
+            limits.offer(model.objective_value, model.objective_bound, lambda: df.id.to_numpy()[squad].tolist())
+            solves.append(limits.outcome(model))
+        assert lineups, "there is no squad that meets every constraint"
+    else:
+        profiling.phase("solve")
+        if solver == "heuristic":
+            squad, value = problem.solve()
+            seconds = time.perf_counter() - start_time
+            profiling.solved(None, status="HEURISTIC", objective=value)
+            model.optimize(relax=True)
+            profiling.solved(model, relax=True)
+            report_gap(value, model.objective_value, seconds)
+        else:
+            engine = BranchAndBound(problem)
+            squad, value = engine.solve(
+                gap=1e-6 if max_gap is None else max_gap,
+                max_seconds=limits.remaining(),
+                max_nodes=max_nodes,
+                on_incumbent=lambda squad, value, bound: limits.offer(value, bound if np.isfinite(bound) else None, lambda: df.id.to_numpy()[np.sort(squad)].tolist()),
+            )
+            # as mip measures the gap, so that a best value of 0 doesn't divide by 0
+            gap = float((engine.bound - value) / max(abs(value), 1e-10))
+            solves.append({"status": "OPTIMAL" if gap <= OPTIMAL_GAP else "FEASIBLE", "objective": float(value), "bound": float(engine.bound), "gap": gap})
+            profiling.solved(None, nodes=engine.nodes, **solves[-1])
+            print(f"{'Optimal objective' if solves[-1]['status'] == 'OPTIMAL' else 'Objective'} {value:.4f} found in {(time.perf_counter() - start_time) * 1000:.0f} ms, searching {engine.nodes} nodes\n")
+        start_i, captain_i = problem.lineup_of(squad)
+        lineups.append((np.sort(start_i), np.sort(np.setdiff1d(squad, start_i)), captain_i))
+        objectives.append(float(value))
+        found_at.append(time.perf_counter() - start_time)
+
+    if top_k:
+        print(f"Found {len(lineups)} squads in {time.perf_counter() - start_time:.2f} s\n")
+    profiling.phase("output")
+    results = [squad_result(df, *lineup, objective, seconds, col_to_max) for lineup, objective, seconds in zip(lineups, objectives, found_at)]
+    if show:
+        for result in results:
+            result.show()
+    # the heuristic doesn't take the limits, so there is no solve to mark its squad with
+    if limits.given and solver != "heuristic":
+        results = [mark(result, solve) for result, solve in zip(results, solves)]
+    return results if top_k else results[0]
 
-    start_i = [i for i in I if y[i].x == 1]
-    start = df.iloc[start_i].copy()
 
-    bench_i = [i for i in I if x[i].x == 1 and y[i].x == 0]
+def squad_frame(df, start_i, bench_i, captain_i):
+    """
+    returns a squad as a dataframe, with the starting 11 first and the captain's points doubled
+    :param start_i, bench_i - list<int>: the rows of df in the starting 11 and on the bench
+    :param captain_i - int: the row of df of the captain, or None if the captain isn't being considered
+    """
+    start = df.iloc[start_i].copy()
     bench = df.iloc[bench_i].copy()
 
     start.pos = pd.Categorical(start.pos, categories=["G", "D", "M", "F"])
@@ -167,26 +338,37 @@ def optimise(
     bench.pos = pd.Categorical(bench.pos, categories=["G", "D", "M", "F"])
     bench = bench.sort_values(by=["pos", "points"], ascending=[True, False])
 
-    if captain:
-        captain_i = [i for i in I if z[i].x == 1][0]
+    if captain_i is not None:
         start.loc[captain_i, "name"] += " (c)"
         start.loc[captain_i, "points"] *= 2
 
     result = pd.concat([start, bench])
     result = result.reset_index(drop=True)
     result.index += 1
+    return result
 
-    print(result.loc[:, ["id", "team", "pos", "name", "cost", col_to_max]])
-    print(f"\nTotal cost: £{result.cost.sum()}m")
-    print(
-        f"Total points: {start.points.sum():.2f} (+{bench.points.sum():.2f} on the bench)\n"
-    )
 
+def squad_result(df, start_i, bench_i, captain_i, objective, seconds, col_to_max="points"):
+    """returns a squad as a SquadResult. All other parameters are as in squad_frame() and SquadResult"""
+    ids = df.id.to_numpy()
+    return SquadResult(
+        squad=squad_frame(df, start_i, bench_i, captain_i),
+        starting=ids[start_i],
+        bench=ids[bench_i],
+        captain=None if captain_i is None else int(ids[captain_i]),
+        objective=objective,
+        cost=float(df.cost.to_numpy()[np.append(start_i, bench_i).astype(np.int64)].sum()),
+        seconds=seconds,
+        col_to_max=col_to_max,
+    )
 
-optimise(
-    filepath="fplreview_1-5.csv",
-    # DEF=4,
-    # in_team=["van Dijk", "vinagre", "jimenez"],
-    # out_team=["Lundstram"],
-    # banned_teams=["Burnley", "Aston Villa", "Man Utd"],
-)
+if __name__ == "__main__":
+    # pass --profile to write how long each phase of the run took, and the solver's statistics, as json
+    with profiling.profile_from_args():
+        optimise(
+            filepath="fplreview_1-5.csv",
+            # DEF=4,
+            # in_team=["van Dijk", "vinagre", "jimenez"],
+            # out_team=["Lundstram"],
+            # banned_teams=["Burnley", "Aston Villa", "Man Utd"],
+        )
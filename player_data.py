@@ -0,0 +1,103 @@
+"""
+Reading and writing player data in a typed columnar format alongside the csv files.
+
+The .npz file holds the ids as int32, team and pos as integer codes with their names stored once,
+player names as one block of utf-8 with the offset of each name, every points column as a single float32 matrix, and any other numeric columns with their own types.
+It is written uncompressed, so each array can be memory-mapped straight out of the file instead of
+being parsed, and only the parts of the points matrix that an optimiser uses are ever read from disk.
+"""
+import os
+import struct
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+
+def is_pts_col(col):
+    """returns whether a column holds a gameweek's points, which are stored together in the float32 points matrix"""
+    return col.endswith("_pts")
+
+
+def save_players(df, path):
+    """
+    saves player data as an uncompressed .npz file that load_players can memory-map
+    :param df - DataFrame: the player data, with id, team, pos and name columns and any number of numeric columns
+    :param path - str: the file to save to, which should end in .npz
+    """
+    arrays = {"columns": np.array(df.columns, dtype=str), "id": df.id.to_numpy(dtype=np.int32)}
+    for col in ["team", "pos"]:
+        codes, categories = pd.factorize(df[col])
+        arrays[f"{col}_codes"] = codes.astype(np.int16)
+        arrays[f"{col}_categories"] = np.array(categories, dtype=str)
+    encoded = [name.encode("utf-8") for name in df.name]
+    arrays["name_bytes"] = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    arrays["name_offsets"] = np.cumsum([0] + [len(name) for name in encoded]).astype(np.int64)
+
+    pts_cols = [col for col in df.columns if is_pts_col(col)]
+    arrays["pts_cols"] = np.array(pts_cols, dtype=str)
+    arrays["pts"] = df[pts_cols].to_numpy(dtype=np.float32)
+    for col in df.columns:
+        if col not in ["id", "team", "pos", "name"] + pts_cols:
+            arrays[f"col_{col}"] = df[col].to_numpy()
+    np.savez(path, **arrays)
+
+
+def memmap_npz(path):
+    """returns a dict of every array in an uncompressed .npz file, each memory-mapped rather than read into memory"""
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for info in archive.infolist():
+            assert info.compress_type == zipfile.ZIP_STORED, f"{path} is compressed, so it can't be memory-mapped"
+            # the local header's extra field can differ from the central directory's, so read its length from the file
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = struct.unpack("<HH", f.read(4))
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            if np.lib.format.read_magic(f) == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            arrays[info.filename[: -len(".npy")]] = np.memmap(
+                path, dtype, "r", f.tell(), shape, "F" if fortran_order else "C"
+            )
+    return arrays
+
+
+def load_players(path):
+    """
+    loads a file written by save_players as a DataFrame with the same columns as the csv, except that the points columns
+    come last. team and pos are categorical, and the points columns share the memory-mapped float32 points matrix
+    """
+    arrays = memmap_npz(path)
+    pts_cols = arrays["pts_cols"].tolist()
+    columns = {}
+    for col in arrays["columns"].tolist():
+        if col in ["team", "pos"]:
+            columns[col] = pd.Categorical.from_codes(arrays[f"{col}_codes"], arrays[f"{col}_categories"].tolist())
+        elif col == "name":
+            names, offsets = arrays["name_bytes"].tobytes(), arrays["name_offsets"].tolist()
+            columns[col] = [names[a:b].decode("utf-8") for a, b in zip(offsets[:-1], offsets[1:])]
+        elif col == "id":
+            columns[col] = np.asarray(arrays["id"])
+        elif col not in pts_cols:
+            columns[col] = np.asarray(arrays[f"col_{col}"])
+
+    pts = pd.DataFrame(np.asarray(arrays["pts"]), columns=pts_cols, copy=False)
+    return pd.concat([pd.DataFrame(columns), pts], axis=1)
+
+
+def read_players(filepath):
+    """
+    returns the player data for an optimiser
+    :param filepath - str or DataFrame: a .npz or .csv file, or a dataframe that has already been read from one, which is copied.
+        A .csv file is read from the .npz file next to it instead, as long as the .npz file is at least as new as the csv
+    """
+    if isinstance(filepath, pd.DataFrame):
+        return filepath.copy()
+    root, ext = os.path.splitext(filepath)
+    if ext == ".npz":
+        return load_players(filepath)
+    columnar = root + ".npz"
+    if os.path.exists(columnar) and os.path.getmtime(columnar) >= os.path.getmtime(filepath):
+        return load_players(columnar)
+    return pd.read_csv(filepath)
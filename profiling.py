@@ -0,0 +1,256 @@
+"""
+Timing and solver statistics for optimiser runs.
+
+While a hook is registered, each optimise call records the wall and CPU time of each phase of the
+run, such as reading the data, building the model, solving it and printing the squads, the number
+of variables and constraints in each family of constraints, summed over every model the run builds,
+and the solver's status, objective, bound, gap and node count for every solve. When the call returns, the record is passed to every
+hook as a dict that can be written as json. With no hook registered, nothing is recorded.
+
+    records = []
+    profiling.add_hook(records.append)
+
+or, from the command line, `python optimiser_B.py --profile profile.jsonl` appends each run's record
+to a file as a line of json, and `--profile` on its own writes it to stderr.
+"""
+import argparse
+import contextlib
+import contextvars
+import functools
+import inspect
+import json
+import sys
+import time
+
+import pandas as pd
+
+_hooks = []
+# the Profile of the run in progress, if any
+_current = contextvars.ContextVar("profile", default=None)
+
+try:
+    import cffi
+    from mip.cbc import libfile
+
+    _ffi = cffi.FFI()
+    _ffi.cdef("int Cbc_getNodeCount(void *model); int Cbc_getIterationCount(void *model);")
+    _cbc = _ffi.dlopen(libfile)
+except (ImportError, OSError, AttributeError):
+    # python-mip doesn't expose CBC's node count, so it is read from the library, which other builds may not allow
+    _cbc = None
+
+
+def _clock():
+    return time.perf_counter(), time.process_time()
+
+
+class Profile:
+    """
+    the record of one optimise call
+    :param optimiser - str: the name of the optimiser
+    :param params - dict: the arguments it was called with
+    """
+
+    def __init__(self, optimiser, params):
+        self.optimiser = optimiser
+        self.params = {name: _describe(value) for name, value in params.items()}
+        self.phases = {}
+        self.families = {}
+        self.solves = []
+        self.notes = {}
+        self.started = time.time()
+        self._start = _clock()
+        self._phase = None
+        self._family = None
+
+    def phase(self, name):
+        """ends the current phase and starts another. A phase that is started more than once adds up its time"""
+        now = _clock()
+        if self._phase is not None:
+            name_, (wall, cpu) = self._phase
+            timing = self.phases.setdefault(name_, {"wall_s": 0.0, "cpu_s": 0.0, "calls": 0})
+            timing["wall_s"] += now[0] - wall
+            timing["cpu_s"] += now[1] - cpu
+            timing["calls"] += 1
+        self._phase = None if name is None else (name, now)
+        self.family(None, None)
+
+    def family(self, model, name):
+        """
+        counts the variables and constraints added to model from now on towards a family, until the next call
+        :param model - Model or SparseModel: the model being built
+        :param name - str: the family, or None to stop counting
+        """
+        if self._family is not None:
+            name_, model_, cols, rows = self._family
+            counts = self.families.setdefault(name_, {"vars": 0, "constrs": 0})
+            counts["vars"] += model_.num_cols - cols
+            counts["constrs"] += model_.num_rows - rows
+        self._family = None if name is None else (name, model, model.num_cols, model.num_rows)
+
+    def solved(self, model, relax=False, **stats):
+        """
+        records a solve of a model, with any stats given overriding those read from the model
+        :param model - Model: the model just solved, or None for a solver that doesn't use one
+        :param relax - bool: denotes whether the model was solved without its integer constraints, which has no search tree
+        """
+        solve = {}
+        if model is not None:
+            solve = {
+                "status": model.status.name,
+                "objective": model.objective_value,
+                "bound": model.objective_bound,
+                "gap": model.gap if model.num_solutions else None,
+                "nodes": None,
+                "iterations": None,
+                "num_vars": model.num_cols,
+                "num_constrs": model.num_rows,
+                "num_nz": model.num_nz,
+                "relax": relax,
+            }
+            # CBC aborts if asked for the node count of a relaxation
+            if _cbc is not None and model.solver_name.upper() == "CBC" and not relax:
+                solve["nodes"] = _cbc.Cbc_getNodeCount(model.solver._model)
+                solve["iterations"] = _cbc.Cbc_getIterationCount(model.solver._model)
+        solve.update(stats)
+        self.solves.append(solve)
+
+    def record(self, error=None):
+        """ends the last phase and returns everything recorded as a dict"""
+        self.phase(None)
+        wall, cpu = _clock()
+        return {
+            "optimiser": self.optimiser,
+            "params": self.params,
+            "started": self.started,
+            "wall_s": wall - self._start[0],
+            "cpu_s": cpu - self._start[1],
+            "phases": self.phases,
+            "families": self.families,
+            "solves": self.solves,
+            **self.notes,
+            "error": error,
+        }
+
+
+def _describe(value):
+    """returns an argument in a form that can be written as json"""
+    if isinstance(value, pd.DataFrame):
+        return f"DataFrame with {len(value)} rows"
+    if isinstance(value, (list, tuple, set)):
+        return [_describe(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _describe(v) for k, v in value.items()}
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if hasattr(value, "item"):
+        return value.item()
+    return repr(value)
+
+
+def phase(name):
+    """ends the current phase of the run in progress and starts another, if the run is being profiled"""
+    profile = _current.get()
+    if profile is not None:
+        profile.phase(name)
+
+
+def family(model, name):
+    """counts what is added to model towards a family of constraints, if the run in progress is being profiled"""
+    profile = _current.get()
+    if profile is not None:
+        profile.family(model, name)
+
+
+def solved(model, relax=False, **stats):
+    """records a solve, if the run in progress is being profiled"""
+    profile = _current.get()
+    if profile is not None:
+        profile.solved(model, relax, **stats)
+
+
+def note(key, value):
+    """adds a value to the record of the run in progress, if it is being profiled"""
+    profile = _current.get()
+    if profile is not None:
+        profile.notes[key] = value
+
+
+def add_hook(hook):
+    """:param hook - function: called with the record of every optimise call from now on"""
+    _hooks.append(hook)
+
+
+def remove_hook(hook):
+    _hooks.remove(hook)
+
+
+@contextlib.contextmanager
+def profiled():
+    """returns a list that the records of every optimise call inside the with block are added to"""
+    records = []
+    add_hook(records.append)
+    try:
+        yield records
+    finally:
+        remove_hook(records.append)
+
+
+def instrumented(optimiser):
+    """
+    decorates an optimise function so that its calls are profiled while a hook is registered
+    :param optimiser - str: the name of the optimiser in its records
+    """
+
+    def decorate(optimise):
+        signature = inspect.signature(optimise)
+
+        @functools.wraps(optimise)
+        def wrapper(*args, **kwargs):
+            if not _hooks:
+                return optimise(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            profile = Profile(optimiser, bound.arguments)
+            token = _current.set(profile)
+            error = None
+            try:
+                return optimise(*args, **kwargs)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                _current.reset(token)
+                record = profile.record(error)
+                for hook in list(_hooks):
+                    hook(record)
+
+        return wrapper
+
+    return decorate
+
+
+@contextlib.contextmanager
+def profile_from_args():
+    """
+    writes the record of every optimise call inside the with block as a line of json if the script was run with --profile,
+    to the file named after it, or to stderr if no file is named
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--profile", nargs="?", const="-", help="append a json record of each run to this file, or stderr")
+    path = parser.parse_known_args()[0].profile
+    if path is None:
+        yield
+        return
+
+    with open(path, "a") if path != "-" else contextlib.nullcontext(sys.stderr) as out:
+
+        def write(record):
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+
+        add_hook(write)
+        try:
+            yield
+        finally:
+            remove_hook(write)
@@ -0,0 +1,137 @@
+"""
+Removing players who can never be part of an optimal squad, before any variables are created.
+
+A player is dominated by another player in the same position who costs no more and is projected
+at least as many points in every gameweek being optimised. If a player has enough dominators that
+one of them can always be swapped in for them, whatever else is in the squad, then removing the
+player doesn't change the optimum. Enough has to allow for dominators who are already in the squad
+(one for each other slot in the position, plus one for each player that could be transferred in
+over the horizon) and for dominators whose team is already full. Dominators from other teams only
+count once per team, and every team that could be full adds one more to the number needed.
+"""
+import numpy as np
+from model_builder import POSITIONS, PlayerGroups
+
+# the most entries of the (players, players, columns) comparisons to hold at once, as there can be thousands of columns with scenarios
+CHUNK_SIZE = 2**22
+
+
+def beaten_by(cost, pts, available):
+    """
+    returns beats[q, p], which is True if q costs no more than p and scores at least as much in every column, for players
+    in the same position. Identical players only beat the ones after them, so that they can't all remove each other
+    :param cost - array<float>: the cost of each player
+    :param pts - array<float>: the points of each player, with one row per player
+    :param available - array<bool>: players that can be swapped in, who are the only ones that can beat anyone
+    """
+    m, num_cols = pts.shape
+    order = np.arange(m)
+    beats = np.empty((m, m), dtype=bool)
+    # compare a block of rows with every player at a time, so that memory doesn't grow with players squared times columns
+    step = max(CHUNK_SIZE // max(m * num_cols, 1), 1)
+    for start in range(0, m, step):
+        q = slice(start, start + step)
+        at_least = (cost[q, None] <= cost[None, :]) & (pts[q, None, :] >= pts[None, :, :]).all(axis=2)
+        identical = (cost[q, None] == cost[None, :]) & (pts[q, None, :] == pts[None, :, :]).all(axis=2)
+        beats[q] = at_least & (~identical | (order[q, None] < order[None, :])) & available[q, None]
+    return beats
+
+
+def dominated(
+    pos_codes,
+    team_codes,
+    cost,
+    pts,
+    slots,
+    squad_size=15,
+    transfers=0,
+    max_from_team=3,
+    keep=None,
+    unavailable=None,
+):
+    """
+    returns a boolean array that is True for every player who can safely be removed
+    :param pos_codes, team_codes - array<int>: the position and team code of each player, as in PlayerGroups
+    :param cost - array<float>: the cost of each player that counts towards the budget
+    :param pts - array<float>: the points of each player that appear in the objective, one column per gameweek
+    :param slots - dict<str, int>: the maximum number of players from each position in a squad
+    :param squad_size - int: the number of players in a squad
+    :param transfers - int: the most transfers that can be made over the horizon
+    :param max_from_team - int: the maximum number of players allowed from a single team
+    :param keep - array<bool>: players that must never be removed, such as in_team and the current squad
+    :param unavailable - array<bool>: players that can't be picked, so can't be swapped in for anyone
+    """
+    n = len(cost)
+    pts = np.asarray(pts, dtype=float).reshape(n, -1)
+    keep = np.zeros(n, dtype=bool) if keep is None else np.asarray(keep, dtype=bool)
+    available = np.ones(n, dtype=bool) if unavailable is None else ~np.asarray(unavailable, dtype=bool)
+    num_teams = team_codes.max() + 1
+    full_teams = (squad_size + transfers - 1) // max_from_team
+
+    removable = np.zeros(n, dtype=bool)
+    for code, pos in enumerate(POSITIONS):
+        rows = np.flatnonzero(pos_codes == code)
+        if not len(rows):
+            continue
+        c, p, teams = cost[rows], pts[rows], team_codes[rows]
+
+        beats = beaten_by(c, p, available[rows])
+
+        # count dominators from the player's own team in full, and dominators from other teams once per team
+        per_team = beats.T.astype(np.int64) @ np.eye(num_teams, dtype=np.int64)[teams]
+        own_team = per_team[np.arange(len(rows)), teams]
+        other_teams = (per_team > 0).sum(axis=1) - (own_team > 0)
+        needed = slots[pos] + transfers + full_teams
+        removable[rows] = own_team + other_teams >= needed
+
+    return removable & ~keep
+
+
+def prune_players(
+    df,
+    pts_cols,
+    cost_col,
+    slots,
+    squad_size=15,
+    transfers=0,
+    max_from_team=3,
+    keep=None,
+    unavailable=None,
+):
+    """
+    returns a boolean array that is True for the players in df that could be in an optimal squad,
+    and prints how many can't. All other parameters are as in dominated()
+    :param df - DataFrame: the player data
+    :param pts_cols - list<str> or array<float>: the columns of df that appear in the objective, or the points themselves
+        with one row per player, such as the points in each scenario
+    :param cost_col - str: the column of df that counts towards the budget
+    """
+    groups = PlayerGroups(df)
+    removable = dominated(
+        groups.pos_codes,
+        groups.team_codes,
+        df[cost_col].to_numpy(dtype=float),
+        pts_cols if isinstance(pts_cols, np.ndarray) else df[pts_cols].to_numpy(dtype=float),
+        slots,
+        squad_size,
+        transfers,
+        max_from_team,
+        keep,
+        unavailable,
+    )
+    print(f"Removed {removable.sum()} of {len(df)} players who can never be in an optimal squad\n")
+    return ~removable
+
+
+
+def top_k_slots(slots, top_k, min_difference):
+    """
+    returns the slots to pass to dominated() so that no player in any of the top_k best squads is removed, when every
+    squad must differ from the ones before it in at least min_difference players. A removed player must have a dominator
+    left to swap in that isn't in any better squad, or, when squads only need to differ in one player, enough dominators
+    that one of the swaps makes a squad that hasn't been found yet
+    :param slots - dict<str, int>: the maximum number of players from each position in a squad
+    """
+    if min_difference == 1:
+        return {pos: count + top_k - 1 for pos, count in slots.items()}
+    return {pos: count * top_k for pos, count in slots.items()}
@@ -0,0 +1,230 @@
+"""
+A cache on disk of the results of optimise calls, so that a query that has already been solved against
+the same data comes back without reading the data, building a model or solving it.
+
+Each result is stored in its own file, named by a hash of the player data's contents, the optimiser,
+its arguments once defaults are filled in, and the version of python-mip. Changing the data file, an
+argument or the solver misses the cache rather than returning a stale result, while re-saving an
+unchanged csv doesn't. Everything the optimiser printed is kept with its result and printed again on a hit.
+Results older than max_age are dropped, and once the cache is bigger than max_bytes the least recently
+used results are dropped until it fits.
+"""
+import contextlib
+import functools
+import hashlib
+import importlib.metadata
+import inspect
+import io
+import json
+import os
+import pickle
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from fpl_api import CACHE_DIR
+import profiling
+
+# bump this whenever a change to the optimisers would change the result of a call that has already been cached
+CACHE_VERSION = 2
+SOLVER_VERSION = f"mip {importlib.metadata.version('mip')}"
+
+# calls with any of these aren't cached: where a time limit stops the search depends on how busy the machine is,
+# and a callback wouldn't be called when the result comes from the cache
+UNCACHED = ["max_seconds", "on_incumbent"]
+
+# the hash of each data file, by its path, size and modification time, so that it is only read once per process
+_file_hashes = {}
+
+
+def data_hash(filepath):
+    """
+    returns a hash of the player data's contents
+    :param filepath - str or DataFrame: a data file, or a dataframe that has already been read from one
+    """
+    if isinstance(filepath, pd.DataFrame):
+        digest = hashlib.sha256(json.dumps([str(col) for col in filepath.columns]).encode())
+        digest.update(pd.util.hash_pandas_object(filepath, index=True).to_numpy().tobytes())
+        return digest.hexdigest()
+    stat = os.stat(filepath)
+    key = (os.path.abspath(filepath), stat.st_size, stat.st_mtime_ns)
+    if key not in _file_hashes:
+        with open(filepath, "rb") as f:
+            _file_hashes[key] = hashlib.sha256(f.read()).hexdigest()
+    return _file_hashes[key]
+
+
+def normalise(value):
+    """
+    returns an argument in a form that can be written as json, and that is the same for arguments that mean the same thing:
+    numpy numbers become python numbers, whole floats become ints, and lists of players or teams are sorted,
+    since their order never matters to an optimiser
+    """
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, dict):
+        return {str(k): normalise(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set, np.ndarray)):
+        values = [normalise(v) for v in value]
+        if all(isinstance(v, (int, float, str)) for v in values):
+            values.sort(key=lambda v: (isinstance(v, str), v))
+        return values
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    raise TypeError(f"can't use an argument of type {type(value).__name__} in a cache key")
+
+
+def cache_key(optimiser, filepath, params):
+    """
+    returns the name that a result is stored under
+    :param optimiser - str: the name of the optimiser
+    :param filepath - str or DataFrame: the player data
+    :param params - dict: every other argument to the optimiser
+    """
+    key = {
+        "cache_version": CACHE_VERSION,
+        "solver": SOLVER_VERSION,
+        "optimiser": optimiser,
+        "data": data_hash(filepath),
+        "params": normalise(params),
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    the results of optimise calls, stored as one file each in a directory
+    :param directory - str: where to keep the results, which is created if it doesn't exist
+    :param max_bytes - int: the most space the results can take up before the least recently used are dropped
+    :param max_age - float: the number of seconds a result is kept for after it was solved
+    """
+
+    def __init__(self, directory=os.path.join(CACHE_DIR, "results"), max_bytes=256 * 2**20, max_age=30 * 24 * 60 * 60):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def get(self, key):
+        """returns the stored result and printed output for a key, or None if there isn't one or it is too old"""
+        path = self.path(key)
+        try:
+            solved_at = os.path.getmtime(path)
+            if time.time() - solved_at > self.max_age:
+                os.remove(path)
+                return None
+            with open(path, "rb") as f:
+                entry = pickle.load(f)
+            # the access time marks when the result was last used, and the modification time when it was solved
+            os.utime(path, (time.time(), solved_at))
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+        return entry
+
+    def put(self, key, entry):
+        """stores a result, then drops results until the cache is no older than max_age and no bigger than max_bytes"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+        # write to a temporary file first, so that another process never reads half a result
+        temp = f"{path}.{os.getpid()}.tmp"
+        with open(temp, "wb") as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp, path)
+        self.evict()
+
+    def evict(self):
+        """drops results that are older than max_age, then the least recently used until the cache fits in max_bytes"""
+        now = time.time()
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".pkl"):
+                continue
+            try:
+                stat = entry.stat()
+                if now - stat.st_mtime > self.max_age:
+                    os.remove(entry.path)
+                else:
+                    entries.append((stat.st_atime, stat.st_size, entry.path))
+            except FileNotFoundError:
+                pass
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+            total -= size
+
+    def clear(self):
+        """drops every result"""
+        if os.path.isdir(self.directory):
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".pkl"):
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(entry.path)
+
+
+# the cache used by every optimiser. Replace it to keep results elsewhere or change the limits
+default_cache = ResultCache()
+
+
+class _Tee(io.TextIOBase):
+    """writes everything to a stream as well as keeping a copy"""
+
+    def __init__(self, stream):
+        self.stream, self.copy = stream, io.StringIO()
+
+    def write(self, text):
+        self.copy.write(text)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def cached(optimiser, ignore=()):
+    """
+    decorates an optimise function so that its results are kept in default_cache.
+    The function must take filepath and cache arguments, and the call is only cached when cache is True
+    and none of the arguments in UNCACHED are given
+    :param optimiser - str: the name that the optimiser's results are stored under
+    :param ignore - tuple<str>: arguments that don't change the result, which are left out of the key
+    """
+
+    def decorate(optimise):
+        signature = inspect.signature(optimise)
+
+        @functools.wraps(optimise)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            params = dict(bound.arguments)
+            if not params.pop("cache") or any(params.get(name) is not None for name in UNCACHED):
+                return optimise(*args, **kwargs)
+
+            profiling.phase("cache")
+            filepath = params.pop("filepath")
+            for param in ignore:
+                params.pop(param)
+            key = cache_key(optimiser, filepath, params)
+            entry = default_cache.get(key)
+            profiling.note("cache", "miss" if entry is None else "hit")
+            if entry is not None:
+                print(entry["output"], end="")
+                return entry["result"]
+
+            with contextlib.redirect_stdout(_Tee(sys.stdout)) as tee:
+                result = optimise(*args, **kwargs)
+            profiling.phase("cache")
+            default_cache.put(key, {"result": result, "output": tee.copy.getvalue()})
+            return result
+
+        return wrapper
+
+    return decorate
@@ -0,0 +1,309 @@
+"""
+What the optimisers return, and reading a solved model's values into it in one go.
+
+Every optimiser returns a result object rather than only printing its squads, so the squads, starting 11s, captains
+and transfers can be used without parsing what was printed:
+
+    result = optimiser_B.optimise(show=False)
+    result.starting, result.captain, result.points
+
+    plan = optimiser.optimise(352, 5, show=False)
+    plan.gameweeks[10].transfers_in, plan.points, plan.hits
+
+show() prints a result the way the optimisers always have, which they do themselves unless they are given show=False.
+The solution is copied out of the solver as a single array and sliced with the columns of each set of variables,
+instead of asking python-mip for each variable's value in turn, and each gameweek's squad dataframe is only built
+when it is first used, so reading a plan that isn't printed costs a few array operations per gameweek.
+"""
+import numpy as np
+import pandas as pd
+
+try:
+    from mip.cbc import SolverCbc, cbclib, ffi
+except (ImportError, OSError, AttributeError):
+    # the solution is read straight from CBC's library, which python-mip may not have been built with or be able to load
+    SolverCbc = None
+
+
+def solution_values(model):
+    """returns the value of every variable in the model's best solution as a float array, indexed by column"""
+    if SolverCbc is not None and isinstance(model.solver, SolverCbc):
+        solution = cbclib.Cbc_getColSolution(model.solver._model)
+        if solution != ffi.NULL:
+            return np.frombuffer(ffi.buffer(solution, model.num_cols * 8), dtype=np.float64).copy()
+    return np.array([var.x for var in model.vars], dtype=np.float64)
+
+
+def columns(variables):
+    """
+    returns the column of each variable as an int array, so that their values can be read with read_binary()
+    :param variables - list<Var> or list<list<Var>>: the variables, e.g. x indexed [player] or [gw][player]
+    """
+    if len(variables) and isinstance(variables[0], list):
+        return np.array([[var.idx for var in row] for row in variables], dtype=np.int64).reshape(len(variables), -1)
+    return np.array([var.idx for var in variables], dtype=np.int64)
+
+
+def read_binary(model, *cols):
+    """
+    returns which of the variables are 1 in the model's best solution, reading the solution once for all of them
+    :param cols - array<int>: the columns of a set of variables, as returned by columns()
+    returns a boolean array of the same shape for each array of columns
+    """
+    values = solution_values(model)
+    return [values[c] > 0.5 for c in cols]
+
+
+class LineupResult:
+    """
+    the lineup picked by optimiser_A
+    :param lineup - DataFrame: the players picked, sorted by position and then points
+    :param objective - float: the value of the model's objective
+    """
+
+    solve = None
+
+    def __init__(self, lineup, objective):
+        self.lineup = lineup
+        self.objective = objective
+
+    @property
+    def ids(self):
+        return self.lineup.id.to_numpy()
+
+    @property
+    def cost(self):
+        return self.lineup.cost.sum()
+
+    @property
+    def points(self):
+        return self.lineup.points.sum()
+
+    def show(self):
+        """prints the lineup and its totals"""
+        print(self.lineup)
+        print(f"\nTotal cost: £{self.cost}m")
+        print(f"Total points: {self.points}\n")
+
+    def __repr__(self):
+        return f"LineupResult(objective={self.objective:.4f}, cost={self.cost:.1f})"
+
+
+class SquadResult:
+    """
+    the squad picked for a single gameweek, by optimiser_B or by one solve of an OptimiserSession
+    :param squad - DataFrame: the squad, with the starting 11 first and the captain's points doubled
+    :param starting, bench - array<int>: the ids of the starting 11 and of the bench
+    :param captain - int: the id of the captain, or None if the captain isn't being considered
+    :param objective - float: the value of the model's objective
+    :param cost - float: the total cost of the squad
+    :param seconds - float: how long the solve took
+    :param col_to_max - str: the column that was maximised, which show() prints alongside the squad
+    """
+
+    solve = None
+
+    def __init__(self, squad, starting, bench, captain, objective, cost, seconds, col_to_max="points"):
+        self.squad = squad
+        self.starting, self.bench, self.captain = starting, bench, captain
+        self.objective, self.cost, self.seconds = objective, cost, seconds
+        self.col_to_max = col_to_max
+
+    @property
+    def points(self):
+        """the points of the starting 11, with the captain's doubled"""
+        return self.squad.points.iloc[:11].sum()
+
+    @property
+    def bench_points(self):
+        return self.squad.points.iloc[11:].sum()
+
+    def show(self):
+        """prints the squad and its totals"""
+        print(self.squad.loc[:, ["id", "team", "pos", "name", "cost", self.col_to_max]])
+        print(f"\nTotal cost: £{self.squad.cost.sum()}m")
+        print(f"Total points: {self.points:.2f} (+{self.bench_points:.2f} on the bench)\n")
+
+    def __repr__(self):
+        return f"SquadResult(objective={self.objective:.4f}, cost={self.cost:.1f}, seconds={self.seconds:.3f})"
+
+
+def gameweek_frame(players, start_rows, bench_rows, captain_row, pts_col):
+    """
+    returns one gameweek of a plan as a dataframe, with the starting 11 sorted by position and then points, the bench
+    goalkeeper first and the rest of the bench by points, and the captain's points doubled
+    :param players - DataFrame: the player data, with a RangeIndex
+    :param start_rows, bench_rows - array<int>: the rows of players in the starting 11 and on the bench
+    :param captain_row - int: the row of the captain
+    :param pts_col - str: the gameweek's points column
+    """
+    # the order is worked out on the rows, so that the player data is only copied once
+    pts = players[pts_col].to_numpy()
+    rank = pd.Categorical(players.pos.to_numpy()[start_rows], categories=["G", "D", "M", "F"]).codes
+    start_rows = start_rows[np.lexsort((-pts[start_rows], rank))]
+    bench_gk = players.pos.to_numpy()[bench_rows] == "G"
+    bench_rows = np.concatenate([bench_rows[bench_gk], bench_rows[~bench_gk][np.argsort(-pts[bench_rows[~bench_gk]], kind="stable")]])
+
+    result = players.iloc[np.concatenate([start_rows, bench_rows])].reset_index(drop=True)
+    captain = int(np.flatnonzero(start_rows == captain_row)[0])
+    result.loc[captain, "name"] += " (c)"
+    result.loc[captain, pts_col] *= 2
+    result.index += 1
+    return result
+
+
+class GameweekResult:
+    """
+    one gameweek of a plan
+    :param gw - int: the gameweek
+    :param players - DataFrame: the player data that the rows index, which the squad dataframe is built from
+    :param start_rows, bench_rows - array<int>: the rows of the players in the starting 11 and on the bench
+    :param captain_row - int: the row of the captain
+    :param in_rows, out_rows - array<int>: the rows of the players bought and sold before the gameweek
+    :param hits - int: the hits taken for those transfers
+    :param points - float: the points of the starting 11, with the captain's doubled
+    :param bench_points - float: the points of the bench
+    :param cost - float: the total value of the squad
+    """
+
+    def __init__(self, gw, players, start_rows, bench_rows, captain_row, in_rows, out_rows, hits, points, bench_points, cost):
+        ids = players.id.to_numpy()
+        self.gw = gw
+        self.starting, self.bench, self.captain = ids[start_rows], ids[bench_rows], int(ids[captain_row])
+        self.transfers_in, self.transfers_out = ids[in_rows], ids[out_rows]
+        self.hits, self.points, self.bench_points, self.cost = int(hits), float(points), float(bench_points), float(cost)
+        self._players = players
+        self._rows = start_rows, bench_rows, captain_row, in_rows, out_rows
+        self._squad = None
+
+    @property
+    def squad(self):
+        """the squad as a dataframe, with the starting 11 first and the captain's points doubled"""
+        if self._squad is None:
+            self._squad = gameweek_frame(self._players, *self._rows[:3], f"{self.gw}_pts")
+        return self._squad
+
+    def transfer_names(self):
+        """returns the names of the players bought and sold before the gameweek"""
+        names = self._players.name.to_numpy()
+        return names[self._rows[3]].tolist(), names[self._rows[4]].tolist()
+
+    def __repr__(self):
+        return f"GameweekResult(gw={self.gw}, points={self.points:.2f}, transfers={len(self.transfers_in)}, hits={self.hits})"
+
+
+class PlanResult:
+    """
+    a plan of squads over several gameweeks, as returned by with_transfers/optimiser.py and optimiser_preseason
+    :param gameweeks - dict<int, GameweekResult>: each gameweek of the plan
+    :param objective - float: the value of the model's objective, with future gameweeks weighted and hits taken off
+    :param current - DataFrame: the squad before the first gameweek, or None if the first squad was picked freely
+    :param columns - list<str>: the columns of each squad that show() prints
+    :param hit_cost - float: the points that each hit costs
+    """
+
+    solve = None
+
+    def __init__(self, gameweeks, objective, current=None, columns=None, hit_cost=4):
+        self.gameweeks = gameweeks
+        self.objective = objective
+        self.current = current
+        self.columns = columns
+        self.hit_cost = hit_cost
+
+    @property
+    def squads(self):
+        """the squad for each gameweek as a dataframe, with the starting 11 first"""
+        return {gw: gameweek.squad for gw, gameweek in self.gameweeks.items()}
+
+    @property
+    def points(self):
+        return sum(gameweek.points for gameweek in self.gameweeks.values())
+
+    @property
+    def bench_points(self):
+        return sum(gameweek.bench_points for gameweek in self.gameweeks.values())
+
+    @property
+    def hits(self):
+        return sum(gameweek.hits for gameweek in self.gameweeks.values())
+
+    def show(self):
+        """prints out the squads and transfers in an easy to read format"""
+        if self.current is not None:
+            print("CURRENT SQUAD")
+            print(self.current.loc[:, self.columns])
+            print("\n")
+
+        for gw, gameweek in self.gameweeks.items():
+            t_in, t_out = gameweek.transfer_names()
+            if len(t_out) > 0:
+                [print(f"OUT: {name}") for name in t_out]
+                [print(f"IN: {name}") for name in t_in]
+                if gameweek.hits:
+                    print(f"HITS: {gameweek.hits} (-{gameweek.hits * self.hit_cost} pts)")
+                print("\n")
+
+            print(f"GW {gw}")
+            print(gameweek.squad.loc[:, self.columns])
+            print(f"\nCost: £{gameweek.cost:.1f}m")
+            print(f"Points: {gameweek.points:.2f} (+{gameweek.bench_points:.2f} on the bench)\n\n")
+
+        gws = list(self.gameweeks)
+        print(
+            f"Total points from GW {gws[0]}-{gws[-1]}: {self.points:.2f} (+{self.bench_points:.2f} on the bench)"
+            + (f", -{self.hits * self.hit_cost} in hits" if self.hits else "")
+            + "\n\n"
+        )
+
+    def __repr__(self):
+        return f"PlanResult(objective={self.objective:.4f}, points={self.points:.2f}, hits={self.hits})"
+
+
+def plan_result(players, first_gw, x, y, z, objective, value_col, current_rows=None, hits=None, hit_cost=4, chips={}):
+    """
+    returns a PlanResult for a solved plan
+    :param players - DataFrame: the player data, with a RangeIndex and a {gw}_pts column for each gameweek of the plan
+    :param first_gw - int: the gameweek of the first row of x, y and z
+    :param x, y, z - array<bool>: the squad, starting 11 and captain for each gameweek, with shape (num_gws, num_players)
+    :param objective - float: the value of the model's objective
+    :param value_col - str: the column of players that counts towards the budget
+    :param current_rows - array<int>: rows of the squad before the first gameweek. If left blank, the first squad has no transfers
+    :param hits - array<int>: the hits taken before each gameweek. If left blank, none are
+    :param chips - dict<str, int>: the gameweek, counted from 0, of each chip played. The transfers after a free hit are
+        from the squad before it, which the squad reverts to
+    """
+    num_gws = len(x)
+    pts = players[[f"{first_gw + gw}_pts" for gw in range(num_gws)]].to_numpy().T
+    points = (y * pts).sum(axis=1) + (z * pts).sum(axis=1)
+    bench_points = ((x & ~y) * pts).sum(axis=1)
+    cost = x @ players[value_col].to_numpy()
+    hits = np.zeros(num_gws, dtype=np.int64) if hits is None else hits
+
+    previous = None
+    if current_rows is not None:
+        previous = np.zeros(x.shape[1], dtype=bool)
+        previous[current_rows] = True
+    gameweeks = {}
+    for gw in range(num_gws):
+        moved = [np.zeros(0, dtype=np.int64)] * 2
+        if previous is not None:
+            moved = np.flatnonzero(x[gw] & ~previous), np.flatnonzero(previous & ~x[gw])
+        gameweeks[first_gw + gw] = GameweekResult(
+            first_gw + gw,
+            players,
+            np.flatnonzero(y[gw]),
+            np.flatnonzero(x[gw] & ~y[gw]),
+            np.flatnonzero(z[gw])[0],
+            *moved,
+            hits[gw],
+            points[gw],
+            bench_points[gw],
+            cost[gw],
+        )
+        if chips.get("free_hit") != gw:
+            previous = x[gw]
+
+    columns = ["id", "team", "pos", "name", value_col] + [f"{first_gw + gw}_pts" for gw in range(num_gws)]
+    current = None if current_rows is None else players.iloc[current_rows].reset_index(drop=True)
+    return PlanResult(gameweeks, objective, current, columns, hit_cost)
@@ -0,0 +1,202 @@
+"""
+Points scenarios, for seeing the spread of a squad's points rather than only its expected points.
+
+Each player's points in each gameweek are drawn from a gamma distribution with the projected points as its mean,
+and a standard deviation taken from a {col}_sd column of the data if there is one, or DEFAULT_CV times the mean if
+not. Players projected no points always score none, and players are drawn independently of each other.
+
+Squads and plans are scored against every scenario at once, as a product of the scenario matrix and a matrix of how
+much each player's points count towards each squad, which is 1 for a starter and 2 for the captain:
+
+    scores, table = evaluate([optimiser_B.optimise(...), ...], read_players("players_data.csv"))
+
+The optimisers can also maximise the average over a sample of scenarios, and the CVaR of their objective, which is the
+average of the worst cvar_alpha of the scenarios, by passing scenarios and cvar_alpha. Each scenario adds a constraint
+over every variable in the objective, so a few hundred scenarios are usually as many as is worth solving with.
+"""
+from mip import INF, LinExpr, xsum
+import numpy as np
+import pandas as pd
+
+from results import PlanResult
+
+# the standard deviation of a player's points as a fraction of their projected points, when the data doesn't give one
+DEFAULT_CV = 1.0
+
+
+def spread(df, pts_cols):
+    """
+    returns the standard deviation of each player's points in each of pts_cols, as an array of shape (num_players, len(pts_cols))
+    :param df - DataFrame: the player data, which can have a {col}_sd column for any of pts_cols
+    """
+    return np.column_stack(
+        [df[f"{col}_sd"].to_numpy(dtype=float) if f"{col}_sd" in df.columns else DEFAULT_CV * df[col].to_numpy(dtype=float).clip(0) for col in pts_cols]
+    )
+
+
+def draw(mean, sd, num_scenarios, seed=0):
+    """
+    draws points scenarios from a gamma distribution for each entry of mean, returning a float32 array of shape
+    (num_scenarios, *mean.shape). Entries with a mean or sd of 0 or less are the mean in every scenario
+    :param mean, sd - array<float>: the mean and standard deviation of each player's points, e.g. one column per gameweek
+    :param seed - int: the seed of the random numbers, so that the same arguments always draw the same scenarios
+    """
+    mean, sd = np.asarray(mean, dtype=float), np.broadcast_to(np.asarray(sd, dtype=float), np.shape(mean))
+    random = (mean > 0) & (sd > 0)
+    shape = np.where(random, (mean / np.where(random, sd, 1)) ** 2, 1)
+    scale = np.where(random, sd**2 / np.where(random, mean, 1), 0)
+    scenarios = np.random.default_rng(seed).gamma(shape, scale, size=(num_scenarios, *mean.shape)).astype(np.float32)
+    scenarios[:, ~random] = mean[~random]
+    return scenarios
+
+
+def cvar(scores, alpha):
+    """
+    returns the average of the worst alpha of the scenarios for each column of scores
+    :param scores - array<float>: the score of each squad in each scenario, with shape (num_scenarios, num_squads)
+    :param alpha - float: the fraction of scenarios to average, between 0 and 1
+    """
+    assert 0 < alpha <= 1, "alpha must be more than 0 and at most 1"
+    worst = max(int(np.ceil(alpha * len(scores))), 1)
+    return np.partition(scores, worst - 1, axis=0)[:worst].mean(axis=0)
+
+
+def blended(scores, alpha=None, risk_weight=0.5):
+    """
+    returns the objective that the optimisers maximise with scenarios for each column of scores: the average,
+    or if alpha is given, (1 - risk_weight) times the average plus risk_weight times the CVaR
+    """
+    if alpha is None:
+        return scores.mean(axis=0)
+    return (1 - risk_weight) * scores.mean(axis=0) + risk_weight * cvar(scores, alpha)
+
+
+def add_cvar(model, variables, deviations, base, alpha):
+    """
+    adds variables and constraints that measure the CVaR of an objective over scenarios, and returns the CVaR as an
+    expression. The CVaR is the largest eta - sum(u) / (alpha * num_scenarios) with each u at least eta minus a
+    scenario's objective, which the solver finds by maximising it
+    :param variables - list<Var>: the variables whose coefficients change between scenarios
+    :param deviations - array<float>: how far each variable's coefficient is from its coefficient in base in each scenario,
+        with shape (num_scenarios, len(variables))
+    :param base - LinExpr: the objective with the average coefficients, including any terms that are the same in every scenario
+    :param alpha - float: the fraction of scenarios that the CVaR averages, between 0 and 1
+    """
+    assert 0 < alpha <= 1, "cvar_alpha must be more than 0 and at most 1"
+    eta = model.add_var(lb=-INF)
+    shortfall = [model.add_var() for _ in range(len(deviations))]
+    for u, deviation in zip(shortfall, deviations):
+        nonzero = np.flatnonzero(deviation)
+        scenario = base + LinExpr(variables=[variables[j] for j in nonzero], coeffs=deviation[nonzero].tolist())
+        model += u >= eta - scenario
+    return eta - xsum(shortfall) * (1 / (alpha * len(deviations)))
+
+
+def lineup_coeffs(bench_strength, gw_weights, captain=True):
+    """
+    returns the objective coefficient of a player's points for the starting 11, the captain and the squad in each gameweek,
+    as an array of shape (num_gws, 3), in the way that the optimisers weight them
+    :param gw_weights - array<float>: how much each gameweek counts, e.g. future_gw_multiplier ** gw
+    """
+    coeffs = np.array([1 - 2 * bench_strength, (1 - bench_strength) * captain, bench_strength])
+    return np.outer(np.atleast_1d(gw_weights), coeffs)
+
+
+def deviations(scenarios, pts, bench_strength, gw_weights, captain=True):
+    """
+    returns how far the objective coefficient of each variable is from its average in each scenario, for add_cvar()
+    :param scenarios - array<float>: points of shape (num_scenarios, num_players, num_gws)
+    :param pts - array<float>: the points that the model's objective uses, of shape (num_players, num_gws)
+    returns an array of shape (num_scenarios, num_gws * 3 * num_players), ordered as the variables
+    [y[0], z[0], x[0], y[1], z[1], x[1], ...] with y, z and x the starting 11, captain and squad
+    """
+    difference = (scenarios - pts).transpose(0, 2, 1)
+    coeffs = lineup_coeffs(bench_strength, gw_weights, captain).astype(np.float32)
+    return (difference[:, :, None, :] * coeffs[None, :, :, None]).reshape(len(scenarios), -1)
+
+
+def lineup_scores(scenarios, x, y, z, bench_strength, gw_weights, captain=True):
+    """
+    returns the optimisers' objective for a plan in each scenario, before any hits, for plans found without the model
+    :param x, y, z - array<bool>: the squad, starting 11 and captain for each gameweek, with shape (num_gws, num_players)
+    """
+    coeffs = lineup_coeffs(bench_strength, gw_weights, captain)
+    weights = coeffs[:, :1] * y + coeffs[:, 1:2] * z + coeffs[:, 2:] * x
+    return scenarios.reshape(len(scenarios), -1) @ weights.T.ravel()
+
+
+def squad_weights(results, ids, pts_cols):
+    """
+    returns how much each player's points count towards each squad or plan, and the points each one loses to hits
+    :param results - list<SquadResult or PlanResult>: the squads or plans, as returned by optimiser_B or the with_transfers optimisers
+    :param ids - array<int>: the id of each player, in the order of the columns of the weights
+    :param pts_cols - list<str>: the points columns, one for each gameweek of the plans
+    returns a float32 array of shape (len(results), len(ids), len(pts_cols)) and an array of the points lost to hits
+    """
+    row_of = pd.Index(ids)
+    weights = np.zeros((len(results), len(ids), len(pts_cols)), dtype=np.float32)
+    penalty = np.zeros(len(results))
+    for k, result in enumerate(results):
+        if isinstance(result, PlanResult):
+            gameweeks = [result.gameweeks[int(col.split("_")[0])] for col in pts_cols]
+            penalty[k] = result.hits * result.hit_cost
+        else:
+            gameweeks = [result]
+        for gw, gameweek in enumerate(gameweeks):
+            np.add.at(weights[k, :, gw], row_of.get_indexer(gameweek.starting), 1)
+            if gameweek.captain is not None:
+                weights[k, row_of.get_loc(gameweek.captain), gw] += 1
+    return weights, penalty
+
+
+def score(scenarios, weights, penalty=0):
+    """
+    scores squads against every scenario at once
+    :param scenarios - array<float>: points of shape (num_scenarios, num_players, num_gws), as returned by draw()
+    :param weights - array<float>: how much each player's points count towards each squad, of shape (num_squads, num_players, num_gws)
+    :param penalty - array<float>: points taken off each squad in every scenario, such as hits
+    returns the points of each squad in each scenario, as an array of shape (num_scenarios, num_squads)
+    """
+    flat = scenarios.reshape(len(scenarios), -1)
+    return flat @ weights.reshape(len(weights), -1).T - np.asarray(penalty, dtype=np.float32)
+
+
+def starters(result):
+    """returns the ids of every player who starts in a squad, or in any gameweek of a plan"""
+    if isinstance(result, PlanResult):
+        return np.concatenate([gameweek.starting for gameweek in result.gameweeks.values()])
+    return result.starting
+
+
+def evaluate(results, df, num_scenarios=10000, alpha=0.1, seed=0, pts_cols=None):
+    """
+    scores squads or plans against the same points scenarios, returning the scores and a table of how they are spread
+    :param results - list<SquadResult or PlanResult>: the squads or plans to compare, which all cover the same gameweeks
+    :param df - DataFrame: the player data that the results were optimised on, as read by player_data.read_players
+    :param alpha - float: the fraction of the worst scenarios that the cvar column averages
+    :param pts_cols - list<str>: the points columns to score. If left blank, optimiser_B's col_to_max or each
+        gameweek of the plans is used
+    returns the (num_scenarios, len(results)) scores, and a dataframe with a row for each result
+    """
+    if pts_cols is None:
+        first = results[0]
+        pts_cols = [f"{gw}_pts" for gw in first.gameweeks] if isinstance(first, PlanResult) else [first.col_to_max]
+    # only the players in some squad affect the scores, so only they are drawn
+    picked = np.unique(np.concatenate([starters(result) for result in results]))
+    players = df.set_index("id").loc[picked]
+    scenarios = draw(players[pts_cols].to_numpy(dtype=float), spread(players, pts_cols), num_scenarios, seed)
+    weights, penalty = squad_weights(results, picked, pts_cols)
+    scores = score(scenarios, weights, penalty)
+
+    table = pd.DataFrame(
+        {
+            "mean": scores.mean(axis=0),
+            "sd": scores.std(axis=0),
+            "p5": np.percentile(scores, 5, axis=0),
+            "median": np.median(scores, axis=0),
+            "p95": np.percentile(scores, 95, axis=0),
+            "cvar": cvar(scores, alpha),
+        }
+    )
+    return scores, table
+
@@ -0,0 +1,249 @@
+"""
+A local HTTP service that runs optimiser_B and with_transfers/optimiser.py jobs in a pool of worker processes.
+
+Each worker imports the optimisers, loads the solver and attaches the player data once when it
+starts, using the same shared memory as sweep.py, so a job only costs its own model and solve.
+Jobs are JSON objects naming an optimiser and its arguments, and are queued until a worker is free.
+Once max_queue jobs are waiting or running, new jobs are turned away with 503 until some finish.
+
+usage:
+    python service.py --port 8000 --processes 4
+
+endpoints:
+    POST /jobs          {"optimiser": "B", "params": {"budget": 95}} - queues a job, returning its id
+    GET /jobs/<id>      the job's status, which is queued, running, done, failed or cancelled, and its result once done.
+                        A job counts as running once it has been handed to the workers, which is one job before a worker is free
+    DELETE /jobs/<id>   cancels a job that no worker has picked up yet
+    GET /queue          the number of jobs waiting and running, and the number of workers
+"""
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import json
+import os
+import signal
+import threading
+import time
+import uuid
+
+from mip import Model
+
+from player_data import read_players
+from sweep import OPTIMISERS, ROOT, attach_frame, share_frame, summarise
+
+# the player data for each optimiser, attached once in each worker process
+_data = {}
+
+
+def _start_worker(specs):
+    """worker initialiser - attaches the shared player data, loads the solver and silences the optimisers' output"""
+    for optimiser, spec in specs.items():
+        _data[optimiser] = attach_frame(spec)
+    # the first model made in a process loads the solver's libraries, which takes most of a second
+    Model()
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+
+
+def frame_records(df):
+    """returns the rows of a squad dataframe as a list of dicts that can be written as json"""
+    return json.loads(df.to_json(orient="records"))
+
+
+def run_job(optimiser, params):
+    """solves one job against the worker's player data, returning its result as a dict that can be written as json"""
+    start_time = time.perf_counter()
+    optimised = OPTIMISERS[optimiser](filepath=_data[optimiser], **params)
+    points, cost = summarise(optimiser, optimised, params)
+    result = {"points": float(points), "cost": float(cost)}
+    if optimiser == "B":
+        result["squad"] = frame_records(optimised.squad)
+    else:
+        result["squads"] = {str(gw): frame_records(squad) for gw, squad in optimised.squads.items()}
+    # how far from optimal the squad could be, when the job was given max_seconds, max_gap or max_nodes
+    if optimised.solve is not None:
+        result["solve"] = optimised.solve
+    result["seconds"] = time.perf_counter() - start_time
+    return result
+
+
+class JobQueue:
+    """
+    the jobs sent to the service, and the pool of worker processes that runs them
+    :param filepaths - dict<str, str>: the player data file for each optimiser, which is read once
+    :param processes - int: the number of worker processes. If left blank, one is used for every core
+    :param max_queue - int: the most jobs that can be waiting or running at once
+    :param max_finished - int: the most finished jobs whose results are kept, after which the oldest are forgotten
+    """
+
+    def __init__(self, filepaths, processes=None, max_queue=100, max_finished=1000):
+        self.optimisers = list(filepaths)
+        specs, self.blocks = {}, []
+        for optimiser, filepath in filepaths.items():
+            specs[optimiser], blocks = share_frame(read_players(filepath))
+            self.blocks += blocks
+        self.processes = processes or os.cpu_count()
+        self.pool = ProcessPoolExecutor(self.processes, initializer=_start_worker, initargs=(specs,))
+        # start the workers now, rather than when the first job arrives
+        for future in [self.pool.submit(int) for _ in range(self.processes)]:
+            future.result()
+        self.max_queue, self.max_finished = max_queue, max_finished
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def submit(self, optimiser, params):
+        """
+        queues a job and returns its id, or None if the queue is full
+        :raises ValueError: if the optimiser isn't served, or params isn't a dict of arguments
+        """
+        if optimiser not in self.optimisers:
+            raise ValueError(f"optimiser must be one of {', '.join(self.optimisers)}")
+        if not isinstance(params, dict) or "filepath" in params:
+            raise ValueError("params must be a dict of arguments to the optimiser, other than filepath")
+        with self.lock:
+            depth = self.depth()
+            if depth["queued"] + depth["running"] >= self.max_queue:
+                return None
+            job_id = uuid.uuid4().hex
+            future = self.pool.submit(run_job, optimiser, params)
+            self.jobs[job_id] = {"optimiser": optimiser, "params": params, "future": future, "submitted": time.time()}
+            self._forget_finished()
+        return job_id
+
+    def _forget_finished(self):
+        """drops the oldest finished jobs once there are more than max_finished of them"""
+        finished = [job_id for job_id, job in self.jobs.items() if job["future"].done()]
+        for job_id in finished[: max(0, len(finished) - self.max_finished)]:
+            del self.jobs[job_id]
+
+    def status(self, job_id):
+        """returns a dict describing a job, including its result or error once it has finished, or None if there is no such job"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        future = job["future"]
+        described = {"id": job_id, "optimiser": job["optimiser"], "params": job["params"], "submitted": job["submitted"]}
+        if future.cancelled():
+            described["status"] = "cancelled"
+        elif future.done():
+            error = future.exception()
+            if error is None:
+                described["status"], described["result"] = "done", future.result()
+            else:
+                described["status"], described["error"] = "failed", f"{type(error).__name__}: {error}"
+        else:
+            described["status"] = "running" if future.running() else "queued"
+        return described
+
+    def cancel(self, job_id):
+        """cancels a job, returning whether it was cancelled, or None if there is no such job"""
+        job = self.jobs.get(job_id)
+        return None if job is None else job["future"].cancel()
+
+    def depth(self):
+        """returns the number of jobs waiting and running, and the number of workers"""
+        futures = [job["future"] for job in list(self.jobs.values()) if not job["future"].done()]
+        running = sum(future.running() for future in futures)
+        return {"queued": len(futures) - running, "running": running, "workers": self.processes, "max_queue": self.max_queue}
+
+    def close(self):
+        """stops the workers and frees the shared player data"""
+        self.pool.shutdown(cancel_futures=True)
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+
+
+class Handler(BaseHTTPRequestHandler):
+    """answers the service's endpoints for the JobQueue in self.server.queue"""
+
+    def send_json(self, code, body):
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def job_id(self):
+        """returns the id in a /jobs/<id> path, or None for any other path"""
+        parts = self.path.strip("/").split("/")
+        return parts[1] if len(parts) == 2 and parts[0] == "jobs" else None
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/jobs":
+            return self.send_json(404, {"error": f"no endpoint at POST {self.path}"})
+        try:
+            job = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            job_id = self.server.queue.submit(job.get("optimiser"), job.get("params", {}))
+        except (ValueError, AttributeError) as e:
+            return self.send_json(400, {"error": str(e)})
+        if job_id is None:
+            return self.send_json(503, {"error": "the queue is full", **self.server.queue.depth()})
+        self.send_json(202, {"id": job_id, "status": "queued"})
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/queue":
+            return self.send_json(200, self.server.queue.depth())
+        status = self.server.queue.status(self.job_id())
+        if status is None:
+            return self.send_json(404, {"error": f"no job at {self.path}"})
+        self.send_json(200, status)
+
+    def do_DELETE(self):
+        cancelled = self.server.queue.cancel(self.job_id())
+        if cancelled is None:
+            return self.send_json(404, {"error": f"no job at {self.path}"})
+        if not cancelled:
+            return self.send_json(409, {"error": "the job has already started, so it can't be cancelled"})
+        self.send_json(200, {"id": self.job_id(), "status": "cancelled"})
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def serve(filepaths, host="127.0.0.1", port=8000, processes=None, max_queue=100, quiet=False):
+    """
+    runs the service until it is interrupted
+    :param filepaths - dict<str, str>: the player data file for each optimiser that should be served, e.g. {"B": "players_data.csv"}
+    :param host, port: the address to listen on
+    All other parameters are as in JobQueue
+    """
+    server = ThreadingHTTPServer((host, port), Handler)
+    queue = JobQueue(filepaths, processes, max_queue)
+    server.queue, server.quiet = queue, quiet
+    # stop cleanly when killed as well as when interrupted, so that the workers and shared memory are cleaned up
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+    print(f"Serving {', '.join(filepaths)} on http://{host}:{server.server_address[1]} with {queue.processes} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        queue.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve optimiser jobs over HTTP from a pool of worker processes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--processes", type=int, help="defaults to one worker for every core")
+    parser.add_argument("--max_queue", type=int, default=100, help="the most jobs that can be waiting or running at once")
+    parser.add_argument("--players", default="players_data.csv", help="the player data for optimiser_B")
+    parser.add_argument("--cleaned", default=os.path.join(ROOT, "with_transfers", "cleaned_data.csv"),
+                        help="the player data for with_transfers/optimiser.py")
+    parser.add_argument("--quiet", action="store_true", help="don't log each request")
+    args = parser.parse_args()
+
+    # only serve the optimisers whose data is there
+    filepaths = {"B": args.players, "with_transfers": args.cleaned}
+    filepaths = {optimiser: filepath for optimiser, filepath in filepaths.items() if os.path.exists(filepath)}
+    if not filepaths:
+        parser.error("neither --players nor --cleaned exists")
+    serve(filepaths, args.host, args.port, args.processes, args.max_queue, args.quiet)
+
+
+if __name__ == "__main__":
+    main()
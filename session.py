@@ -0,0 +1,215 @@
+"""
+An optimiser_B model that is built once and then edited between solves, for what-if questions.
+
+The player data is read and the model is built for every player when an OptimiserSession is
+created. Locking and banning players or teams only changes the bounds of the players' variables,
+and the budget, formation, captain and max_from_team are the right hand sides of constraints that
+are kept from when they were added. Only bench_strength changes the objective. Pruning is done
+with bounds too: before each solve, the players who can't be picked under the current locks and
+bans are fixed out of the squad, and any that can be picked again are freed. The solver still
+solves the model from scratch, but reading the data and building the model only happen once.
+"""
+import time
+
+from mip import BINARY, Model, OptimizationStatus, maximize
+import numpy as np
+
+from model_builder import PlayerGroups, PlayerIndex, linear_sum
+from optimiser_B import squad_result
+from player_data import read_players
+from pruning import dominated
+from results import SquadResult, columns, read_binary
+
+# the fewest and most players of each outfield position that can start
+FORMATION_RULES = {"DEF": [3, 5], "MID": [2, 5], "FWD": [1, 3]}
+
+
+class OptimiserSession:
+    """
+    optimiser_B's model, kept between solves. All parameters are as in optimiser_B.optimise, and can be changed later
+    with the session's methods
+    """
+
+    def __init__(
+        self,
+        filepath="players_data.csv",
+        col_to_max="points",
+        budget=100,
+        captain=True,
+        DEF=None,
+        MID=None,
+        FWD=None,
+        bench_strength=0.1,
+        max_from_team=3,
+        prune=True,
+    ):
+        self.df = read_players(filepath).reset_index(drop=True)
+        self.df.points = self.df.points / 1000
+        self.index = PlayerIndex(self.df)
+        self.groups = PlayerGroups(self.df)
+        self.pts = self.df[col_to_max].to_numpy(dtype=float)
+        I = range(len(self.df))
+
+        self.model = model = Model()
+        model.verbose = 0
+
+        # squad, starting 11 and captain variables, as in optimiser_B
+        self.x = x = [model.add_var(var_type=BINARY) for i in I]
+        self.y = y = [model.add_var(var_type=BINARY) for i in I]
+        self.z = z = [model.add_var(var_type=BINARY) for i in I]
+        self.cols = [columns(var) for var in (x, y, z)]
+        model += linear_sum(y) == 11
+        for i in I:
+            model += x[i] >= y[i]
+            model += y[i] >= z[i]
+        self.captain_constr = model.add_constr(linear_sum(z) == 1)
+
+        self.team_constrs = [model.add_constr(linear_sum(x, rows) <= max_from_team) for rows in self.groups.team_rows]
+        self.max_from_team = max_from_team
+
+        model += linear_sum(x, self.groups.pos_rows["G"]) == 2
+        model += linear_sum(y, self.groups.pos_rows["G"]) == 1
+        self.formation_constrs = {}
+        for pos, (lo, hi) in FORMATION_RULES.items():
+            rows = self.groups.pos_rows[pos[0]]
+            model += linear_sum(x, rows) == hi
+            self.formation_constrs[pos] = (
+                model.add_constr(linear_sum(y, rows) >= lo),
+                model.add_constr(linear_sum(y, rows) <= hi),
+            )
+
+        self.budget_constr = model.add_constr(linear_sum(x, coeffs=self.df.cost.to_numpy()) <= budget)
+
+        # whether each player is in each list, and the codes of the banned teams
+        self.lists = {label: np.zeros(len(self.df), dtype=bool) for label in ["in_team", "starting", "on_bench", "out_team"]}
+        self.banned_teams = set()
+        self.prune = prune
+        # the bounds of x and y that the model has, one row each for x lb, x ub, y lb and y ub
+        self.bounds = np.array([[0.0], [1.0], [0.0], [1.0]]).repeat(len(self.df), axis=1)
+
+        self.set_captain(captain)
+        self.set_formation(DEF, MID, FWD)
+        self.set_bench_strength(bench_strength)
+
+    def _set_list(self, label, players):
+        """
+        moves players into one of the lists, taking them out of any other list they were in, or takes them out of every
+        list if label is None
+        """
+        rows = self.index.rows(self.index.select(players=players)["players"])
+        for listed in self.lists.values():
+            listed[rows] = False
+        if label is not None:
+            self.lists[label][rows] = True
+
+    def _update_bounds(self):
+        """sets the bounds of every variable whose player has changed list, been banned or been pruned since the last solve"""
+        lists = self.lists
+        in_squad = lists["in_team"] | lists["starting"] | lists["on_bench"]
+        banned = lists["out_team"] | np.isin(self.index.team_codes, list(self.banned_teams))
+        assert not (in_squad & banned).any(), "a player can't be both locked and banned"
+        unavailable = banned
+        if self.prune:
+            unavailable = banned | dominated(
+                self.groups.pos_codes,
+                self.groups.team_codes,
+                self.df.cost.to_numpy(dtype=float),
+                self.pts,
+                {"G": 2, "D": 5, "M": 5, "F": 3},
+                max_from_team=self.max_from_team,
+                keep=in_squad,
+                unavailable=banned,
+            )
+        bounds = np.array([in_squad, ~unavailable, lists["starting"], ~unavailable & ~lists["on_bench"]], dtype=float)
+        for row, col in zip(*np.nonzero(bounds != self.bounds)):
+            var = (self.x if row < 2 else self.y)[col]
+            if row % 2:
+                var.ub = bounds[row, col]
+            else:
+                var.lb = bounds[row, col]
+        self.bounds = bounds
+
+    def lock(self, players):
+        """
+        makes players be in the squad, as in_team does
+        :param players - list<int or str>: player ids and names, as in optimiser_B
+        """
+        self._set_list("in_team", players)
+
+    def lock_starting(self, players):
+        """makes players be in the starting 11, as starting does"""
+        self._set_list("starting", players)
+
+    def lock_on_bench(self, players):
+        """makes players be in the squad but not in the starting 11, as on_bench does"""
+        self._set_list("on_bench", players)
+
+    def ban(self, players):
+        """stops players from being picked, as out_team does"""
+        self._set_list("out_team", players)
+
+    def release(self, players):
+        """takes players out of every list, so that they can be picked or left out again"""
+        self._set_list(None, players)
+
+    def ban_teams(self, teams, banned=True):
+        """
+        stops every player from a list of teams from being picked, as banned_teams does
+        :param teams - list<str>: team names, which are case insensitive
+        :param banned - bool: False to allow the teams' players to be picked again
+        """
+        self.index.select(teams={"teams": teams})
+        codes = {self.index.team_code[team.lower()] for team in teams}
+        if banned:
+            self.banned_teams |= codes
+        else:
+            self.banned_teams -= codes
+
+    def set_budget(self, budget):
+        """:param budget - int or float: the maximum sum of costs allowed in the squad"""
+        self.budget_constr.rhs = budget
+
+    def set_max_from_team(self, max_from_team):
+        """:param max_from_team - int: maximum number of players allowed from a single team"""
+        for constr in self.team_constrs:
+            constr.rhs = max_from_team
+        self.max_from_team = max_from_team
+
+    def set_captain(self, captain):
+        """:param captain - bool: denotes whether the captain's points get doubled"""
+        self.captain = captain
+        self.captain_constr.rhs = int(captain)
+
+    def set_formation(self, DEF=None, MID=None, FWD=None):
+        """:param DEF, MID, FWD - int: the number of players of this position in the starting 11, or None to allow any number"""
+        for pos, count in {"DEF": DEF, "MID": MID, "FWD": FWD}.items():
+            lo, hi = FORMATION_RULES[pos]
+            if count:
+                assert lo <= count <= hi, f"That is not a valid value for {pos}"
+                lo, hi = count, count
+            at_least, at_most = self.formation_constrs[pos]
+            at_least.rhs, at_most.rhs = lo, hi
+
+    def set_bench_strength(self, bench_strength):
+        """:param bench_strength - float: a number between 0 and 1 inclusive that denotes how much to take the bench into account"""
+        assert 0 <= bench_strength <= 1, "that is not a valid value for bench strength"
+        # (1 - b) * starting 11 + b * bench + (1 - b) * captain, with the bench written as squad - starting 11
+        coeffs = np.concatenate([bench_strength * self.pts, (1 - 2 * bench_strength) * self.pts, (1 - bench_strength) * self.pts])
+        self.model.objective = maximize(linear_sum(self.x + self.y + self.z, coeffs=coeffs))
+
+    def solve(self):
+        """
+        solves the model as it stands, returning a SquadResult
+        :raises ValueError: if no squad meets every constraint
+        """
+        start_time = time.perf_counter()
+        self._update_bounds()
+        status = self.model.optimize()
+        seconds = time.perf_counter() - start_time
+        if status not in [OptimizationStatus.OPTIMAL, OptimizationStatus.FEASIBLE]:
+            raise ValueError(f"no squad meets every constraint, the solver's status is {status.name}")
+
+        x, y, z = read_binary(self.model, *self.cols)
+        start_i, bench_i = np.flatnonzero(y), np.flatnonzero(x & ~y)
+        captain_i = int(np.flatnonzero(z)[0]) if self.captain else None
+        return squad_result(self.df, start_i, bench_i, captain_i, self.model.objective_value, seconds)
@@ -0,0 +1,459 @@
+"""
+Bulk assembly of mip models from numpy arrays.
+
+Rather than creating a Var and a LinExpr for every term, a SparseModel keeps the objective
+as a coefficient vector and the constraints as (row, col, value) triplets - the same layout
+as a scipy.sparse.coo_matrix. The finished model is written straight to an MPS file, which
+the solver then reads in a single call.
+"""
+from mip import BINARY, CONTINUOUS, EQUAL, GREATER_OR_EQUAL, INTEGER, LESS_OR_EQUAL, MAXIMIZE, Model
+import numpy as np
+import os
+import tempfile
+from model_builder import CHIPS, MAX_FREE_TRANSFERS, identical_pairs
+import profiling
+
+MPS_SENSES = {LESS_OR_EQUAL: "L", GREATER_OR_EQUAL: "G", EQUAL: "E"}
+
+
+class SparseModel:
+    """a mixed integer program held as numpy arrays, with one column per variable and one row per constraint"""
+
+    def __init__(self, sense=MAXIMIZE):
+        self.sense = sense
+        self.num_cols = 0
+        self.num_rows = 0
+        self._lb, self._ub, self._integer, self._obj = [], [], [], []
+        self._rows, self._cols, self._vals = [], [], []
+        self._senses, self._rhs = [], []
+
+    def copy(self):
+        """returns a copy that shares this model's arrays, so that variables, constraints and objective terms can be added to it cheaply"""
+        other = SparseModel(self.sense)
+        other.__dict__.update({name: list(value) if isinstance(value, list) else value for name, value in self.__dict__.items()})
+        return other
+
+    def add_vars(self, n, var_type=BINARY, lb=0.0, ub=None, obj=0.0):
+        """
+        adds n variables and returns their column indices
+        :param n - int: the number of variables to add
+        :param var_type - str: BINARY, INTEGER or CONTINUOUS, as in mip
+        :param lb, ub - float or array<float>: the bounds of the variables. ub defaults to 1 for binaries and infinity otherwise
+        :param obj - float or array<float>: the objective coefficient of each variable
+        """
+        if ub is None:
+            ub = 1.0 if var_type == BINARY else np.inf
+        self._lb.append(np.broadcast_to(np.asarray(lb, dtype=float), (n,)))
+        self._ub.append(np.broadcast_to(np.asarray(ub, dtype=float), (n,)))
+        self._integer.append(np.full(n, var_type in (BINARY, INTEGER)))
+        self._obj.append(np.broadcast_to(np.asarray(obj, dtype=float), (n,)).copy())
+        cols = np.arange(self.num_cols, self.num_cols + n)
+        self.num_cols += n
+        return cols
+
+    def add_objective(self, cols, coeffs):
+        """adds coeffs to the objective coefficients of cols, so repeated calls accumulate like terms in an expression"""
+        obj = self.objective
+        np.add.at(obj, np.asarray(cols), coeffs)
+        self._obj = [obj]
+
+    @property
+    def objective(self):
+        return np.concatenate(self._obj) if self._obj else np.zeros(0)
+
+    def add_constrs(self, row, col, val, sense, rhs, num_rows=None):
+        """
+        adds a block of constraints given as coordinate triplets, and returns their row indices
+        :param row - array<int>: the row of each nonzero, counted from 0 within this block
+        :param col - array<int>: the column of each nonzero, as returned by add_vars
+        :param val - float or array<float>: the value of each nonzero
+        :param sense - str or array<str>: LESS_OR_EQUAL, GREATER_OR_EQUAL or EQUAL, as in mip
+        :param rhs - float or array<float>: the right hand side of each row
+        :param num_rows - int: the number of rows in the block. If left blank, it is taken from rhs or row
+        """
+        row = np.asarray(row, dtype=np.int64)
+        col = np.asarray(col, dtype=np.int64)
+        if num_rows is None:
+            num_rows = len(rhs) if np.ndim(rhs) else int(row.max()) + 1
+        self._rows.append(row + self.num_rows)
+        self._cols.append(col)
+        self._vals.append(np.broadcast_to(np.asarray(val, dtype=float), row.shape))
+        self._senses.append(np.broadcast_to(np.asarray(sense), (num_rows,)))
+        self._rhs.append(np.broadcast_to(np.asarray(rhs, dtype=float), (num_rows,)))
+        rows = np.arange(self.num_rows, self.num_rows + num_rows)
+        self.num_rows += num_rows
+        return rows
+
+    def add_group_constrs(self, codes, cols, sense, rhs, num_groups=None):
+        """
+        adds one constraint per group summing the columns in that group, e.g. one row per team using team codes
+        :param codes - array<int>: the group of each column
+        :param cols - array<int>: the columns to sum
+        """
+        if num_groups is None:
+            num_groups = len(rhs) if np.ndim(rhs) else int(np.max(codes)) + 1
+        return self.add_constrs(codes, cols, 1.0, sense, rhs, num_groups)
+
+    def coo(self):
+        """returns the constraint matrix as (row, col, val) arrays along with its shape"""
+        if not self._rows:
+            return np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros(0), (0, self.num_cols)
+        return (
+            np.concatenate(self._rows),
+            np.concatenate(self._cols),
+            np.concatenate(self._vals),
+            (self.num_rows, self.num_cols),
+        )
+
+    def to_scipy(self):
+        """returns the constraint matrix as a scipy.sparse.coo_matrix. Requires scipy to be installed"""
+        from scipy.sparse import coo_matrix
+
+        row, col, val, shape = self.coo()
+        return coo_matrix((val, (row, col)), shape=shape)
+
+    def write_mps(self, path):
+        """writes the model to path as a free format MPS file"""
+        row, col, val, _ = self.coo()
+        obj = self.objective
+        lb, ub = np.concatenate(self._lb), np.concatenate(self._ub)
+        integer = np.concatenate(self._integer)
+        senses = np.concatenate(self._senses) if self._senses else np.zeros(0, str)
+        rhs = np.concatenate(self._rhs) if self._rhs else np.zeros(0)
+
+        # every column gets an objective entry, even if it is zero, so that none are dropped from the file
+        row_names = ["obj"] + [f"R{i}" for i in range(self.num_rows)]
+        entry_col = np.concatenate([np.arange(self.num_cols), col])
+        entry_row = np.concatenate([np.zeros(self.num_cols, np.int64), row + 1])
+        entry_val = np.concatenate([obj, val])
+        order = np.lexsort((entry_row, entry_col))
+        entry_col, entry_row, entry_val = entry_col[order], entry_row[order], entry_val[order]
+
+        binary = integer & (lb == 0) & (ub == 1)
+        general = ~binary
+        has_lb = general & np.isfinite(lb) & (lb != 0)
+        has_ub = general & np.isfinite(ub)
+
+        # integer columns have to be wrapped in markers, so split the entries wherever integrality changes
+        starts = np.flatnonzero(np.diff(integer[entry_col].astype(np.int8), prepend=-1))
+        ends = np.append(starts[1:], len(entry_col))
+
+        with open(path, "w") as out:
+            out.write("NAME fpl\nROWS\n N obj\n")
+            out.writelines(f" {MPS_SENSES[s]} R{i}\n" for i, s in enumerate(senses.tolist()))
+            out.write("COLUMNS\n")
+            for k, (a, b) in enumerate(zip(starts.tolist(), ends.tolist())):
+                is_int = integer[entry_col[a]]
+                if is_int:
+                    out.write(f"    M{k} 'MARKER' 'INTORG'\n")
+                out.writelines(
+                    f"    C{c} {row_names[r]} {v!r}\n"
+                    for c, r, v in zip(entry_col[a:b].tolist(), entry_row[a:b].tolist(), entry_val[a:b].tolist())
+                )
+                if is_int:
+                    out.write(f"    M{k} 'MARKER' 'INTEND'\n")
+            out.write("RHS\n")
+            out.writelines(f"    RHS R{i} {v!r}\n" for i, v in zip(np.flatnonzero(rhs).tolist(), rhs[rhs != 0].tolist()))
+            out.write("BOUNDS\n")
+            out.writelines(f" BV BND C{j}\n" for j in np.flatnonzero(binary).tolist())
+            out.writelines(f" MI BND C{j}\n" for j in np.flatnonzero(general & np.isneginf(lb)).tolist())
+            out.writelines(f" LO BND C{j} {v!r}\n" for j, v in zip(np.flatnonzero(has_lb).tolist(), lb[has_lb].tolist()))
+            out.writelines(f" UP BND C{j} {v!r}\n" for j, v in zip(np.flatnonzero(has_ub).tolist(), ub[has_ub].tolist()))
+            out.writelines(f" PL BND C{j}\n" for j in np.flatnonzero(general & integer & np.isinf(ub)).tolist())
+            out.write("ENDATA\n")
+
+    def to_mip(self, solver_name="CBC"):
+        """loads the model into a new mip Model in a single read, and returns it. model.vars[j] is column j"""
+        model = Model(solver_name=solver_name)
+        verbose, model.verbose = model.verbose, 0
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "model.mps")
+            self.write_mps(path)
+            model.read(path)
+        model.sense = self.sense
+        model.verbose = verbose
+        return model
+
+
+def build_squad_plan(
+    groups,
+    value,
+    pts,
+    budget,
+    max_from_team=3,
+    bench_strength=0.1,
+    future_gw_multiplier=1,
+    in_team_rows=[],
+    current_rows=None,
+    free_transfers=1,
+    wildcard=False,
+    formulation="overlap",
+    hit_cost=4,
+    max_hits=0,
+    chips={},
+    integer_lineups=False,
+):
+    """
+    builds the with_transfers multi-gameweek model as a SparseModel, returning it along with
+    the columns of x, y and z as (num_gws, num_players) arrays
+    :param groups - PlayerGroups: the indexed player pool
+    :param value - array<float>: the cost of each player
+    :param pts - array<float>: the points of each player, one column per gameweek
+    :param budget - int or float: the maximum sum of costs allowed in each gameweek's 15 man squad
+    :param in_team_rows - list<int>: rows of players that must be in the squad for every gameweek
+    :param current_rows - array<int>: rows of the players in the current squad. If left blank, there is no current squad,
+        and the first gameweek's squad can be picked freely
+    :param free_transfers - int: the number of free transfers currently available
+    :param wildcard - bool: denotes whether or not a wildcard is being played in the first gameweek
+    :param formulation - str: "overlap" or "flow", as in add_transfers_overlap() and add_transfers_flow()
+    :param hit_cost - float: the points that each hit costs with the flow formulation
+    :param max_hits - int: the most hits that can be taken over the horizon with the flow formulation. If left blank, there is no limit
+    :param chips - dict<str, int>: the gameweek, counted from 0, that each of "wildcard", "free_hit" and "bench_boost" is
+        played in with the flow formulation, see add_chips()
+    :param integer_lineups - bool: denotes whether the starting 11 and captain are always binary. The flow formulation makes them
+        continuous otherwise, which is only exact while nothing but the squads constrains them, unlike a CVaR objective
+    """
+    sm, x, y, z = build_squads(
+        groups, value, pts, budget, max_from_team, bench_strength, future_gw_multiplier, in_team_rows, formulation, integer_lineups
+    )
+    add_plan_transfers(
+        sm, (x, y, z), groups, value, pts, bench_strength, future_gw_multiplier, in_team_rows, current_rows, free_transfers,
+        wildcard, formulation, hit_cost, max_hits, chips,
+    )
+    return sm, x, y, z
+
+
+def build_squads(
+    groups, value, pts, budget, max_from_team=3, bench_strength=0.1, future_gw_multiplier=1, in_team_rows=[], formulation="overlap", integer_lineups=False
+):
+    """
+    builds every gameweek's squad, starting 11 and captain of a squad plan with the objective, but without the transfers
+    between them, so that it can be copied and finished with different transfer rules by add_plan_transfers().
+    If budget is None, the budget constraints are left out too. All other parameters are as in build_squad_plan()
+    """
+    n, num_gws = pts.shape
+    sm = SparseModel()
+    rules = {"G": [1, 1, 2], "D": [3, 5, 5], "M": [2, 5, 5], "F": [1, 3, 3]}
+    y_min = np.array([rules[pos][0] for pos in rules], dtype=float)
+    y_max = np.array([rules[pos][1] for pos in rules], dtype=float)
+    x_count = np.array([rules[pos][2] for pos in rules], dtype=float)
+    players = np.arange(n)
+
+    x = np.empty((num_gws, n), np.int64)
+    y = np.empty((num_gws, n), np.int64)
+    z = np.empty((num_gws, n), np.int64)
+    # the best starting 11 and captain of a squad is a flow problem, so once the squads are integer they are too
+    lineup_type = CONTINUOUS if formulation == "flow" and not integer_lineups else BINARY
+    for a in range(num_gws):
+        weight = future_gw_multiplier ** a
+        profiling.family(sm, "squad")
+        x[a] = sm.add_vars(n, obj=weight * bench_strength * pts[:, a])
+        y[a] = sm.add_vars(n, lineup_type, ub=1.0, obj=weight * (1 - 2 * bench_strength) * pts[:, a])
+        z[a] = sm.add_vars(n, lineup_type, ub=1.0, obj=weight * (1 - bench_strength) * pts[:, a])
+
+        # captain is a subset of the starting xi, which is itself a subset of the 15 man squad
+        link_row = np.concatenate([players, players, players + n, players + n])
+        link_col = np.concatenate([z[a], y[a], y[a], x[a]])
+        link_val = np.repeat([1.0, -1.0, 1.0, -1.0], n)
+        sm.add_constrs(link_row, link_col, link_val, LESS_OR_EQUAL, 0.0, 2 * n)
+
+        # budget, positions, teamsize and max_from_team
+        if budget is not None:
+            profiling.family(sm, "budget")
+            sm.add_constrs(np.zeros(n), x[a], value, LESS_OR_EQUAL, budget, 1)
+        profiling.family(sm, "position")
+        sm.add_group_constrs(groups.pos_codes, x[a], EQUAL, x_count)
+        sm.add_group_constrs(groups.pos_codes, y[a], GREATER_OR_EQUAL, y_min)
+        sm.add_group_constrs(groups.pos_codes, y[a], LESS_OR_EQUAL, y_max)
+        profiling.family(sm, "squad")
+        sm.add_constrs(np.zeros(n), y[a], 1.0, EQUAL, 11, 1)
+        sm.add_constrs(np.zeros(n), z[a], 1.0, EQUAL, 1, 1)
+        profiling.family(sm, "team")
+        sm.add_group_constrs(groups.team_codes, x[a], LESS_OR_EQUAL, max_from_team, len(groups.teams))
+
+    profiling.family(sm, "locks")
+    in_team_rows = np.asarray(in_team_rows, dtype=np.int64)
+    if len(in_team_rows):
+        cols = x[:, in_team_rows].ravel()
+        sm.add_constrs(np.arange(len(cols)), cols, 1.0, EQUAL, 1.0)
+    profiling.family(sm, None)
+
+    return sm, x, y, z
+
+
+def add_plan_transfers(
+    sm,
+    variables,
+    groups,
+    value,
+    pts,
+    bench_strength=0.1,
+    future_gw_multiplier=1,
+    in_team_rows=[],
+    current_rows=None,
+    free_transfers=1,
+    wildcard=False,
+    formulation="overlap",
+    hit_cost=4,
+    max_hits=0,
+    chips={},
+    kept=None,
+    free=None,
+):
+    """
+    adds the transfer rules and any chips to squads built by build_squads(). All parameters are as in build_squad_plan()
+    :param variables - tuple<array<int>>: the columns of x, y and z, as returned by build_squads()
+    :param kept, free: columns that stand in for the current squad and free_transfers in a model that is solved for many
+        squads, see add_transfers_overlap(). current_rows is then every player who is in any of the squads
+    """
+    x, y, z = variables
+    num_gws = pts.shape[1]
+    in_team_rows = np.asarray(in_team_rows, dtype=np.int64)
+    assert not chips or formulation == "flow", "chips can only be played with the flow formulation"
+    profiling.family(sm, "transfers")
+    if formulation == "flow":
+        # a hit costs as much as hit_cost points scored by a starter
+        hit_costs = hit_cost * (1 - bench_strength) * future_gw_multiplier ** np.arange(num_gws)
+        add_transfers_flow(sm, x, current_rows, free_transfers, wildcard, max_hits, hit_costs, chips, kept, free)
+        add_chips(sm, x, y, z, pts, chips, bench_strength, future_gw_multiplier)
+        profiling.family(sm, "symmetry")
+        fixed_rows = np.concatenate([in_team_rows, [] if current_rows is None else current_rows]).astype(np.int64)
+        add_symmetry_breaking(sm, identical_pairs(groups, value, pts, fixed_rows), x, y, z)
+    else:
+        add_transfers_overlap(sm, x, current_rows, free_transfers, wildcard, kept, free)
+    profiling.family(sm, None)
+
+
+def add_chips(sm, x, y, z, pts, chips, bench_strength=0.1, future_gw_multiplier=1):
+    """
+    adds the bench boost to a squad plan's objective, so that the bench scores as much as the starting 11 in its gameweek. The wildcard
+    and free hit change the transfer rules instead, see add_transfers_flow()
+    :param chips - dict<str, int>: the gameweek, counted from 0, that each chip is played in
+    """
+    assert set(chips) <= set(CHIPS), f"the chips are {', '.join(CHIPS)}"
+    assert len(set(chips.values())) == len(chips), "only one chip can be played in a gameweek"
+    if "bench_boost" in chips:
+        a = chips["bench_boost"]
+        weight = future_gw_multiplier ** a
+        # the bench is lifted from bench_strength to a starter's 1 - bench_strength, and the starters and captain are as in any other week
+        sm.add_objective(x[a], weight * (1 - 2 * bench_strength) * pts[:, a])
+        sm.add_objective(y[a], -weight * (1 - 2 * bench_strength) * pts[:, a])
+
+
+def add_symmetry_breaking(sm, pairs, *variables):
+    """
+    for every pair (i, j) from model_builder.identical_pairs(), only lets player j be picked, start or captain in a gameweek if player i does
+    :param pairs - tuple<array<int>>: the rows of each pair of interchangeable players
+    :param variables - array<int>: the columns of the x, y and z variables, each with shape (num_gws, num_players)
+    """
+    i, j = pairs
+    for var in variables:
+        # one row for each gameweek and pair, saying var[gw, j] - var[gw, i] <= 0
+        num_rows = var.shape[0] * len(i)
+        if num_rows:
+            cols = np.concatenate([var[:, j].ravel(), var[:, i].ravel()])
+            sm.add_constrs(np.tile(np.arange(num_rows), 2), cols, np.repeat([1.0, -1.0], num_rows), LESS_OR_EQUAL, 0.0, num_rows)
+
+
+def add_transfers_overlap(sm, x, current_rows=None, free_transfers=1, wildcard=False, kept=None, free=None):
+    """
+    adds the transfer rules to a squad plan by counting the players kept between consecutive gameweeks, with at most 2
+    transfers each week and at most n + free_transfers after n weeks. All parameters are as in build_squad_plan()
+    :param x - array<int>: the columns of the squad variables, with shape (num_gws, num_players)
+    :param kept - array<int>: if given, columns whose sum is the number of current squad players in the first squad,
+        which are counted instead of x[0, current_rows], so that the current squad can be set with their bounds
+    :param free - int: if given, the column of a variable fixed to the number of free transfers, which is used instead of free_transfers
+    """
+    num_gws, n = x.shape
+    players = np.arange(n)
+    link_val = np.repeat([1.0, -1.0, 1.0, -1.0], n)
+    if current_rows is not None:
+        current = current_columns(x, current_rows, kept, free)
+        if not wildcard:
+            # current kept + free_transfers >= 15, with free_transfers as a column or on the right
+            sm.add_constrs(np.zeros(len(current)), current, 1.0, GREATER_OR_EQUAL, 15 - (free_transfers if free is None else 0), 1)
+
+    # players kept between consecutive gameweeks, with at most 2 transfers each week
+    if num_gws > 1:
+        both = np.stack([sm.add_vars(n) for a in range(num_gws - 1)])
+        num_transfers = sm.add_vars(num_gws - 1, CONTINUOUS)
+        for a in range(num_gws - 1):
+            keep_row = np.concatenate([players, players, players + n, players + n])
+            keep_col = np.concatenate([both[a], x[a], both[a], x[a + 1]])
+            sm.add_constrs(keep_row, keep_col, link_val, LESS_OR_EQUAL, 0.0, 2 * n)
+            sm.add_constrs(np.zeros(n), both[a], 1.0, GREATER_OR_EQUAL, 13, 1)
+            sm.add_constrs(
+                np.zeros(n + 1), np.append(both[a], num_transfers[a]), 1.0, EQUAL, 15, 1
+            )
+
+        # cumulative limit on transfers, which also counts the first gameweek's transfers if there is a current squad
+        cum_row, cum_k = np.tril_indices(num_gws - 1)
+        cum_col, cum_val = num_transfers[cum_k], np.ones(len(cum_k))
+        limit = np.arange(1, num_gws).astype(float)
+        if current_rows is not None:
+            m = len(current)
+            cum_row = np.concatenate([cum_row, np.repeat(np.arange(num_gws - 1), m)])
+            cum_col = np.concatenate([cum_col, np.tile(current, num_gws - 1)])
+            cum_val = np.concatenate([cum_val, -np.ones(m * (num_gws - 1))])
+            limit += (free_transfers if free is None else 0) - 15
+        sm.add_constrs(cum_row, cum_col, cum_val, LESS_OR_EQUAL, limit)
+
+
+def current_columns(x, current_rows, kept=None, free=None):
+    """
+    returns the columns whose sum is the number of current squad players in x[0], along with free if it is given, so that
+    adding them up counts the kept players plus the free transfers. See add_transfers_overlap() for kept and free
+    """
+    current = x[0, np.asarray(current_rows, dtype=np.int64)] if kept is None else np.asarray(kept, dtype=np.int64)
+    return current if free is None else np.append(current, free)
+
+
+def add_transfers_flow(sm, x, current_rows=None, free_transfers=1, wildcard=False, max_hits=None, hit_costs=0.0, chips={}, kept=None, free=None):
+    """
+    adds the transfer rules to a squad plan with explicit transfer in and out variables, as model_builder.add_transfer_flow()
+    does, and charges each hit in the objective. All other parameters are as in build_squad_plan()
+    :param x - array<int>: the columns of the squad variables, with shape (num_gws, num_players)
+    :param hit_costs - array<float>: the objective cost of a hit before each gameweek
+    :param chips - dict<str, int>: the gameweek, counted from 0, of each chip. Transfers before a wildcard or free hit
+        are free and leave 1 free transfer for the week after, as the wildcard parameter does for the first gameweek, and
+        the squad after a free hit is compared with the squad before it
+    :param kept, free: columns that stand in for the current squad and free_transfers, as in add_transfers_overlap()
+    """
+    num_gws, n = x.shape
+    players = np.arange(n)
+    free_first = current_rows is None or wildcard
+    counted = np.arange(1 if free_first else 0, num_gws)
+    if not len(counted):
+        return
+    hits = sm.add_vars(len(counted), CONTINUOUS, obj=-np.broadcast_to(hit_costs, (num_gws,))[counted])
+    # there is always at least 1 free transfer the week after, so any transfers beyond the free ones are hits
+    free_after = sm.add_vars(len(counted), CONTINUOUS, lb=1, ub=MAX_FREE_TRANSFERS)
+    free_weeks = [chips[chip] for chip in ["wildcard", "free_hit"] if chip in chips]
+    for k, a in enumerate(counted.tolist()):
+        # the squad after a free hit is compared with the squad before it, or with the current squad
+        before = a - 2 if chips.get("free_hit") == a - 1 else a - 1
+        if a in free_weeks or (before < 0 and current_rows is None):
+            # any number of transfers are free, and leave 1 free transfer for the week after
+            sm.add_constrs([0], [free_after[k]], 1.0, LESS_OR_EQUAL, 1.0, 1)
+            continue
+        # free_after + transfers - hits - free_before <= 1, with the free transfers before the first week on the right
+        row, col, val = [0, 0], [free_after[k], hits[k]], [1.0, -1.0]
+        rhs = 1.0 if k > 0 else 1.0 + (1 if free_first else free_transfers if free is None else 0)
+        if k > 0:
+            row, col, val = row + [0], col + [free_after[k - 1]], val + [-1.0]
+        if before < 0:
+            assert kept is None or a == 0, "kept only counts the current squad players in the first squad"
+            current = current_columns(x[a:], current_rows, kept, None if k > 0 else free)
+            row, col, val = row + [0] * len(current), col + current.tolist(), val + [-1.0] * len(current)
+            rhs -= 15
+        else:
+            t_in = sm.add_vars(n, CONTINUOUS, ub=1)
+            t_out = sm.add_vars(n, CONTINUOUS, ub=1)
+            # x[a] - x[before] - t_in + t_out == 0
+            flow_row = np.tile(players, 4)
+            flow_col = np.concatenate([x[a], x[before], t_in, t_out])
+            sm.add_constrs(flow_row, flow_col, np.repeat([1.0, -1.0, -1.0, 1.0], n), EQUAL, 0.0, n)
+            row, col, val = row + [0] * n, col + t_in.tolist(), val + [1.0] * n
+        sm.add_constrs(row, col, val, LESS_OR_EQUAL, rhs, 1)
+    if max_hits is not None:
+        sm.add_constrs(np.zeros(len(hits)), hits, 1.0, LESS_OR_EQUAL, max_hits, 1)
@@ -0,0 +1,182 @@
+"""
+Solving many parameter sets for optimiser_B or with_transfers/optimiser.py in a process pool.
+
+The csv is parsed once, and each numeric column is copied into shared memory that every worker
+process maps instead of reading the file again. Each scenario's result is reduced to one row,
+and the rows are returned as a single table marking which scenarios are on the cost/points
+Pareto frontier, i.e. no other scenario scores at least as many points for no more money.
+
+usage:
+    python sweep.py B --budget 95 100 --bench_strength 0.1 0.2
+    python sweep.py with_transfers --user_id 352 --num_gws 5 --future_gw_multiplier 0.8 0.9 1
+"""
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from multiprocessing import shared_memory
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "with_transfers"))
+from player_data import read_players
+import optimiser_B
+import optimiser as optimiser_with_transfers
+
+OPTIMISERS = {
+    "B": optimiser_B.optimise,
+    "with_transfers": optimiser_with_transfers.optimise,
+}
+SWEEP_PARAMS = ["budget", "bench_strength", "future_gw_multiplier", "max_from_team"]
+
+# the player data, attached once in each worker process
+_data = None
+_blocks = []
+
+
+def share_frame(df):
+    """
+    copies every numeric column of df into its own block of shared memory
+    returns a picklable description of the dataframe, and the blocks, which must be unlinked once the workers are done
+    """
+    spec, blocks = [], []
+    for col in df.columns:
+        values = df[col].to_numpy()
+        if values.dtype == object:
+            spec.append((col, None, values.tolist()))
+            continue
+        block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        np.ndarray(values.shape, values.dtype, buffer=block.buf)[:] = values
+        blocks.append(block)
+        spec.append((col, block.name, (values.shape, values.dtype.str)))
+    return spec, blocks
+
+
+def attach_frame(spec):
+    """rebuilds a dataframe described by share_frame, with its numeric columns backed by the shared memory"""
+    columns = {}
+    for col, name, data in spec:
+        if name is None:
+            columns[col] = data
+            continue
+        block = shared_memory.SharedMemory(name=name)
+        _blocks.append(block)
+        shape, dtype = data
+        values = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+        # the optimisers copy the data they are given, so nothing should ever write to the shared columns
+        values.flags.writeable = False
+        columns[col] = values
+    return pd.DataFrame(columns, copy=False)
+
+
+def _attach(spec):
+    """worker initialiser - attaches the shared player data and silences the optimiser's and the solver's output"""
+    global _data
+    _data = attach_frame(spec)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+
+
+def grid(**values):
+    """
+    returns a list of parameter sets, one for every combination of the values given
+    e.g. grid(budget=[95, 100], bench_strength=[0.1, 0.2]) returns 4 parameter sets
+    """
+    names = list(values)
+    return [dict(zip(names, combination)) for combination in product(*values.values())]
+
+
+def summarise(optimiser, result, fixed):
+    """returns the points scored by the starting 11s and the most that any squad costs"""
+    if optimiser == "B":
+        col = fixed.get("col_to_max", "points")
+        return result.squad.iloc[:11][col].sum(), round(result.cost, 1)
+    return result.points, round(max(gameweek.cost for gameweek in result.gameweeks.values()), 1)
+
+
+def solve_scenario(optimiser, scenario, fixed):
+    """solves one parameter set against the shared player data, returning a row of the results table"""
+    row = dict(scenario)
+    try:
+        # only the totals are kept, so there is no need to print each result
+        result = OPTIMISERS[optimiser](filepath=_data, show=False, **fixed, **scenario)
+        row["points"], row["cost"] = summarise(optimiser, result, fixed)
+        row["status"] = "ok"
+    except Exception as e:
+        row["points"], row["cost"] = np.nan, np.nan
+        row["status"] = f"{type(e).__name__}: {e}"
+    return row
+
+
+def pareto(points, cost):
+    """returns a boolean array that is True for every scenario that no other scenario beats on both points and cost"""
+    points, cost = np.asarray(points, dtype=float), np.asarray(cost, dtype=float)
+    solved = ~np.isnan(points)
+    p, c = points[solved], cost[solved]
+    beaten = (
+        (p[None, :] >= p[:, None]) & (c[None, :] <= c[:, None]) & ((p[None, :] > p[:, None]) | (c[None, :] < c[:, None]))
+    ).any(axis=1)
+    frontier = np.zeros(len(points), dtype=bool)
+    frontier[np.flatnonzero(solved)[~beaten]] = True
+    return frontier
+
+
+def sweep(optimiser, scenarios, filepath, processes=None, **fixed):
+    """
+    solves every parameter set in a process pool and returns the results as a single dataframe
+    :param optimiser - str: "B" for optimiser_B.optimise, or "with_transfers" for with_transfers/optimiser.optimise
+    :param scenarios - list<dict>: the parameter sets to solve, e.g. as returned by grid()
+    :param filepath - str: the csv or .npz file containing the player data, which is only read once
+    :param processes - int: the number of worker processes. If left blank, one is used for every core
+    :param fixed: any other arguments to the optimiser, which are the same for every scenario, e.g. user_id and num_gws
+    """
+    df = read_players(filepath)
+    spec, blocks = share_frame(df)
+    try:
+        with ProcessPoolExecutor(processes or os.cpu_count(), initializer=_attach, initargs=(spec,)) as pool:
+            rows = list(pool.map(solve_scenario, [optimiser] * len(scenarios), scenarios, [fixed] * len(scenarios)))
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    results = pd.DataFrame(rows)
+    results["pareto"] = pareto(results.points, results.cost)
+    return results.sort_values(by=["cost", "points"], ascending=[True, False]).reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Solve a grid of parameter sets for one of the optimisers in parallel")
+    parser.add_argument("optimiser", choices=list(OPTIMISERS))
+    parser.add_argument("--filepath", help="defaults to players_data.csv for B and with_transfers/cleaned_data.csv otherwise")
+    parser.add_argument("--processes", type=int, help="defaults to one worker for every core")
+    parser.add_argument("--out", help="also save the results table to this csv")
+    parser.add_argument("--user_id", type=int)
+    parser.add_argument("--num_gws", type=int)
+    parser.add_argument("--budget", type=float, nargs="+")
+    parser.add_argument("--bench_strength", type=float, nargs="+")
+    parser.add_argument("--future_gw_multiplier", type=float, nargs="+")
+    parser.add_argument("--max_from_team", type=int, nargs="+")
+    args = parser.parse_args()
+
+    fixed = {}
+    if args.optimiser == "with_transfers":
+        if args.user_id is None or args.num_gws is None:
+            parser.error("with_transfers needs --user_id and --num_gws")
+        fixed = {"user_id": args.user_id, "num_gws": args.num_gws}
+    elif args.future_gw_multiplier:
+        parser.error("optimiser_B only optimises a single gameweek, so it has no future_gw_multiplier")
+    default_file = "players_data.csv" if args.optimiser == "B" else os.path.join(ROOT, "with_transfers", "cleaned_data.csv")
+
+    scenarios = grid(**{param: getattr(args, param) for param in SWEEP_PARAMS if getattr(args, param)})
+    results = sweep(args.optimiser, scenarios, args.filepath or default_file, args.processes, **fixed)
+    print(results.to_string(index=False, float_format="%.2f"))
+    if args.out:
+        results.to_csv(args.out, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Saving a solved multi-gameweek plan to disk, and turning it back into a MIP start for the next run.
+
+Plans are stored by player id rather than by row, so they survive changes to the data file. When
+a plan is reused, each gameweek in the new horizon takes the squad that was planned for it, or
+the last planned squad for gameweeks beyond the old horizon. The starting 11 and captain are then
+picked again from the latest projections, as that is always at least as good for the same squad.
+"""
+import json
+import numpy as np
+from model_builder import MAX_FREE_TRANSFERS, POSITIONS
+
+SQUAD_COUNTS = np.array([2, 5, 5, 3])
+MIN_STARTING = np.array([1, 3, 2, 1])
+
+
+def save_plan(path, first_gw, ids, x, y, z):
+    """
+    saves a solved plan as json
+    :param path - str: the file to save the plan to
+    :param first_gw - int: the gameweek that the first row of x, y and z belongs to
+    :param ids - array<int>: the id of each player, in the same order as the columns of x, y and z
+    :param x, y, z - array<float>: the solved squad, starting 11 and captain values, with shape (num_gws, num_players)
+    """
+    x, y, z = np.asarray(x), np.asarray(y), np.asarray(z)
+    plan = {}
+    for gw in range(len(x)):
+        plan[str(first_gw + gw)] = {
+            "squad": ids[x[gw] > 0.5].tolist(),
+            "starting": ids[y[gw] > 0.5].tolist(),
+            "captain": ids[z[gw] > 0.5].tolist()[0],
+        }
+    with open(path, "w") as out:
+        json.dump(plan, out, indent=2)
+
+
+def load_plan(path):
+    """loads a plan saved by save_plan, returning a dict of gameweek to the ids of that gameweek's squad"""
+    with open(path) as f:
+        plan = json.load(f)
+    return {int(gw): squads["squad"] for gw, squads in plan.items()}
+
+
+def shift_plan(plan, ids, first_gw, num_gws):
+    """
+    maps a saved plan onto a new horizon, returning a boolean array of shape (num_gws, num_players)
+    :param plan - dict<int, list<int>>: the saved squads, as returned by load_plan
+    :param ids - array<int>: the id of each player in the current data
+    :raises KeyError: if a player in the plan is no longer in the data
+    """
+    row_of = {player_id: row for row, player_id in enumerate(ids.tolist())}
+    saved = sorted(plan)
+    x = np.zeros((num_gws, len(ids)), dtype=bool)
+    for gw in range(num_gws):
+        # use the closest gameweek that was planned for
+        planned = min(max(first_gw + gw, saved[0]), saved[-1])
+        x[gw, [row_of[player_id] for player_id in plan[planned]]] = True
+    return x
+
+
+def best_lineup(pos_codes, pts):
+    """
+    picks the highest scoring valid starting 11 and captain from a squad
+    :param pos_codes - array<int>: the position code of each player in the squad
+    :param pts - array<float>: the points of each player in the squad
+    returns boolean arrays marking the starting 11 and the captain
+    """
+    order = np.argsort(-pts, kind="stable")
+    starting = np.zeros(len(pts), dtype=bool)
+    # take the minimum number from each position first, then fill the rest of the 11 with the best outfield players
+    for code, count in enumerate(MIN_STARTING):
+        starting[order[pos_codes[order] == code][:count]] = True
+    outfield = order[(pos_codes[order] != 0) & ~starting[order]]
+    starting[outfield[: 11 - starting.sum()]] = True
+    captain = np.zeros(len(pts), dtype=bool)
+    captain[np.flatnonzero(starting)[np.argmax(pts[starting])]] = True
+    return starting, captain
+
+
+def check_plan(
+    x,
+    groups,
+    value,
+    budget,
+    current_rows,
+    free_transfers=1,
+    wildcard=False,
+    in_team_rows=[],
+    max_from_team=3,
+    formulation="overlap",
+    max_hits=0,
+    chips={},
+):
+    """
+    checks a plan of squads against the constraints of with_transfers/optimiser.py's model
+    :param x - array<bool>: the squad for each gameweek, with shape (num_gws, num_players)
+    :param formulation - str: the formulation of the model, "overlap" or "flow", which have different transfer rules
+    :param max_hits - int: the most hits the plan can take with the flow formulation. If None, there is no limit
+    :param chips - dict<str, int>: the gameweek, counted from 0, of each chip played with the flow formulation
+    returns a description of the first broken constraint, or None if the plan is feasible
+    """
+    current = np.zeros(groups.n, dtype=bool)
+    current[current_rows] = True
+    num_transfers = 0
+    for gw, squad in enumerate(x):
+        counts = np.bincount(groups.pos_codes[squad], minlength=len(POSITIONS))
+        if (counts != SQUAD_COUNTS).any():
+            return f"the week {gw + 1} squad has {dict(zip(POSITIONS, counts.tolist()))} players in each position"
+        if np.bincount(groups.team_codes[squad]).max() > max_from_team:
+            return f"the week {gw + 1} squad has more than {max_from_team} players from one team"
+        if value[squad].sum() > budget + 1e-6:
+            return f"the week {gw + 1} squad costs more than the budget of {budget:.1f}"
+        if not squad[in_team_rows].all():
+            return f"the week {gw + 1} squad does not contain every in_team player"
+        if formulation == "flow":
+            continue
+
+        previous = current if gw == 0 else x[gw - 1]
+        transfers = 15 - (squad & previous).sum()
+        if gw == 0:
+            if not wildcard and transfers > free_transfers:
+                return f"the week {gw + 1} squad needs {transfers} transfers"
+        elif transfers > 2:
+            return f"the week {gw + 1} squad needs {transfers} transfers"
+        num_transfers += transfers
+        if gw > 0 and num_transfers > gw + free_transfers:
+            return f"the plan needs {num_transfers} transfers by week {gw + 1}"
+
+    if formulation == "flow":
+        hits = transfer_hits(x, current_rows, free_transfers, wildcard, chips)[1].sum()
+        if max_hits is not None and hits > max_hits:
+            return f"the plan needs {hits} hits"
+    return None
+
+
+def transfer_hits(x, current_rows=None, free_transfers=1, wildcard=False, chips={}):
+    """
+    counts the transfers made before each gameweek of a plan, with a free transfer added each week and up to
+    MAX_FREE_TRANSFERS rolled over, as the flow formulation does
+    :param x - array<bool>: the squad for each gameweek, with shape (num_gws, num_players)
+    :param current_rows - array<int>: rows of the players in the current squad. If left blank, the first squad is picked freely
+    :param free_transfers - int: the number of free transfers available before the first gameweek
+    :param wildcard - bool: denotes whether a wildcard is played in the first gameweek, which makes its transfers free
+    :param chips - dict<str, int>: the gameweek, counted from 0, of each chip, as in sparse_model.add_transfers_flow().
+        The transfers before a wildcard or free hit are free, and the squad after a free hit is compared with the one before it
+    returns int arrays of the transfers and the hits before each gameweek, and the free transfers left for the gameweek after the plan
+    """
+    transfers = np.zeros(len(x), dtype=np.int64)
+    hits = np.zeros(len(x), dtype=np.int64)
+    previous = None
+    if current_rows is not None:
+        previous = np.zeros(x.shape[1], dtype=bool)
+        previous[current_rows] = True
+    free = free_transfers
+    free_weeks = [chips[chip] for chip in ["wildcard", "free_hit"] if chip in chips]
+    for gw, squad in enumerate(x):
+        if previous is not None:
+            transfers[gw] = 15 - (squad & previous).sum()
+        if previous is None or (gw == 0 and wildcard) or gw in free_weeks:
+            free = 1
+        else:
+            hits[gw] = max(transfers[gw] - free, 0)
+            free = min(max(free - transfers[gw], 0) + 1, MAX_FREE_TRANSFERS)
+        if chips.get("free_hit") != gw:
+            previous = squad
+    return transfers, hits, int(free)
+
+
+def plan_lineups(x, groups, pts):
+    """
+    chooses the best starting 11 and captain for each gameweek of a plan of squads
+    :param x - array<bool>: the squad for each gameweek, with shape (num_gws, num_players)
+    :param pts - array<float>: the points of each player, one column per gameweek
+    returns boolean arrays of the squad, starting 11 and captain, each with the same shape as x
+    """
+    y = np.zeros(x.shape, dtype=bool)
+    z = np.zeros(x.shape, dtype=bool)
+    for gw, squad in enumerate(x):
+        rows = np.flatnonzero(squad)
+        starting, captain = best_lineup(groups.pos_codes[rows], pts[rows, gw])
+        y[gw, rows[starting]] = True
+        z[gw, rows[captain]] = True
+    return x.astype(bool), y, z
+
+
+def mip_start(x, groups, pts, x_vars, y_vars, z_vars):
+    """
+    builds a python-mip start from a plan of squads, choosing the best starting 11 and captain for each gameweek
+    :param x - array<bool>: the squad for each gameweek, with shape (num_gws, num_players)
+    :param pts - array<float>: the points of each player, one column per gameweek
+    :param x_vars, y_vars, z_vars - list<list<Var>>: the model's variables, indexed [gw][player]
+    returns a list of (Var, value) pairs that can be assigned to model.start
+    """
+    start = []
+    for gw, plan in enumerate(zip(*plan_lineups(x, groups, pts))):
+        for variables, values in zip((x_vars[gw], y_vars[gw], z_vars[gw]), plan):
+            start += zip(variables, values.astype(float).tolist())
+    return start
@@ -0,0 +1,248 @@
+"""
+Optimising the transfers of many managers at once, such as every manager in a league.
+
+The model only depends on a manager through their current squad, their budget and their free transfers, so it is built
+once for all of them, with those three left as bounds and right hand sides that can be patched in without building
+anything. Each manager's current squad is marked by the upper bounds of a column for every player who is in any of the
+squads, which can only be 1 for players in their squad and only if the player is kept in the first squad. These
+columns take the place of the current squad in the transfer rules, the number of free transfers is a column fixed by its
+bounds, and the budget is the right hand side of each gameweek's budget constraint.
+
+The model is loaded into the solver once in each worker process of a pool, and each worker patches in the managers it is
+sent one at a time and solves again, starting from keeping their current squad, so that the time per manager is close to
+the time of the solve itself:
+
+    table, plans = optimise_managers(5, league_id=314, formulation="flow", max_hits=1, max_seconds=10)
+
+returns a table with a row for each manager, and their plans as a dict of user_id to PlanResult. Pass squads from
+fpl_api.fetch_squads to use squads that have already been fetched.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import os
+import sys
+import time
+
+from mip import CONTINUOUS, LESS_OR_EQUAL
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from fpl_api import fetch_squads
+from limits import Limits
+from model_builder import PlayerGroups, PlayerIndex
+from player_data import read_players
+from pruning import prune_players
+from results import plan_result, read_binary
+from sparse_model import add_plan_transfers, build_squads
+from warm_start import check_plan, mip_start, transfer_hits
+
+# the model loaded into the solver and everything else a manager is solved with, kept once in each worker process
+_context = None
+
+
+def _load(context):
+    """worker initialiser - loads the model into the solver, and silences the solver's output"""
+    global _context
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    model = context["template"].to_mip()
+    model.verbose = 0
+    context["model"] = model
+    context["variables"] = [[[model.vars[j] for j in row] for row in col.tolist()] for col in context["cols"]]
+    context["held"] = np.zeros(len(context["kept"]))
+    _context = context
+
+
+def build_template(groups, value, pts, fixed_rows, max_from_team=3, bench_strength=0.1, future_gw_multiplier=1, in_team_rows=[], wildcard=False, formulation="overlap", hit_cost=4, max_hits=0):
+    """
+    builds the squad plan model of with_transfers/optimiser.py for any manager whose squad is made of players in fixed_rows,
+    returning it as a SparseModel along with the columns of x, y and z, the budget rows, the kept columns and the free column
+    :param fixed_rows - array<int>: the rows of every player who is in any of the managers' current squads
+    All other parameters are as in sparse_model.build_squad_plan()
+    """
+    sm, x, y, z = build_squads(groups, value, pts, None, max_from_team, bench_strength, future_gw_multiplier, in_team_rows, formulation)
+    num_gws, n = x.shape
+    budget_rows = sm.add_constrs(np.repeat(np.arange(num_gws), n), x.ravel(), np.tile(value, num_gws), LESS_OR_EQUAL, 0.0, num_gws)
+    # a kept player has to be in the first squad, and in the current squad, which is set by the upper bounds
+    kept = sm.add_vars(len(fixed_rows), CONTINUOUS, ub=0.0)
+    link_row = np.tile(np.arange(len(fixed_rows)), 2)
+    sm.add_constrs(link_row, np.concatenate([kept, x[0, fixed_rows]]), np.repeat([1.0, -1.0], len(fixed_rows)), LESS_OR_EQUAL, 0.0)
+    free = sm.add_vars(1, CONTINUOUS, lb=1.0, ub=1.0)[0]
+    add_plan_transfers(
+        sm, (x, y, z), groups, value, pts, bench_strength, future_gw_multiplier, in_team_rows, fixed_rows, 1, wildcard,
+        formulation, hit_cost, max_hits, kept=kept, free=free,
+    )
+    return sm, (x, y, z), budget_rows, kept, free
+
+
+def solve_manager(held, budget, free_transfers):
+    """
+    patches one manager into the model in a worker and solves it, returning their squads, starting 11s, captains and hits
+    along with the objective, the status and the seconds taken
+    :param held - array<bool>: which of the fixed rows are in the manager's current squad
+    :param budget - float: the value of their squad and their bank
+    :param free_transfers - int: the number of free transfers they have
+    """
+    c = _context
+    start_time = time.perf_counter()
+    model = c["model"]
+    # only the bounds of players who are in one of this squad and the last one change
+    for j in np.flatnonzero(held != c["held"]).tolist():
+        model.vars[c["kept"][j]].ub = float(held[j])
+    c["held"] = held
+    for row in c["budget_rows"].tolist():
+        model.constrs[row].rhs = budget
+    free = model.vars[c["free"]]
+    free.lb = free.ub = free_transfers
+
+    current_rows = c["fixed_rows"][held]
+    hold = np.zeros(c["cols"][0].shape, dtype=bool)
+    hold[:, current_rows] = True
+    transfers = c["transfers"]
+    reason = check_plan(
+        hold, c["groups"], c["value"], budget, current_rows, free_transfers, transfers["wildcard"], transfers["in_team_rows"],
+        c["max_from_team"], transfers["formulation"], transfers["max_hits"],
+    )
+    model.start = mip_start(hold, c["groups"], transfers["pts"], *c["variables"]) if reason is None else []
+
+    limits = Limits(c["max_seconds"])
+    if not limits.optimize(model):
+        return None, np.nan, "NO SOLUTION", time.perf_counter() - start_time
+    x, y, z = read_binary(model, *c["cols"])
+    hits = None
+    if transfers["formulation"] == "flow":
+        hits = transfer_hits(x, current_rows, free_transfers, transfers["wildcard"])[1]
+    return (x, y, z, hits), model.objective_value, limits.outcome(model)["status"], time.perf_counter() - start_time
+
+
+def optimise_managers(
+    num_gws,
+    user_ids=None,
+    league_id=None,
+    squads=None,
+    wildcard=False,
+    free_transfers=1,
+    filepath="cleaned_data.csv",
+    in_team=[],
+    out_team=[],
+    bench_strength=0.1,
+    future_gw_multiplier=1,
+    max_from_team=3,
+    formulation="overlap",
+    hit_cost=4,
+    max_hits=0,
+    prune=True,
+    client=None,
+    max_seconds=None,
+    processes=None,
+    show=True,
+):
+    """
+    optimises the transfers of many managers with one model, solving them in a process pool
+    :param user_ids - list<int>: the managers to optimise. If left blank, every manager in league_id or in squads is
+    :param league_id - int: a classic league whose managers are fetched as well as any in user_ids
+    :param squads - DataFrame: squads that have already been fetched by fpl_api.fetch_squads. If left blank, they are fetched
+    :param free_transfers - int or dict<int, int>: the number of free transfers that every manager has, or a dict of
+        user_id to each manager's, with 1 for any manager not in it
+    :param max_seconds - float: the most time each manager's solve can take
+    :param processes - int: the number of worker processes. If left blank, one is used for every core
+    :param show - bool: denotes whether to print the table
+    All other parameters are as in optimiser.optimise, with each manager's budget the value of their squad and their bank
+
+    returns a dataframe indexed by user_id with the objective, points, hits and transfers of each manager's plan, the
+    status of their solve and the seconds it took, and a dict of user_id to their plan as a PlanResult
+    """
+    if squads is None:
+        squads = fetch_squads(user_ids, league_id, client=client)
+    elif user_ids is not None:
+        squads = squads.loc[[user_id for user_id in user_ids if user_id in squads.index]]
+    assert len(squads), "there are no squads to optimise"
+    assert squads.gw.nunique() == 1, "every squad must be from the same gameweek"
+    next_gw = int(squads.gw.iloc[0]) + 1
+    gws = list(range(next_gw, next_gw + num_gws))
+    picks = squads[[f"pick_{k}" for k in range(1, 16)]].to_numpy(dtype=np.int64)
+    if not isinstance(free_transfers, dict):
+        free_transfers = dict.fromkeys(squads.index, free_transfers)
+    free = np.array([free_transfers.get(user_id, 1) for user_id in squads.index])
+
+    df = read_players(filepath)
+    # the budget of each manager is the value of their squad, which may include players who are pruned
+    values = df.set_index("id").sale_value.reindex(picks.ravel()).to_numpy().reshape(picks.shape)
+    budgets = np.nansum(values, axis=1) + squads.bank.to_numpy()
+    index = PlayerIndex(df)
+    selected = index.select(in_team=in_team, out_team=out_team)
+    keep = ~index.mask(selected["out_team"])
+    if prune:
+        # the players kept have to be enough for the manager who can make the most transfers, and every current squad is kept
+        max_transfers = 15 if wildcard else free.max()
+        if num_gws > 1:
+            max_transfers = num_gws - 1 + free.max()
+        if formulation == "flow":
+            max_transfers = (0 if wildcard else free.max()) + num_gws - 1 + (15 * num_gws if max_hits is None else max_hits)
+        keep &= prune_players(
+            df,
+            [f"{gw}_pts" for gw in gws],
+            "sale_value",
+            slots={"G": 2, "D": 5, "M": 5, "F": 3},
+            transfers=int(max_transfers),
+            max_from_team=max_from_team,
+            keep=index.mask(np.unique(picks)) | index.mask(selected["in_team"]),
+            unavailable=~keep,
+        )
+    df = df[keep].reset_index(drop=True)
+    index = index.subset(df, keep)
+    groups = PlayerGroups(df)
+    sale_value = df.sale_value.to_numpy()
+    in_team_rows = index.rows(selected["in_team"])
+    pts = df[[f"{gw}_pts" for gw in gws]].to_numpy()
+    fixed_rows = np.flatnonzero(index.mask(np.unique(picks)))
+    # which of the fixed rows are in each manager's squad
+    positions = pd.Index(df.id.to_numpy()[fixed_rows]).get_indexer(picks.ravel()).reshape(picks.shape)
+    held = np.zeros((len(squads), len(fixed_rows)), dtype=bool)
+    held[np.nonzero(positions >= 0)[0], positions[positions >= 0]] = True
+
+    template, cols, budget_rows, kept, free_col = build_template(
+        groups, sale_value, pts, fixed_rows, max_from_team, bench_strength, future_gw_multiplier, in_team_rows, wildcard, formulation, hit_cost, max_hits
+    )
+    context = {
+        "template": template,
+        "cols": cols,
+        "budget_rows": budget_rows,
+        "kept": kept,
+        "free": free_col,
+        "fixed_rows": fixed_rows,
+        "groups": groups,
+        "value": sale_value,
+        "max_from_team": max_from_team,
+        "max_seconds": max_seconds,
+        "transfers": {"pts": pts, "in_team_rows": in_team_rows, "wildcard": wildcard, "formulation": formulation, "max_hits": max_hits},
+    }
+    processes = processes or os.cpu_count()
+    # send the managers in chunks, so that each worker gets several at a time and the pool adds little to each solve
+    chunksize = max(len(squads) // (4 * processes), 1)
+    with ProcessPoolExecutor(processes, initializer=_load, initargs=(context,)) as pool:
+        solved = list(pool.map(solve_manager, held, budgets.tolist(), free.tolist(), chunksize=chunksize))
+
+    rows, plans = [], {}
+    for user_id, squad, (plan, objective, status, seconds) in zip(squads.index, held, solved):
+        row = {"objective": objective, "points": np.nan, "hits": np.nan, "transfers": np.nan, "status": status, "seconds": seconds}
+        if plan is not None:
+            x, y, z, hits = plan
+            current_rows = fixed_rows[squad]
+            result = plan_result(df, next_gw, x, y, z, objective, "sale_value", current_rows, hits, hit_cost)
+            row.update(points=result.points, hits=result.hits, transfers=sum(len(gw.transfers_in) for gw in result.gameweeks.values()))
+            plans[user_id] = result
+        rows.append(row)
+    table = pd.DataFrame(rows, index=squads.index)
+    if show:
+        print(table.to_string(float_format="%.2f"))
+    return table, plans
+
+
+if __name__ == "__main__":
+    optimise_managers(
+        5,
+        league_id=314,
+        future_gw_multiplier=0.9,
+        max_seconds=30,
+    )
@@ -0,0 +1,224 @@
+"""
+Finding the best gameweeks to play the wildcard, free hit and bench boost in.
+
+Every schedule of the chips over the candidate gameweeks, with at most one chip a gameweek, is a variant of the same
+flow formulation model: the squads, lineups and objective are built once as a sparse_model template, which is sent
+to each worker process of a pool once, and each worker copies it and adds the transfer rules and bench boost for the
+schedules it solves. The plan with no chips is solved first, and every other schedule is warm started from it, since it
+is always a feasible plan for them as long as max_hits allows its hits.
+
+    table, best = plan_chips(352, 8, chips=["free_hit", "bench_boost"], max_seconds=60)
+
+returns a table of every schedule ranked by its objective, with how much more it scores than playing no chips, and the
+plan of the best one as a PlanResult. optimiser.optimise(..., chips={"free_hit": 12}) solves any single schedule again.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from limits import Limits
+from model_builder import CHIPS, PlayerGroups, PlayerIndex
+from optimiser import fetch_squad
+from player_data import read_players
+from pruning import prune_players
+from results import plan_result, read_binary
+from sparse_model import add_plan_transfers, build_squads
+from warm_start import mip_start, transfer_hits
+
+# the template and everything else a schedule is solved with, loaded once in each worker process
+_context = None
+
+
+def _load(context):
+    """worker initialiser - keeps the model template and silences the solver's output"""
+    global _context
+    _context = context
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+
+
+def chip_schedules(gws, chips=CHIPS, weeks={}):
+    """
+    returns every way of playing each chip in one of its candidate gameweeks or not at all, with at most one chip a gameweek,
+    as a list of dicts of chip to gameweek, starting with playing no chips
+    :param gws - list<int>: the gameweeks of the plan
+    :param chips - list<str>: the chips that can be played
+    :param weeks - dict<str, list<int>>: the candidate gameweeks of any chip that can't be played in every gameweek
+    """
+    assert set(chips) <= set(CHIPS), f"the chips are {', '.join(CHIPS)}"
+    options = [[None] + list(weeks.get(chip, gws)) for chip in chips]
+    schedules = []
+    for played in product(*options):
+        schedule = {chip: gw for chip, gw in zip(chips, played) if gw is not None}
+        if len(set(schedule.values())) == len(schedule):
+            schedules.append(schedule)
+    return schedules
+
+
+def solve_schedule(schedule, start=None):
+    """
+    solves one schedule in a worker, returning its row of the table and its squads, starting 11s and captains
+    :param schedule - dict<str, int>: the gameweek, counted from 0, that each chip is played in
+    :param start - array<bool>: the squads of a plan to warm start from, with shape (num_gws, num_players)
+    """
+    c = _context
+    start_time = time.perf_counter()
+    sm = c["template"].copy()
+    add_plan_transfers(sm, c["cols"], formulation="flow", chips=schedule, **c["transfers"])
+    model = sm.to_mip()
+    model.verbose = 0
+    variables = [[[model.vars[j] for j in row] for row in col.tolist()] for col in c["cols"]]
+    if start is not None:
+        model.start = mip_start(start, c["groups"], c["pts"], *variables)
+
+    limits = Limits(c["max_seconds"])
+    if not limits.optimize(model):
+        return {"objective": np.nan, "points": np.nan, "hits": np.nan, "status": "NO SOLUTION"}, None
+    x, y, z = read_binary(model, *c["cols"])
+    transfers = c["transfers"]
+    hits = transfer_hits(x, transfers["current_rows"], transfers["free_transfers"], chips=schedule)[1]
+    points = (y * c["pts"].T).sum() + (z * c["pts"].T).sum()
+    if "bench_boost" in schedule:
+        a = schedule["bench_boost"]
+        points += (x[a] & ~y[a]) @ c["pts"][:, a]
+    row = {
+        "objective": model.objective_value,
+        "points": points,
+        "hits": int(hits.sum()),
+        "status": limits.outcome(model)["status"],
+        "seconds": time.perf_counter() - start_time,
+    }
+    return row, (x, y, z, hits)
+
+
+def plan_chips(
+    user_id,
+    num_gws,
+    chips=CHIPS,
+    weeks={},
+    free_transfers=1,
+    filepath="cleaned_data.csv",
+    budget=None,
+    in_team=[],
+    out_team=[],
+    bench_strength=0.1,
+    future_gw_multiplier=1,
+    max_from_team=3,
+    hit_cost=4,
+    max_hits=0,
+    prune=True,
+    client=None,
+    squads=None,
+    max_seconds=None,
+    processes=None,
+    show=True,
+):
+    """
+    solves every schedule of the chips in a process pool, and returns them ranked along with the best plan
+    :param chips - list<str>: the chips that can be played, any of "wildcard", "free_hit" and "bench_boost"
+    :param weeks - dict<str, list<int>>: the candidate gameweeks of any chip that can't be played in every gameweek of the plan,
+        e.g. {"bench_boost": [19, 20]}
+    :param max_seconds - float: the most time each schedule's solve can take
+    :param processes - int: the number of worker processes. If left blank, one is used for every core
+    :param show - bool: denotes whether to print the table and the best plan
+    All other parameters are as in optimiser.optimise, with the flow formulation
+
+    returns a dataframe with a row for each schedule, holding the gameweek each chip is played in, the objective and how much
+    more it is than with no chips, and the points and hits, sorted best first, and the best schedule's plan as a PlanResult
+    """
+    next_gw, current_team_IDs, in_the_bank = fetch_squad(user_id, client, squads)
+    gws = list(range(next_gw, next_gw + num_gws))
+    schedules = chip_schedules(gws, chips, weeks)
+
+    df = read_players(filepath)
+    if not budget:
+        budget = df[df.id.isin(current_team_IDs)].sale_value.sum() + in_the_bank
+    index = PlayerIndex(df)
+    selected = index.select(in_team=in_team, out_team=out_team)
+    keep = ~index.mask(selected["out_team"])
+    if prune:
+        # the players kept have to be enough for every schedule, so the whole squad can change at each wildcard and free hit
+        max_transfers = free_transfers + num_gws - 1 + (15 * num_gws if max_hits is None else max_hits)
+        max_transfers += 15 * ("wildcard" in chips) + 30 * ("free_hit" in chips)
+        keep &= prune_players(
+            df,
+            [f"{gw}_pts" for gw in gws],
+            "sale_value",
+            slots={"G": 2, "D": 5, "M": 5, "F": 3},
+            transfers=max_transfers,
+            max_from_team=max_from_team,
+            keep=index.mask(current_team_IDs) | index.mask(selected["in_team"]),
+            unavailable=~keep,
+        )
+    df = df[keep].reset_index(drop=True)
+    index = index.subset(df, keep)
+    groups = PlayerGroups(df)
+    sale_value = df.sale_value.to_numpy()
+    current_rows = np.flatnonzero(index.mask(current_team_IDs))
+    in_team_rows = index.rows(selected["in_team"])
+    pts = df[[f"{gw}_pts" for gw in gws]].to_numpy()
+
+    template, *cols = build_squads(groups, sale_value, pts, budget, max_from_team, bench_strength, future_gw_multiplier, in_team_rows, "flow")
+    context = {
+        "template": template,
+        "cols": cols,
+        "groups": groups,
+        "pts": pts,
+        "max_seconds": max_seconds,
+        "transfers": {
+            "groups": groups,
+            "value": sale_value,
+            "pts": pts,
+            "bench_strength": bench_strength,
+            "future_gw_multiplier": future_gw_multiplier,
+            "in_team_rows": in_team_rows,
+            "current_rows": current_rows,
+            "free_transfers": free_transfers,
+            "hit_cost": hit_cost,
+            "max_hits": max_hits,
+        },
+    }
+
+    # the model counts gameweeks from 0
+    variants = [{chip: gw - next_gw for chip, gw in schedule.items()} for schedule in schedules]
+    with ProcessPoolExecutor(processes or os.cpu_count(), initializer=_load, initargs=(context,)) as pool:
+        first = pool.submit(solve_schedule, variants[0]).result()
+        start = None if first[1] is None else first[1][0]
+        solved = [first] + list(pool.map(solve_schedule, variants[1:], [start] * (len(variants) - 1)))
+
+    table = pd.DataFrame([{chip: schedule.get(chip) for chip in chips} | row for schedule, (row, _) in zip(schedules, solved)])
+    for chip in chips:
+        table[chip] = table[chip].astype("Int64")
+    table.insert(len(chips) + 1, "gain", table.objective - table.objective[0])
+    order = np.argsort(-table.objective.fillna(-np.inf).to_numpy(), kind="stable")
+    table = table.iloc[order].reset_index(drop=True)
+
+    best = None
+    row, plan = solved[order[0]]
+    if plan is not None:
+        x, y, z, hits = plan
+        best = plan_result(df, next_gw, x, y, z, row["objective"], "sale_value", current_rows, hits, hit_cost, variants[order[0]])
+    if show:
+        print(table.to_string(index=False, float_format="%.2f"))
+        print("\n")
+        if best is not None:
+            played = ", ".join(f"{chip} in GW {gw}" for chip, gw in schedules[order[0]].items()) or "no chips"
+            print(f"BEST PLAN: {played}\n")
+            best.show()
+    return table, best
+
+
+if __name__ == "__main__":
+    plan_chips(
+        352,
+        5,
+        chips=["free_hit", "bench_boost"],
+        future_gw_multiplier=0.9,
+        max_seconds=120,
+    )
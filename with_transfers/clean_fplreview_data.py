@@ -1,6 +1,10 @@
 import pandas as pd
+import os
 import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from player_data import save_players
+
 [in_file, start_gw, end_gw] = sys.argv[1:]
 
 df = pd.read_csv(in_file)
@@ -11,4 +15,8 @@ df.dropna(inplace=True)
 cols = [f"{i}_pts" for i in range(int(start_gw), int(end_gw) + 1)]
 df = df.loc[:, ["id", "team", "pos", "name", "buy_cost", "sale_value"] + cols]
 
-df.to_csv("cleaned_data.csv", float_format="%.3f", index=False)
\ No newline at end of file
+df[cols] = df[cols].round(3)
+df.to_csv("cleaned_data.csv", float_format="%.3f", index=False)
+
+# also save a typed copy that the optimisers can load without parsing the csv
+save_players(df, "cleaned_data.npz")
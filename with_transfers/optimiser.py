@@ -1,173 +1,118 @@
-from mip import BINARY, Model, maximize, xsum
-import pandas as pd
-import unicodedata
-import json
-from urllib.request import urlopen
-
-
-def optimise(
-    user_id,
-    num_gws,
-    wildcard=False,
+from mip import BINARY, CONTINUOUS, Model, maximize, xsum
+import numpy as np
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from fpl_api import FPLClient
+from limits import Limits, mark
+from model_builder import (
+    PlayerGroups,
+    PlayerIndex,
+    add_symmetry_breaking,
+    add_team_constraints,
+    add_transfer_flow,
+    identical_pairs,
+    linear_sum,
+)
+from player_data import read_players
+import profiling
+from pruning import prune_players
+from result_cache import cached
+from results import columns, plan_result, read_binary
+import scenarios as sc
+from sparse_model import build_squad_plan
+from warm_start import check_plan, load_plan, mip_start, plan_lineups, save_plan, shift_plan, transfer_hits
+
+
+def build_model(
+    groups,
+    value,
+    pts,
+    budget,
+    current_rows,
     free_transfers=1,
-    filepath="cleaned_data.csv",
-    budget=None,
-    in_team=[],
-    out_team=[],
+    wildcard=False,
+    in_team_rows=[],
     bench_strength=0.1,
     future_gw_multiplier=1,
     max_from_team=3,
+    assembly="expr",
+    formulation="overlap",
+    hit_cost=4,
+    max_hits=0,
+    chips={},
+    integer_lineups=False,
 ):
     """
-    :param user_id int: the user id of the team you want to optimise
-    :param num_gws - int: the number of gameweeks that you want to optimise for
-    :param wildcard - bool: denotes whether or not you are playing a wildcard
-    :param free_transfers - int: the number of free transfers that you currently have
-    :param filepath - str: the filepath that points to the csv that contains the data you want to optimise
-    :param budget - int or float: the maximum sum of costs allowed in the optimised 15 man squad. If left blank, will default to your team's actual budget
-    :param in_team - list<int or str>: list of players that must be included in the optimised 15 man squad for every gameweek
-    :param out_team - list<int or str>: list of players that must never be included in the optimised 15 man squad
-    :param bench_strength - float: a number between 0 and 1 inclusive that denotes how much to take the bench into account when optimising the squad
-    :param future_gw_multiplier - float: a number between 0 and 1 inclusive that denotes how much importance to give to future gameweeks
-        i.e. gw1 has multiplier x**0 = 1, gw2 has multiplier x**1 = x, gw3 has multiplier x**2, etc. Lower number = more emphasis on closer gws
-    :param max_from_team - int: maximum number of players allowed from a single team
+    builds the multi-gameweek model and returns it along with its x, y and z variables, indexed [gw][player]
+    :param groups - PlayerGroups: the indexed player pool
+    :param value - array<float>: the sale value of each player
+    :param pts - array<float>: the points of each player, one column per gameweek
+    :param current_rows - array<int>: rows of the players in the current squad
+    :param in_team_rows - list<int>: rows of players that must be in the squad for every gameweek
+    :param assembly - str: "expr" adds every constraint to the model as a mip expression,
+        "sparse" assembles the model as numpy arrays and loads it into the solver in bulk from an MPS file
+    :param formulation - str: "overlap" counts the players kept between consecutive gameweeks, allowing at most 2 transfers
+        each week and n + free_transfers after n weeks. "flow" has a variable for each transfer in and out and for the free
+        transfers rolled over to each week, and charges hit_cost for each transfer beyond them. Only its squads are integer
+        variables, since the starting 11, captain and transfers always are once the squads are, and interchangeable players are ordered
+    :param hit_cost - float: the points that each hit costs with the flow formulation
+    :param max_hits - int: the most hits that can be taken over the horizon with the flow formulation. If None, there is no limit
+    :param chips - dict<str, int>: the gameweek, counted from 0, that each chip is played in, which needs the sparse assembly
+        and the flow formulation. See sparse_model.add_chips()
+    :param integer_lineups - bool: denotes whether the starting 11 and captain are binary with the flow formulation too,
+        which they have to be when other constraints are added over them, such as a CVaR objective's
     """
-
-    def remove_accents(input_str):
-        """a function that removes all diacritics from latin characters"""
-        nfkd_form = unicodedata.normalize("NFKD", input_str)
-        return "".join([c for c in nfkd_form if not unicodedata.combining(c)])
-
-    def print_dfs():
-        """prints out the optimised squads and transfers in an easy to read format"""
-        current = df.iloc[[x - 1 for x in current_team_IDs]].copy()
-        current = current.reset_index(drop=True)
-
-        t_in = df.iloc[
-            [i for i in I if x[0][i].x == 1 and i + 1 not in current_team_IDs]
-        ]
-        t_out = df.iloc[[i for i in I if x[0][i].x == 0 and i + 1 in current_team_IDs]]
-        print("CURRENT SQUAD")
-        print(
-            current.loc[
-                :,
-                ["id", "team", "pos", "name", "sale_value"]
-                + [f"{next_gw+x}_pts" for x in range(num_gws)],
-            ]
-        )
-        print("\n")
-        if len(t_out) > 0:
-            [print(f"OUT: {t_out.name.iloc[j]}") for j in range(len(t_out))]
-            [print(f"IN: {t_in.name.iloc[j]}") for j in range(len(t_in))]
-            print("\n")
-
-        total_starting_pts, total_bench_pts = 0, 0
-        for gw in range(num_gws):
-            i_start = [i for i in I if y[gw][i].x == 1]
-            starting = df.iloc[i_start].copy()
-            starting.pos = pd.Categorical(starting.pos, categories=["G", "D", "M", "F"])
-            starting = starting.sort_values(
-                by=["pos", f"{next_gw + gw}_pts"], ascending=[True, False]
-            )
-
-            i_bench = [i for i in I if x[gw][i].x == 1 and y[gw][i].x == 0]
-            bench = df.iloc[i_bench].copy()
-            sorted_bench = pd.concat(
-                [
-                    bench.loc[bench.pos == "G"],
-                    bench.loc[bench.pos != "G"].sort_values(
-                        by=f"{next_gw + gw}_pts", ascending=False
-                    ),
-                ]
-            )
-
-            captain_i = [i for i in I if z[gw][i].x == 1][0]
-            starting.loc[captain_i, "name"] += " (c)"
-            starting.loc[captain_i, f"{next_gw + gw}_pts"] *= 2
-
-            result = pd.concat([starting, sorted_bench])
-            result = result.reset_index(drop=True)
-            result.index += 1
-
-            total_starting_pts += starting[f"{next_gw + gw}_pts"].sum()
-            total_bench_pts += bench[f"{next_gw + gw}_pts"].sum()
-
-            # prints out full points dataframe for each gameweek - could easily be changed later
-            print(f"GW {gw + next_gw}")
-            print(
-                result.loc[
-                    :,
-                    ["id", "team", "pos", "name", "sale_value"]
-                    + [f"{next_gw+x}_pts" for x in range(num_gws)],
-                ]
-            )
-            print(f"\nCost: £{result.sale_value.sum():.1f}m")
-            print(
-                f"Points: {starting[f'{next_gw + gw}_pts'].sum():.2f} (+{bench[f'{next_gw + gw}_pts'].sum():.2f} on the bench)\n\n"
-            )
-
-            if gw != num_gws - 1:
-                t_in = df.iloc[
-                    [i for i in I if x[gw + 1][i].x == 1 and x[gw][i].x == 0]
-                ]
-                t_out = df.iloc[
-                    [i for i in I if x[gw][i].x == 1 and x[gw + 1][i].x == 0]
-                ]
-                if len(t_out) > 0:
-                    [print(f"OUT: {t_out.name.iloc[j]}") for j in range(len(t_out))]
-                    [print(f"IN: {t_in.name.iloc[j]}") for j in range(len(t_in))]
-                    print("\n")
-
-        print(
-            f"Total points from GW {next_gw}-{next_gw+num_gws-1}: {total_starting_pts:.2f} (+{total_bench_pts:.2f} on the bench)\n\n"
+    I = range(groups.n)
+    num_gws = pts.shape[1]
+    assert formulation in ["overlap", "flow"], "formulation must be either overlap or flow"
+    assert not chips or assembly == "sparse", "chips can only be played with the sparse assembly"
+
+    if assembly == "sparse":
+        sm, *cols = build_squad_plan(
+            groups,
+            value,
+            pts,
+            budget,
+            max_from_team=max_from_team,
+            bench_strength=bench_strength,
+            future_gw_multiplier=future_gw_multiplier,
+            in_team_rows=in_team_rows,
+            current_rows=current_rows,
+            free_transfers=free_transfers,
+            wildcard=wildcard,
+            formulation=formulation,
+            hit_cost=hit_cost,
+            max_hits=max_hits,
+            chips=chips,
+            integer_lineups=integer_lineups,
         )
+        model = sm.to_mip()
+        x, y, z = [[[model.vars[j] for j in row] for row in c.tolist()] for c in cols]
+        return model, x, y, z
 
-    static = "https://fantasy.premierleague.com/api/bootstrap-static/"
-    events = json.loads(urlopen(static).read().decode("utf-8"))["events"]
-    next_gw = next(x["id"] for x in events if x["is_next"])
-
-    history_url = f"https://fantasy.premierleague.com/api/entry/{user_id}/history/"
-    history_data = json.loads(urlopen(history_url).read().decode("utf-8"))
-
-    current_team_url = f"https://fantasy.premierleague.com/api/entry/{user_id}/event/{next_gw-1}/picks/"
-    current_team_data = json.loads(urlopen(current_team_url).read().decode("utf-8"))
-    current_team_IDs = [x["element"] for x in current_team_data["picks"]]
-
-    # # you can use this to alter your current squad if you have already made transfers in the current gameweek.
-    # # don't forget to alter `free_transfers` to take this in to consideration
-    # transfers_out=[4, 338]
-    # transfers_in=[272, 469]
-    # replacements = dict(zip(transfers_out, transfers_in))
-    # current_team_IDs[:] = [replacements.get(x, x) for x in current_team_IDs]
-    
-    in_the_bank = current_team_data["entry_history"]["bank"] / 10
-
-    df = pd.read_csv(filepath)
-    I = range(len(df))
-    df = df.reset_index(drop=True)
     model = Model()
 
-    if not budget:
-        current_team = df[df.id.isin(current_team_IDs)]
-        budget = current_team.sale_value.sum() + in_the_bank
-
     x = []  # players in 15-man squad
     y = []  # players in starting 11
     z = []  # player chosen as captain
     both = []  # players in both 15 man squads between 2 gameweeks
+    num_transfers = []  # number of transfers made between 2 gameweeks
 
-    # remove all players in out_team from dataframe
-    for player in out_team:
-        if isinstance(player, str):
-            player = remove_accents(player.lower())
-            df = df[df.name.apply(lambda x: remove_accents(x.lower())) != player]
-        elif isinstance(player, int):
-            df = df[df.id != player]
+    rules = {
+        "DEF": [3, 5],
+        "MID": [2, 5],
+        "FWD": [1, 3],
+    }
 
+    # the best starting 11 and captain of a squad is a flow problem, so once the squads are integer they are too
+    lineup_type = CONTINUOUS if formulation == "flow" and not integer_lineups else BINARY
     for a in range(num_gws):
+        profiling.family(model, "squad")
         x.append([model.add_var(var_type=BINARY) for i in I])
-        y.append([model.add_var(var_type=BINARY) for i in I])
-        z.append([model.add_var(var_type=BINARY) for i in I])
+        y.append([model.add_var(var_type=lineup_type, ub=1) for i in I])
+        z.append([model.add_var(var_type=lineup_type, ub=1) for i in I])
 
         # ensure captain is a subset of the starting xi, which is itself a subset of the 15 man squad
         for i in I:
@@ -175,105 +120,438 @@ def optimise(
             model += y[a][i] <= x[a][i]
 
         # add budget constraint
-        model += xsum(df.sale_value[i] * x[a][i] for i in I) <= budget
+        profiling.family(model, "budget")
+        model += linear_sum(x[a], coeffs=value) <= budget
 
         # add positional and teamsize constraints
-        model += xsum(x[a][i] for i in I if df.pos[i] == "G") == 2
-        model += xsum(y[a][i] for i in I if df.pos[i] == "G") == 1
-
-        rules = {
-            "DEF": [3, 5],
-            "MID": [2, 5],
-            "FWD": [1, 3],
-        }
+        profiling.family(model, "position")
+        model += linear_sum(x[a], groups.pos_rows["G"]) == 2
+        model += linear_sum(y[a], groups.pos_rows["G"]) == 1
+
         for pos in ["DEF", "MID", "FWD"]:
-            model += xsum(x[a][i] for i in I if df.pos[i] == pos[0]) == rules[pos][1]
-            model += (
-                rules[pos][0]
-                <= xsum(y[a][i] for i in I if df.pos[i] == pos[0])
-                <= rules[pos][1]
-            )
+            rows = groups.pos_rows[pos[0]]
+            model += linear_sum(x[a], rows) == rules[pos][1]
+            model += linear_sum(y[a], rows) >= rules[pos][0]
+            model += linear_sum(y[a], rows) <= rules[pos][1]
 
         # 15 in entire squad, 11 in starting squad, 1 captain
-        model += xsum(x[a][i] for i in I) == 15
-        model += xsum(y[a][i] for i in I) == 11
-        model += xsum(z[a][i] for i in I) == 1
+        profiling.family(model, "squad")
+        model += linear_sum(x[a]) == 15
+        model += linear_sum(y[a]) == 11
+        model += linear_sum(z[a]) == 1
 
         # add max_from_team constraint
-        for team in df.team.unique():
-            model += xsum(x[a][i] for i in I if df.team[i] == team) <= max_from_team
+        profiling.family(model, "team")
+        add_team_constraints(model, x[a], groups, max_from_team)
 
     # add in_team constraints
-    for player in in_team:
-        if isinstance(player, str):
-            player = remove_accents(player.lower())
-            ind = df.index[df.name.apply(lambda x: remove_accents(x.lower())) == player]
-            if len(ind) != 1:
-                print(
-                    f"There is more than one player with the name {player}. Specify which one you mean by using their ID instead."
-                )
-                return
-        elif isinstance(player, int):
-            ind = df.index[df.id == player]
-
+    profiling.family(model, "locks")
+    for i in in_team_rows:
         for gw in range(num_gws):
-            model += x[gw][ind[0]] == 1
-
-    # ensure current squad is at most `free_transfers` players different from the first optimised squad
-    if not wildcard:
-        model += xsum(
-            x[0][i] * [1 if i + 1 in current_team_IDs else 0 for i in I][i] for i in I
-        ) >= (15 - free_transfers)
-
-    # add constraint that says that a maximum of 2 transfers can be made between gameweeks
-    # TODO: remove this constraint and take it into account in the objective function instead
-    for a in range(num_gws - 1):
+            model += x[gw][i] == 1
+
+    profiling.family(model, "transfers")
+    hits = {}
+    if formulation == "flow":
+        hits = add_transfer_flow(model, x, current_rows, free_transfers, wildcard, max_hits)
+        profiling.family(model, "symmetry")
+        add_symmetry_breaking(model, identical_pairs(groups, value, pts, np.append(current_rows, in_team_rows)), x, y, z)
+    elif not wildcard:
+        # ensure current squad is at most `free_transfers` players different from the first optimised squad
+        model += linear_sum(x[0], current_rows) >= (15 - free_transfers)
+
+    # add constraint that says that a maximum of 2 transfers can be made between gameweeks.
+    # The flow formulation charges for every transfer beyond the free ones instead
+    for a in range(num_gws - 1 if formulation == "overlap" else 0):
         both.append([model.add_var(var_type=BINARY) for i in I])
-        model += xsum(both[a][i] for i in I) >= 13
+        model += linear_sum(both[a]) >= 13
         for i in I:
             model += x[a][i] >= both[a][i]
             model += x[a + 1][i] >= both[a][i]
 
+        # keep a running count of transfers so the cumulative constraint below doesn't grow with the horizon
+        num_transfers.append(model.add_var())
+        model += num_transfers[a] == 15 - linear_sum(both[a])
+
         # maximum of n+`free_transfers` transfers n gameweeks in the future
         model += (
-            xsum(15 - xsum(both[k][i] for i in I) for k in range(a + 1))
+            xsum(num_transfers[k] for k in range(a + 1))
             + 15
-            - xsum(
-                x[0][i] * [1 if i + 1 in current_team_IDs else 0 for i in I][i]
-                for i in I
-            )
+            - linear_sum(x[0], current_rows)
             <= a + free_transfers + 1
         )
 
     # add the objective function
-    model.objective = maximize(
-        xsum(
-            [
-                future_gw_multiplier ** j
-                * (
-                    (1 - bench_strength)
-                    * (
-                        xsum(df[f"{next_gw + j}_pts"][i] * y[j][i] for i in I)
-                        + xsum(df[f"{next_gw + j}_pts"][i] * z[j][i] for i in I)
-                    )
-                    + bench_strength
-                    * (
-                        xsum(df[f"{next_gw + j}_pts"][i] * x[j][i] for i in I)
-                        - xsum(df[f"{next_gw + j}_pts"][i] * y[j][i] for i in I)
-                    )
-                )
-                for j in range(num_gws)
-            ]
+    objective = []
+    for j in range(num_gws):
+        weight = future_gw_multiplier ** j
+        objective.append(
+            linear_sum(y[j], coeffs=weight * (1 - 2 * bench_strength) * pts[:, j])
+            + linear_sum(z[j], coeffs=weight * (1 - bench_strength) * pts[:, j])
+            + linear_sum(x[j], coeffs=weight * bench_strength * pts[:, j])
         )
+        if j in hits:
+            # a hit costs as much as hit_cost points scored by a starter
+            objective.append(-weight * hit_cost * (1 - bench_strength) * hits[j])
+    model.objective = maximize(xsum(objective))
+    profiling.family(model, None)
+
+    return model, x, y, z
+
+
+def fetch_squad(user_id, client=None, squads=None):
+    """
+    returns the next gameweek, and the ids of the players in a user's squad and the money in their bank before it
+    :param client, squads: as in optimise
+    """
+    if squads is not None and user_id in squads.index:
+        squad = squads.loc[user_id]
+        return int(squad.gw) + 1, squad[[f"pick_{k}" for k in range(1, 16)]].astype(int).tolist(), float(squad.bank)
+    client = client or FPLClient()
+    next_gw = client.next_gw()
+    current_team_data = client.picks(user_id, next_gw - 1)
+    return next_gw, [x["element"] for x in current_team_data["picks"]], current_team_data["entry_history"]["bank"] / 10
+
+
+@profiling.instrumented("with_transfers")
+def optimise(
+    user_id,
+    num_gws,
+    wildcard=False,
+    free_transfers=1,
+    filepath="cleaned_data.csv",
+    budget=None,
+    in_team=[],
+    out_team=[],
+    bench_strength=0.1,
+    future_gw_multiplier=1,
+    max_from_team=3,
+    assembly="expr",
+    formulation="overlap",
+    hit_cost=4,
+    max_hits=0,
+    chips={},
+    plan_file=None,
+    prune=True,
+    client=None,
+    squads=None,
+    max_seconds=None,
+    max_gap=None,
+    max_nodes=None,
+    on_incumbent=None,
+    scenarios=None,
+    cvar_alpha=None,
+    risk_weight=0.5,
+    seed=0,
+    show=True,
+    cache=True,
+):
+    """
+    :param user_id int: the user id of the team you want to optimise
+    :param num_gws - int: the number of gameweeks that you want to optimise for
+    :param wildcard - bool: denotes whether or not you are playing a wildcard
+    :param free_transfers - int: the number of free transfers that you currently have
+    :param filepath - str or DataFrame: the filepath that points to the csv that contains the data you want to optimise,
+        or a dataframe that has already been read from it. If the .npz file written alongside the csv is up to date, it is used instead
+    :param budget - int or float: the maximum sum of costs allowed in the optimised 15 man squad. If left blank, will default to your team's actual budget
+    :param in_team - list<int or str>: list of players that must be included in the optimised 15 man squad for every gameweek
+    :param out_team - list<int or str>: list of players that must never be included in the optimised 15 man squad
+    :param bench_strength - float: a number between 0 and 1 inclusive that denotes how much to take the bench into account when optimising the squad
+    :param future_gw_multiplier - float: a number between 0 and 1 inclusive that denotes how much importance to give to future gameweeks
+        i.e. gw1 has multiplier x**0 = 1, gw2 has multiplier x**1 = x, gw3 has multiplier x**2, etc. Lower number = more emphasis on closer gws
+    :param max_from_team - int: maximum number of players allowed from a single team
+    :param assembly - str: "expr" to build the model one expression at a time, or "sparse" to assemble it
+        with numpy and load it into the solver in bulk, which is quicker and uses less memory on long horizons
+    :param formulation - str: "overlap" to allow at most 2 transfers each week and n + free_transfers after n weeks,
+        or "flow" to roll free transfers over from week to week, up to 2, and allow hits. See build_model()
+    :param hit_cost - float: the points that each transfer beyond the free ones costs with the flow formulation
+    :param max_hits - int: the most hits that can be taken over the horizon with the flow formulation. If None, there is no limit,
+        but fewer players can be pruned
+    :param chips - dict<str, int>: the gameweek that each of "wildcard", "free_hit" and "bench_boost" is played in, e.g.
+        {"free_hit": 12}, which needs the sparse assembly and the flow formulation. Transfers before a wildcard or free hit are free
+        and leave 1 free transfer for the week after, and the squad after a free hit is compared with the one before it.
+        chips.py finds the best gameweeks to play them in
+    :param plan_file - str: a json file that the optimised plan is saved to. If the file already exists, the plan in it is shifted
+        onto this run's gameweeks and used as a starting solution, falling back to keeping the current squad if it is no longer feasible
+    :param prune - bool: denotes whether to remove players who can never be in an optimised squad before building the model
+    :param client - FPLClient: the client used to fetch your squad from the FPL API. If left blank, a client with the default
+        on-disk cache is used. Pass FPLClient(fixture_dir=...) to use recorded responses instead of the network
+    :param squads - DataFrame: squads that have already been fetched by fpl_api.fetch_squads. If user_id is in it,
+        the current squad and bank are taken from it instead of the FPL API
+    :param max_seconds - float: the most time the solve can take, after which the best plan found so far is returned.
+        The solve starts from keeping the current squad, so there is always a plan to return. A plan that hasn't been
+        proved optimal is marked as such in its solve attribute, see limits.py
+    :param max_gap - float: stop once the best plan is within this fraction of the bound on the best objective
+    :param max_nodes - int: the most branch and bound nodes to search
+    :param on_incumbent - function: called as on_incumbent(objective, bound, plan) with each better plan found,
+        where plan is a dict of gameweek to the ids of that gameweek's squad
+    :param scenarios - int: if given, this many points scenarios are drawn for every player and gameweek, see scenarios.py,
+        and the plan maximises their average instead of the projected points
+    :param cvar_alpha - float: if given with scenarios, the objective is (1 - risk_weight) times the average plus risk_weight
+        times the average of the worst cvar_alpha of the scenarios, so that plans which can score very few points are avoided
+    :param risk_weight - float: a number between 0 and 1 inclusive that denotes how much of the objective is the CVaR
+    :param seed - int: the seed that the scenarios are drawn with
+    :param show - bool: denotes whether to print the plan. Pass False to only return it
+    :param cache - bool: denotes whether to return the result of an earlier call with the same data, squad, bank and arguments
+        if there is one, and to keep this call's result for later calls. Pass False to always solve the model.
+        Calls with a plan_file are never cached, since they have to save their plan
+
+    returns the optimised plan as a PlanResult, holding the squad, starting 11, captain and transfers for each gameweek.
+    Its squads are a dict of gameweek to that gameweek's squad as a dataframe, with the starting 11 first. See results.py
+    """
+
+    profiling.phase("fetch")
+    next_gw, current_team_IDs, in_the_bank = fetch_squad(user_id, client, squads)
+
+    # # you can use this to alter your current squad if you have already made transfers in the current gameweek.
+    # # don't forget to alter `free_transfers` to take this in to consideration
+    # transfers_out=[4, 338]
+    # transfers_in=[272, 469]
+    # replacements = dict(zip(transfers_out, transfers_in))
+    # current_team_IDs[:] = [replacements.get(x, x) for x in current_team_IDs]
+
+    return plan_transfers(
+        next_gw,
+        current_team_IDs,
+        in_the_bank,
+        num_gws,
+        wildcard=wildcard,
+        free_transfers=free_transfers,
+        filepath=filepath,
+        budget=budget,
+        in_team=in_team,
+        out_team=out_team,
+        bench_strength=bench_strength,
+        future_gw_multiplier=future_gw_multiplier,
+        max_from_team=max_from_team,
+        assembly=assembly,
+        formulation=formulation,
+        hit_cost=hit_cost,
+        max_hits=max_hits,
+        chips=chips,
+        plan_file=plan_file,
+        prune=prune,
+        max_seconds=max_seconds,
+        max_gap=max_gap,
+        max_nodes=max_nodes,
+        on_incumbent=on_incumbent,
+        scenarios=scenarios,
+        cvar_alpha=cvar_alpha,
+        risk_weight=risk_weight,
+        seed=seed,
+        show=show,
+        cache=cache and plan_file is None,
     )
 
-    # find an optimal solution and print it
-    model.optimize()
-    print_dfs()
 
+@cached("with_transfers")
+def plan_transfers(
+    next_gw,
+    current_team_IDs,
+    in_the_bank,
+    num_gws,
+    wildcard=False,
+    free_transfers=1,
+    filepath="cleaned_data.csv",
+    budget=None,
+    in_team=[],
+    out_team=[],
+    bench_strength=0.1,
+    future_gw_multiplier=1,
+    max_from_team=3,
+    assembly="expr",
+    formulation="overlap",
+    hit_cost=4,
+    max_hits=0,
+    chips={},
+    plan_file=None,
+    prune=True,
+    max_seconds=None,
+    max_gap=None,
+    max_nodes=None,
+    on_incumbent=None,
+    scenarios=None,
+    cvar_alpha=None,
+    risk_weight=0.5,
+    seed=0,
+    show=True,
+    cache=True,
+):
+    """
+    optimises a squad that has already been fetched, which is what optimise does once it has the squad
+    :param next_gw - int: the first gameweek to optimise for
+    :param current_team_IDs - list<int>: the ids of the players in the current squad
+    :param in_the_bank - float: the money in the bank, in millions
+    All other parameters are as in optimise
+    """
 
-optimise(
-    352,
-    5,
-    future_gw_multiplier=0.9,
-)
+    assert cvar_alpha is None or scenarios, "cvar_alpha needs scenarios to be given"
+    assert not (chips and cvar_alpha), "chips can't be played with cvar_alpha"
+    assert all(next_gw <= gw < next_gw + num_gws for gw in chips.values()), "every chip must be played in a gameweek of the plan"
+    # the model counts gameweeks from 0
+    chip_weeks = {chip: gw - next_gw for chip, gw in chips.items()}
+    assert 0 <= risk_weight <= 1, "risk_weight must be between 0 and 1 inclusive"
+    limits = Limits(max_seconds, max_gap, max_nodes, on_incumbent)
+    profiling.phase("read")
+    df = read_players(filepath)
+
+    if not budget:
+        current_team = df[df.id.isin(current_team_IDs)]
+        budget = current_team.sale_value.sum() + in_the_bank
+
+    # find every player in in_team and out_team in one pass.
+    # note that a name shared by more than one player has to be replaced by the ID of the one you mean
+    profiling.phase("prune")
+    index = PlayerIndex(df)
+    selected = index.select(in_team=in_team, out_team=out_team)
+
+    # remove all players in out_team from dataframe
+    keep = ~index.mask(selected["out_team"])
+    pts_cols = [f"{next_gw + j}_pts" for j in range(num_gws)]
+    if scenarios:
+        # the scenarios are drawn for every player, so that the same seed draws the same points whatever is pruned
+        draws = sc.draw(df[pts_cols].to_numpy(dtype=float), sc.spread(df, pts_cols), scenarios, seed)
+
+    # remove players who are beaten on both cost and points by enough others that they can never be picked
+    if prune:
+        # the most transfers that can be made over the horizon, allowing for the cumulative limit
+        max_transfers = 15 if wildcard else free_transfers
+        if num_gws > 1:
+            max_transfers = num_gws - 1 + free_transfers
+        if formulation == "flow":
+            # a free transfer every week after the first, and every hit allowed on top. A wildcard squad is picked freely,
+            # as optimiser_preseason's first squad is
+            max_transfers = (0 if wildcard else free_transfers) + num_gws - 1 + (15 * num_gws if max_hits is None else max_hits)
+            # and a whole new squad for each wildcard or free hit, and the free hit squad back again
+            max_transfers += 15 * ("wildcard" in chips) + 30 * ("free_hit" in chips)
+        keep &= prune_players(
+            df,
+            # with the CVaR, a player has to be beaten in every scenario to be beaten on the objective
+            (draws.transpose(1, 0, 2).reshape(len(df), -1) if cvar_alpha else draws.mean(axis=0)) if scenarios else pts_cols,
+            "sale_value",
+            slots={"G": 2, "D": 5, "M": 5, "F": 3},
+            transfers=max_transfers,
+            max_from_team=max_from_team,
+            keep=index.mask(current_team_IDs) | index.mask(selected["in_team"]),
+            unavailable=~keep,
+        )
+
+    df = df[keep].reset_index(drop=True)
+    index = index.subset(df, keep)
+    groups = PlayerGroups(df)
+    sale_value = df.sale_value.to_numpy()
+    in_current = index.mask(current_team_IDs)
+    current_rows = np.flatnonzero(in_current)
+    in_team_rows = index.rows(selected["in_team"])
+
+    pts = df[pts_cols].to_numpy()
+    if scenarios:
+        draws = draws[:, keep]
+        pts = draws.mean(axis=0)
+    profiling.phase("build")
+    model, x, y, z = build_model(
+        groups,
+        sale_value,
+        pts,
+        budget,
+        current_rows,
+        free_transfers,
+        wildcard,
+        in_team_rows,
+        bench_strength,
+        future_gw_multiplier,
+        max_from_team,
+        assembly,
+        formulation,
+        hit_cost,
+        max_hits,
+        chip_weeks,
+        # the CVaR's scenario rows would let a continuous starting 11 and captain be fractional
+        integer_lineups=bool(cvar_alpha),
+    )
+    gw_weights = future_gw_multiplier ** np.arange(num_gws)
+    if cvar_alpha:
+        # each scenario's objective is the average objective plus how far each player's points are from their average
+        deviations = sc.deviations(draws, pts, bench_strength, gw_weights)
+        variables = [var for j in range(num_gws) for var in y[j] + z[j] + x[j]]
+        cvar = sc.add_cvar(model, variables, deviations, model.objective, cvar_alpha)
+        model.objective = maximize((1 - risk_weight) * model.objective + risk_weight * cvar)
+    cols = [columns(var) for var in (x, y, z)]
+
+    def plan_ids(plan):
+        """returns a plan of squads as a dict of gameweek to the ids of that gameweek's squad"""
+        return {next_gw + gw: df.id.to_numpy()[squad].tolist() for gw, squad in enumerate(plan)}
+
+    # warm start from the previously saved plan, or failing that from keeping the current squad every week.
+    # With limits, keeping the current squad is a plan to fall back on if they stop the search before it finds one,
+    # which the solver doesn't always return itself when its time runs out before it has solved the root LP
+    fallback = None
+    if plan_file or limits.given:
+        profiling.phase("warm start")
+        hold = np.zeros((num_gws, len(df)), dtype=bool)
+        hold[:, current_rows] = True
+        starts = [("current squad", hold)]
+        if plan_file and os.path.exists(plan_file):
+            try:
+                starts.insert(0, ("saved plan", shift_plan(load_plan(plan_file), df.id.to_numpy(), next_gw, num_gws)))
+            except KeyError as e:
+                print(f"Can't warm start from the saved plan: player {e} is no longer available")
+
+        for name, plan in starts:
+            reason = check_plan(
+                plan, groups, sale_value, budget, current_rows, free_transfers, wildcard, in_team_rows, max_from_team, formulation, max_hits, chip_weeks
+            )
+            if reason is None:
+                print(f"Warm starting from the {name}")
+                # the solver works out the transfer variables of the flow formulation from the squads
+                model.start = mip_start(plan, groups, pts, x, y, z)
+                lineups = plan_lineups(plan, groups, pts)
+                penalty = 0
+                if formulation == "flow":
+                    hits = transfer_hits(plan, current_rows, free_transfers, wildcard, chip_weeks)[1]
+                    penalty = hit_cost * (1 - bench_strength) * hits @ gw_weights
+                if cvar_alpha:
+                    scores = sc.lineup_scores(draws, *lineups, bench_strength, gw_weights) - penalty
+                    objective = float(sc.blended(scores[:, None], cvar_alpha, risk_weight)[0])
+                else:
+                    objective = sum(var.obj * value for var, value in model.start) - penalty
+                fallback = lineups, objective
+                limits.offer(fallback[1], None, lambda: plan_ids(plan))
+                break
+            print(f"Can't warm start from the {name}: {reason}")
+
+    # find an optimal solution and print it
+    profiling.phase("solve")
+    solved = limits.optimize(model, lambda: plan_ids(read_binary(model, cols[0])[0]))
+    profiling.solved(model)
+    assert solved or fallback, "no plan was found that meets every constraint within the limits"
+    profiling.phase("extract")
+    if solved:
+        solve = limits.outcome(model)
+        x, y, z = read_binary(model, *cols)
+    else:
+        (x, y, z), objective = fallback
+        solve = {"status": "FEASIBLE", "objective": objective, "bound": None, "gap": None}
+    profiling.phase("output")
+    # only the flow formulation can take hits
+    hits = transfer_hits(x, current_rows, free_transfers, wildcard, chip_weeks)[1] if formulation == "flow" else None
+    optimised = plan_result(df, next_gw, x, y, z, solve["objective"], "sale_value", current_rows, hits, hit_cost, chip_weeks)
+    if show:
+        optimised.show()
+    if limits.given:
+        mark(optimised, solve)
+
+    if plan_file:
+        profiling.phase("save plan")
+        save_plan(plan_file, next_gw, df.id.to_numpy(), x, y, z)
+    return optimised
+
+
+if __name__ == "__main__":
+    # pass --profile to write how long each phase of the run took, and the solver's statistics, as json
+    with profiling.profile_from_args():
+        optimise(
+            352,
+            5,
+            future_gw_multiplier=0.9,
+        )
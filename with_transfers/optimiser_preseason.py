@@ -1,124 +1,112 @@
-from mip import BINARY, Model, maximize, xsum
-import pandas as pd
-import unicodedata
+from mip import BINARY, CONTINUOUS, GREATER_OR_EQUAL, Model, maximize, xsum
+import numpy as np
+import os
+import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from heuristic import SQUAD_COUNTS, SquadProblem
+from limits import Limits, mark
+from model_builder import (
+    PlayerGroups,
+    PlayerIndex,
+    add_symmetry_breaking,
+    add_team_constraints,
+    add_transfer_flow,
+    identical_pairs,
+    linear_sum,
+)
+from player_data import read_players
+import profiling
+from pruning import prune_players
+from result_cache import cached
+from results import columns, plan_result, read_binary
+from sparse_model import build_squad_plan
+from warm_start import mip_start, plan_lineups, transfer_hits
 
-def optimise(
-    start_gw,
-    end_gw,
-    filepath="cleaned_data.csv",
+
+def build_model(
+    groups,
+    value,
+    pts,
     budget=100,
-    in_team=[],
-    out_team=[],
+    in_team_rows=[],
     bench_strength=0.1,
     future_gw_multiplier=1,
     max_from_team=3,
+    assembly="expr",
+    current_rows=None,
+    banked_transfers=0,
+    formulation="overlap",
+    hit_cost=4,
+    max_hits=0,
 ):
     """
-    :param start_gw - int: the first gameweek in the range of gameweeks you want to optimise for
-    :param end_gw - int: the last gameweek in the range of gameweeks you want to optimise for
-    :param filepath - str: the filepath that points to the csv that contains the data you want to optimise
-    :param budget - int or float: the maximum sum of costs allowed in the optimised 15 man squad
-    :param in_team - list<int or str>: list of players that must be included in the optimised 15 man squad for every gameweek
-    :param out_team - list<int or str>: list of players that must never be included in the optimised 15 man squad
-    :param bench_strength - float: a number between 0 and 1 inclusive that denotes how much to take the bench into account when optimising the squad
-    :param future_gw_multiplier - float: a number between 0 and 1 inclusive that denotes how much importance to give to future gameweeks
-        i.e. gw1 has multiplier x**0 = 1, gw2 has multiplier x**1 = x, gw3 has multiplier x**2, etc. Lower number = more emphasis on closer gws
-    :param max_from_team - int: maximum number of players allowed from a single team
+    builds the multi-gameweek model and returns it along with its x, y and z variables, indexed [gw][player]
+    :param groups - PlayerGroups: the indexed player pool
+    :param value - array<float>: the cost of each player
+    :param pts - array<float>: the points of each player, one column per gameweek
+    :param in_team_rows - list<int>: rows of players that must be in the squad for every gameweek
+    :param assembly - str: "expr" adds every constraint to the model as a mip expression,
+        "sparse" assembles the model as numpy arrays and loads it into the solver in bulk from an MPS file
+    :param current_rows - array<int>: rows of the squad picked for the gameweek before the first one in pts, when continuing
+        an earlier plan. If left blank, the first gameweek's squad can be picked freely
+    :param banked_transfers - int: how far the earlier plan is below the limit of n transfers after n gameweeks,
+        which is how many transfers can be made before the first gameweek in pts, to a maximum of 2.
+        With the flow formulation, this is the number of free transfers available before the first gameweek
+    :param formulation - str: "overlap" or "flow", as in with_transfers/optimiser.py's build_model()
+    :param hit_cost - float: the points that each hit costs with the flow formulation
+    :param max_hits - int: the most hits that can be taken over the horizon with the flow formulation. If None, there is no limit
     """
+    I = range(groups.n)
+    num_gameweeks = pts.shape[1]
+    assert formulation in ["overlap", "flow"], "formulation must be either overlap or flow"
 
-    def remove_accents(input_str):
-        """a function that removes all diacritics from latin characters"""
-        nfkd_form = unicodedata.normalize("NFKD", input_str)
-        return "".join([c for c in nfkd_form if not unicodedata.combining(c)])
-
-    def print_dfs():
-        """prints out the optimised squads and transfers in an easy to read format"""
-        total_starting_pts, total_bench_pts = 0, 0
-        for gw in range(num_gameweeks):
-            i_start = [i for i in I if y[gw][i].x == 1]
-            starting = df.iloc[i_start].copy()
-            starting.pos = pd.Categorical(starting.pos, categories=["G", "D", "M", "F"])
-            starting = starting.sort_values(
-                by=["pos", f"{start_gw + gw}_pts"], ascending=[True, False]
-            )
-
-            i_bench = [i for i in I if x[gw][i].x == 1 and y[gw][i].x == 0]
-            bench = df.iloc[i_bench].copy()
-            sorted_bench = pd.concat(
-                [
-                    bench.loc[bench.pos == "G"],
-                    bench.loc[bench.pos != "G"].sort_values(
-                        by=f"{start_gw + gw}_pts", ascending=False
-                    ),
-                ]
-            )
-
-            captain_i = [i for i in I if z[gw][i].x == 1][0]
-            starting.loc[captain_i, "name"] += " (c)"
-            starting.loc[captain_i, f"{start_gw + gw}_pts"] *= 2
-
-            result = pd.concat([starting, sorted_bench])
-            result = result.reset_index(drop=True)
-            result.index += 1
-
-            total_starting_pts += starting[f"{start_gw + gw}_pts"].sum()
-            total_bench_pts += bench[f"{start_gw + gw}_pts"].sum()
-
-            # prints out full points dataframe for each gameweek - could easily be changed later
-            print(f"GW {gw + start_gw}")
-            print(
-                result.loc[
-                    :,
-                    ["id", "team", "pos", "name", "cost"]
-                    + [f"{start_gw+x}_pts" for x in range(num_gameweeks)],
-                ]
-            )
-            print(f"\nCost: £{result.cost.sum()}m")
-            print(
-                f"Points: {starting[f'{start_gw + gw}_pts'].sum():.2f} (+{bench[f'{start_gw + gw}_pts'].sum():.2f} on the bench)\n\n"
-            )
-
-            if gw != num_gameweeks - 1:
-                t_in = df.iloc[
-                    [i for i in I if x[gw + 1][i].x == 1 and x[gw][i].x == 0]
-                ]
-                t_out = df.iloc[
-                    [i for i in I if x[gw][i].x == 1 and x[gw + 1][i].x == 0]
-                ]
-                if len(t_out) > 0:
-                    [print(f"OUT: {t_out.name.iloc[j]}") for j in range(len(t_out))]
-                    [print(f"IN: {t_in.name.iloc[j]}") for j in range(len(t_in))]
-                    print("\n")
-
-        print(
-            f"Total points from GW {start_gw}-{end_gw}: {total_starting_pts:.2f} (+{total_bench_pts:.2f} on the bench)\n\n"
+    if assembly == "sparse":
+        sm, *cols = build_squad_plan(
+            groups,
+            value,
+            pts,
+            budget,
+            max_from_team=max_from_team,
+            bench_strength=bench_strength,
+            future_gw_multiplier=future_gw_multiplier,
+            in_team_rows=in_team_rows,
+            current_rows=current_rows,
+            free_transfers=banked_transfers,
+            formulation=formulation,
+            hit_cost=hit_cost,
+            max_hits=max_hits,
         )
+        if current_rows is not None and formulation == "overlap":
+            # the squad can still only change by 2 players when a lot of transfers are banked
+            profiling.family(sm, "transfers")
+            sm.add_constrs(np.zeros(len(current_rows)), cols[0][0, current_rows], 1.0, GREATER_OR_EQUAL, 13, 1)
+            profiling.family(sm, None)
+        model = sm.to_mip()
+        x, y, z = [[[model.vars[j] for j in row] for row in c.tolist()] for c in cols]
+        return model, x, y, z
 
-    num_gameweeks = end_gw - start_gw + 1
-    df = pd.read_csv(filepath)
-
-    # remove all players in out_team from dataframe
-    for player in out_team:
-        if isinstance(player, str):
-            player = remove_accents(player.lower())
-            df = df[df.name.apply(lambda x: remove_accents(x.lower())) != player]
-        elif isinstance(player, int):
-            df = df[df.id != player]
-
-    I = range(len(df))
-    df = df.reset_index(drop=True)
     model = Model()
 
     x = []  # players in 15-man squad
     y = []  # players in starting 11
     z = []  # player chosen as captain
     both = []  # players in both 15 man squads between 2 gameweeks
+    num_transfers = []  # number of transfers made between 2 gameweeks
+
+    rules = {
+        "DEF": [3, 5],
+        "MID": [2, 5],
+        "FWD": [1, 3],
+    }
 
+    # the best starting 11 and captain of a squad is a flow problem, so once the squads are integer they are too
+    lineup_type = CONTINUOUS if formulation == "flow" else BINARY
     for a in range(num_gameweeks):
+        profiling.family(model, "squad")
         x.append([model.add_var(var_type=BINARY) for i in I])
-        y.append([model.add_var(var_type=BINARY) for i in I])
-        z.append([model.add_var(var_type=BINARY) for i in I])
+        y.append([model.add_var(var_type=lineup_type, ub=1) for i in I])
+        z.append([model.add_var(var_type=lineup_type, ub=1) for i in I])
 
         # ensure captain is a subset of the starting xi, which is itself a subset of the 15 man squad
         for i in I:
@@ -126,92 +114,399 @@ def optimise(
             model += y[a][i] <= x[a][i]
 
         # add budget constraint
-        model += xsum(df.cost[i] * x[a][i] for i in I) <= budget
+        profiling.family(model, "budget")
+        model += linear_sum(x[a], coeffs=value) <= budget
 
         # add positional and teamsize constraints
-        model += xsum(x[a][i] for i in I if df.pos[i] == "G") == 2
-        model += xsum(y[a][i] for i in I if df.pos[i] == "G") == 1
-
-        rules = {
-            "DEF": [3, 5],
-            "MID": [2, 5],
-            "FWD": [1, 3],
-        }
+        profiling.family(model, "position")
+        model += linear_sum(x[a], groups.pos_rows["G"]) == 2
+        model += linear_sum(y[a], groups.pos_rows["G"]) == 1
+
         for pos in ["DEF", "MID", "FWD"]:
-            model += xsum(x[a][i] for i in I if df.pos[i] == pos[0]) == rules[pos][1]
-            model += (
-                rules[pos][0]
-                <= xsum(y[a][i] for i in I if df.pos[i] == pos[0])
-                <= rules[pos][1]
-            )
+            rows = groups.pos_rows[pos[0]]
+            model += linear_sum(x[a], rows) == rules[pos][1]
+            model += linear_sum(y[a], rows) >= rules[pos][0]
+            model += linear_sum(y[a], rows) <= rules[pos][1]
 
         # 15 in entire squad, 11 in starting squad, 1 captain
-        model += xsum(x[a][i] for i in I) == 15
-        model += xsum(y[a][i] for i in I) == 11
-        model += xsum(z[a][i] for i in I) == 1
+        profiling.family(model, "squad")
+        model += linear_sum(x[a]) == 15
+        model += linear_sum(y[a]) == 11
+        model += linear_sum(z[a]) == 1
 
         # add max_from_team constraint
-        for team in df.team.unique():
-            model += xsum(x[a][i] for i in I if df.team[i] == team) <= max_from_team
+        profiling.family(model, "team")
+        add_team_constraints(model, x[a], groups, max_from_team)
 
     # add in_team constraints
-    for player in in_team:
-        if isinstance(player, str):
-            player = remove_accents(player.lower())
-            ind = df.index[df.name.apply(lambda x: remove_accents(x.lower())) == player]
-            if len(ind) != 1:
-                print(
-                    f"There is more than one player with the name {player}. Specify which one you mean by using their ID instead."
-                )
-                return
-        elif isinstance(player, int):
-            ind = df.index[df.id == player]
-
+    profiling.family(model, "locks")
+    for i in in_team_rows:
         for gw in range(num_gameweeks):
-            model += x[gw][ind[0]] == 1
+            model += x[gw][i] == 1
+
+    # continue on from the squad picked in the previous gameweek
+    profiling.family(model, "transfers")
+    kept, hits = 15, {}
+    if formulation == "flow":
+        hits = add_transfer_flow(model, x, current_rows, banked_transfers, max_hits=max_hits)
+        profiling.family(model, "symmetry")
+        fixed_rows = np.append(in_team_rows, [] if current_rows is None else current_rows).astype(np.int64)
+        add_symmetry_breaking(model, identical_pairs(groups, value, pts, fixed_rows), x, y, z)
+    elif current_rows is not None:
+        kept = linear_sum(x[0], current_rows)
+        model += kept >= max(13, 15 - banked_transfers)
 
-    # add constraint that says that a maximum of 2 transfers can be made between gameweeks
-    # TODO: remove this constraint and take it into account in the objective function instead
-    for a in range(num_gameweeks - 1):
+    # add constraint that says that a maximum of 2 transfers can be made between gameweeks.
+    # The flow formulation charges for every transfer beyond the free ones instead
+    for a in range(num_gameweeks - 1 if formulation == "overlap" else 0):
         both.append([model.add_var(var_type=BINARY) for i in I])
-        model += xsum(both[a][i] for i in I) >= 13
+        model += linear_sum(both[a]) >= 13
         for i in I:
             model += x[a][i] >= both[a][i]
             model += x[a + 1][i] >= both[a][i]
 
-        # maximum of n transfers after n gameweeks
-        model += xsum(15 - xsum(both[k][i] for i in I) for k in range(a + 1)) <= a + 1
+        # keep a running count of transfers so the cumulative constraint below doesn't grow with the horizon
+        num_transfers.append(model.add_var())
+        model += num_transfers[a] == 15 - linear_sum(both[a])
+
+        # maximum of n transfers after n gameweeks, including any made since the previous gameweek
+        model += xsum(num_transfers[k] for k in range(a + 1)) + 15 - kept <= a + 1 + banked_transfers
 
     # add the objective function
-    model.objective = maximize(
-        xsum(
-            [
-                future_gw_multiplier ** j
-                * (
-                    (1 - bench_strength)
-                    * (
-                        xsum(df[f"{start_gw + j}_pts"][i] * y[j][i] for i in I)
-                        + xsum(df[f"{start_gw + j}_pts"][i] * z[j][i] for i in I)
-                    )
-                    + bench_strength
-                    * (
-                        xsum(df[f"{start_gw + j}_pts"][i] * x[j][i] for i in I)
-                        - xsum(df[f"{start_gw + j}_pts"][i] * y[j][i] for i in I)
-                    )
-                )
-                for j in range(num_gameweeks)
-            ]
+    objective = []
+    for j in range(num_gameweeks):
+        weight = future_gw_multiplier ** j
+        objective.append(
+            linear_sum(y[j], coeffs=weight * (1 - 2 * bench_strength) * pts[:, j])
+            + linear_sum(z[j], coeffs=weight * (1 - bench_strength) * pts[:, j])
+            + linear_sum(x[j], coeffs=weight * bench_strength * pts[:, j])
         )
+        if j in hits:
+            # a hit costs as much as hit_cost points scored by a starter
+            objective.append(-weight * hit_cost * (1 - bench_strength) * hits[j])
+    model.objective = maximize(xsum(objective))
+    profiling.family(model, None)
+
+    return model, x, y, z
+
+
+def plan_objective(pts, x, y, z, bench_strength=0.1, future_gw_multiplier=1, hits=0, hit_cost=4):
+    """
+    returns the value of build_model's objective for a plan given as (num_gws, num_players) arrays of x, y and z
+    :param hits - array<int>: the hits taken before each gameweek, as returned by warm_start.transfer_hits()
+    """
+    weight = future_gw_multiplier ** np.arange(pts.shape[1])
+    per_gw = (
+        (1 - 2 * bench_strength) * (y * pts.T).sum(axis=1)
+        + (1 - bench_strength) * (z * pts.T).sum(axis=1)
+        + bench_strength * (x * pts.T).sum(axis=1)
+        - hit_cost * (1 - bench_strength) * np.asarray(hits)
     )
+    return float(weight @ per_gw)
+
+
+def held_plan(groups, value, pts, budget=100, in_team_rows=[], max_from_team=3):
+    """
+    returns a plan that keeps the same squad for every gameweek, picked by the heuristic on each player's total points,
+    as a boolean (num_gws, num_players) array, or None if the heuristic can't find a valid squad.
+    All parameters are as in build_model()
+    """
+    problem = SquadProblem(
+        groups.pos_codes,
+        groups.team_codes,
+        value,
+        pts.sum(axis=1),
+        budget,
+        SQUAD_COUNTS,
+        SQUAD_COUNTS,
+        15,
+        max_from_team,
+        forced=np.asarray(in_team_rows, dtype=np.int64),
+        available=np.ones(groups.n, dtype=bool),
+    )
+    squad, _ = problem.search()
+    if squad is None:
+        return None
+    plan = np.zeros((pts.shape[1], groups.n), dtype=bool)
+    plan[:, squad] = True
+    return plan
+
+
+def rolling_horizon(
+    groups,
+    value,
+    pts,
+    window,
+    overlap=1,
+    window_seconds=None,
+    budget=100,
+    in_team_rows=[],
+    bench_strength=0.1,
+    future_gw_multiplier=1,
+    max_from_team=3,
+    assembly="expr",
+    limits=None,
+    formulation="overlap",
+    hit_cost=4,
+    max_hits=0,
+):
+    """
+    plans the whole horizon by solving overlapping windows of gameweeks in turn. After each window is solved,
+    the gameweeks before the overlap are fixed and the next window starts from the last fixed squad.
+    returns the plan as boolean (num_gws, num_players) arrays of x, y and z
+    :param window - int: the number of gameweeks in each window
+    :param overlap - int: the number of gameweeks at the end of each window that are solved again by the next window
+    :param window_seconds - float: the time limit for solving each window. If left blank, each window is solved to optimality
+    :param limits - Limits: the limits on the whole plan, with max_seconds covering every window.
+        If a window runs out of time before a plan is found for it, its squad is kept for the rest of the window
+    :param max_hits - int: the most hits that can be taken over the whole horizon, rather than in each window
+    All other parameters are as in build_model()
+    """
+    assert 0 <= overlap < window, "overlap must be at least 0 and less than window"
+    limits = limits or Limits()
+    num_gameweeks = pts.shape[1]
+    x, y, z = [np.zeros((num_gameweeks, groups.n), dtype=bool) for _ in range(3)]
+    start, current_rows, used = 0, None, 0
+    while start < num_gameweeks:
+        end = min(start + window, num_gameweeks)
+        banked, hits_left = start - used, max_hits
+        if formulation == "flow" and start > 0:
+            # carry on with the free transfers and hits that the fixed gameweeks have left
+            _, hits, banked = transfer_hits(x[:start])
+            hits_left = None if max_hits is None else max_hits - hits.sum()
+        profiling.phase("build")
+        model, wx, wy, wz = build_model(
+            groups,
+            value,
+            pts[:, start:end],
+            budget,
+            in_team_rows,
+            bench_strength,
+            future_gw_multiplier,
+            max_from_team,
+            assembly,
+            current_rows,
+            banked,
+            formulation,
+            hit_cost,
+            hits_left,
+        )
+
+        # keeping the previous squad is always feasible, so there is a solution to fall back on within the time limit
+        hold = None
+        if current_rows is not None:
+            hold = np.zeros((end - start, groups.n), dtype=bool)
+            hold[:, current_rows] = True
+        elif limits.given:
+            hold = held_plan(groups, value, pts[:, start:end], budget, in_team_rows, max_from_team)
+        if hold is not None:
+            model.start = mip_start(hold, groups, pts[:, start:end], wx, wy, wz)
+
+        profiling.phase("solve")
+        solved = limits.optimize(model, max_seconds=window_seconds)
+        profiling.solved(model)
+        assert solved or hold is not None, f"no plan was found for weeks {start + 1}-{end} of the horizon"
+        if solved:
+            print(f"Solved weeks {start + 1}-{end} of {num_gameweeks}: {model.status.name.lower()}, objective {model.objective_value:.2f}\n")
+        else:
+            print(f"Ran out of time on weeks {start + 1}-{end} of {num_gameweeks} before finding a plan, so the squad is kept\n")
+
+        profiling.phase("extract")
+        if solved:
+            window_plan = read_binary(model, *[columns(var) for var in (wx, wy, wz)])
+        else:
+            window_plan = plan_lineups(hold, groups, pts[:, start:end])
+        fixed = num_gameweeks - start if end == num_gameweeks else window - overlap
+        for gw in range(fixed):
+            for plan, solution in zip((x, y, z), window_plan):
+                plan[start + gw] = solution[gw]
+            if start + gw > 0:
+                used += 15 - (x[start + gw] & x[start + gw - 1]).sum()
+        start += fixed
+        current_rows = np.flatnonzero(x[start - 1])
+
+    return x, y, z
+
+
+@profiling.instrumented("preseason")
+@cached("preseason")
+def optimise(
+    start_gw,
+    end_gw,
+    filepath="cleaned_data.csv",
+    budget=100,
+    in_team=[],
+    out_team=[],
+    bench_strength=0.1,
+    future_gw_multiplier=1,
+    max_from_team=3,
+    assembly="expr",
+    formulation="overlap",
+    hit_cost=4,
+    max_hits=0,
+    prune=True,
+    window=None,
+    overlap=1,
+    window_seconds=None,
+    max_seconds=None,
+    max_gap=None,
+    max_nodes=None,
+    on_incumbent=None,
+    show=True,
+    cache=True,
+):
+    """
+    :param start_gw - int: the first gameweek in the range of gameweeks you want to optimise for
+    :param end_gw - int: the last gameweek in the range of gameweeks you want to optimise for
+    :param filepath - str or DataFrame: the filepath that points to the csv that contains the data you want to optimise,
+        or a dataframe that has already been read from it. If the .npz file written alongside the csv is up to date, it is used instead
+    :param budget - int or float: the maximum sum of costs allowed in the optimised 15 man squad
+    :param in_team - list<int or str>: list of players that must be included in the optimised 15 man squad for every gameweek
+    :param out_team - list<int or str>: list of players that must never be included in the optimised 15 man squad
+    :param bench_strength - float: a number between 0 and 1 inclusive that denotes how much to take the bench into account when optimising the squad
+    :param future_gw_multiplier - float: a number between 0 and 1 inclusive that denotes how much importance to give to future gameweeks
+        i.e. gw1 has multiplier x**0 = 1, gw2 has multiplier x**1 = x, gw3 has multiplier x**2, etc. Lower number = more emphasis on closer gws
+    :param max_from_team - int: maximum number of players allowed from a single team
+    :param assembly - str: "expr" to build the model one expression at a time, or "sparse" to assemble it
+        with numpy and load it into the solver in bulk, which is quicker and uses less memory on long horizons
+    :param formulation - str: "overlap" to allow at most 2 transfers each week and n after n weeks, or "flow" to roll
+        free transfers over from week to week, up to 2, and allow hits. See with_transfers/optimiser.py's build_model()
+    :param hit_cost - float: the points that each transfer beyond the free ones costs with the flow formulation
+    :param max_hits - int: the most hits that can be taken over the horizon with the flow formulation. If None, there is no limit,
+        but fewer players can be pruned
+    :param prune - bool: denotes whether to remove players who can never be in an optimised squad before building the model
+    :param window - int: if given, the plan is built by solving windows of this many gameweeks in turn instead of the whole range at once,
+        which keeps the model small enough to plan a full season. The plan's objective is then compared to the LP bound of the full model
+    :param overlap - int: the number of gameweeks at the end of each window that are solved again as part of the next window
+    :param window_seconds - float: the time limit for solving each window. If left blank, each window is solved to optimality
+    :param max_seconds - float: the most time the call can take, after which the best plan found so far is returned.
+        The solve starts from a squad picked by the heuristic and kept for every gameweek, so there is always a plan to return.
+        A plan that hasn't been proved optimal is marked as such in its solve attribute, see limits.py
+    :param max_gap - float: stop once the best plan is within this fraction of the bound on the best objective
+    :param max_nodes - int: the most branch and bound nodes to search in each solve
+    :param on_incumbent - function: called as on_incumbent(objective, bound, plan) with each better plan found,
+        where plan is a dict of gameweek to the ids of that gameweek's squad
+    :param show - bool: denotes whether to print the plan. Pass False to only return it
+    :param cache - bool: denotes whether to return the result of an earlier call with the same data and arguments if there is one,
+        and to keep this call's result for later calls. Pass False to always solve the model
+
+    returns the optimised plan as a PlanResult, holding the squad, starting 11, captain and transfers for each gameweek.
+    Its squads are a dict of gameweek to that gameweek's squad as a dataframe, with the starting 11 first. See results.py
+    """
+
+    def plan_ids(plan):
+        """returns a plan of squads as a dict of gameweek to the ids of that gameweek's squad"""
+        return {start_gw + gw: df.id.to_numpy()[squad].tolist() for gw, squad in enumerate(plan)}
+
+    limits = Limits(max_seconds, max_gap, max_nodes, on_incumbent)
+    num_gameweeks = end_gw - start_gw + 1
+    profiling.phase("read")
+    df = read_players(filepath)
+
+    # find every player in in_team and out_team in one pass.
+    # note that a name shared by more than one player has to be replaced by the ID of the one you mean
+    profiling.phase("prune")
+    index = PlayerIndex(df)
+    selected = index.select(in_team=in_team, out_team=out_team)
+
+    # remove all players in out_team from dataframe
+    keep = ~index.mask(selected["out_team"])
+
+    # remove players who are beaten on both cost and points by enough others that they can never be picked
+    if prune:
+        keep &= prune_players(
+            df,
+            [f"{start_gw + j}_pts" for j in range(num_gameweeks)],
+            "cost",
+            slots={"G": 2, "D": 5, "M": 5, "F": 3},
+            # a free transfer every week after the first, and every hit allowed on top
+            transfers=num_gameweeks - 1 + (0 if formulation == "overlap" else 15 * num_gameweeks if max_hits is None else max_hits),
+            max_from_team=max_from_team,
+            keep=index.mask(selected["in_team"]),
+            unavailable=~keep,
+        )
+
+    df = df[keep].reset_index(drop=True)
+    index = index.subset(df, keep)
+    groups = PlayerGroups(df)
+    in_team_rows = index.rows(selected["in_team"])
+
+    value = df.cost.to_numpy()
+    pts = df[[f"{start_gw + j}_pts" for j in range(num_gameweeks)]].to_numpy()
+    settings = (budget, in_team_rows, bench_strength, future_gw_multiplier, max_from_team)
+    transfer_rules = {"formulation": formulation, "hit_cost": hit_cost, "max_hits": max_hits}
+
+    def plan_hits(x):
+        """returns the hits a plan takes before each gameweek, which only the flow formulation can take"""
+        return transfer_hits(x)[1] if formulation == "flow" else np.zeros(len(x), dtype=np.int64)
+
+    def objective_of(x, y, z):
+        """returns the objective of a plan, including the cost of any hits it takes"""
+        return plan_objective(pts, x, y, z, bench_strength, future_gw_multiplier, plan_hits(x), hit_cost)
+
+    def result_of(x, y, z, objective):
+        """returns a plan as a PlanResult, printing it unless show is False"""
+        result = plan_result(df, start_gw, x, y, z, objective, "cost", hits=plan_hits(x), hit_cost=hit_cost)
+        if show:
+            result.show()
+        return result
+
+    if window and window < num_gameweeks:
+        x, y, z = rolling_horizon(groups, value, pts, window, overlap, window_seconds, *settings, assembly, limits, **transfer_rules)
+        objective = objective_of(x, y, z)
+        profiling.phase("output")
+        plan = result_of(x, y, z, objective)
+
+        # the LP relaxation is cheap even when the full model is too big to solve, so use it to judge the plan
+        profiling.phase("bound")
+        model = build_model(groups, value, pts, *settings, assembly="sparse", **transfer_rules)[0]
+        model.verbose = 0
+        model.optimize(relax=True)
+        profiling.solved(model, relax=True)
+        bound = model.objective_value
+        # as mip measures the gap, so that a bound of 0 doesn't divide by 0
+        gap = (bound - objective) / max(abs(bound), 1e-10)
+        print(f"Rolling horizon objective: {objective:.2f}, full model LP bound: {bound:.2f} (gap {gap:.2%})\n")
+        limits.offer(objective, bound, lambda: plan_ids(x))
+        if limits.given:
+            # the gap has already been printed, and a rolling horizon plan is never proved optimal
+            mark(plan, {"status": "FEASIBLE", "objective": objective, "bound": bound, "gap": gap}, warn=False)
+        return plan
 
     # find an optimal solution and print it
-    model.optimize()
-    print_dfs()
+    profiling.phase("build")
+    model, x, y, z = build_model(groups, value, pts, *settings, assembly, **transfer_rules)
+    cols = [columns(var) for var in (x, y, z)]
+    hold = held_plan(groups, value, pts, *settings[:2], max_from_team) if limits.given else None
+    if hold is not None:
+        # a plan to fall back on if the limits stop the search before it finds one
+        fallback = plan_lineups(hold, groups, pts)
+        model.start = mip_start(hold, groups, pts, x, y, z)
+        limits.offer(objective_of(*fallback), None, lambda: plan_ids(hold))
+    profiling.phase("solve")
+    solved = limits.optimize(model, lambda: plan_ids(read_binary(model, cols[0])[0]))
+    profiling.solved(model)
+    assert solved or hold is not None, "no plan was found that meets every constraint within the limits"
+    profiling.phase("extract")
+    if solved:
+        solve = limits.outcome(model)
+        x, y, z = read_binary(model, *cols)
+    else:
+        x, y, z = fallback
+        solve = {"status": "FEASIBLE", "objective": objective_of(x, y, z), "bound": None, "gap": None}
+    profiling.phase("output")
+    plan = result_of(x, y, z, solve["objective"])
+    if limits.given:
+        mark(plan, solve)
+    return plan
 
 
-optimise(
-    start_gw=1,
-    end_gw=5,
-    # in_team=["werner", "salah"],
-    # out_team=["vinagre", "nyland", 451],
-)
+if __name__ == "__main__":
+    # pass --profile to write how long each phase of the run took, and the solver's statistics, as json
+    with profiling.profile_from_args():
+        optimise(
+            start_gw=1,
+            end_gw=5,
+            # in_team=["werner", "salah"],
+            # out_team=["vinagre", "nyland", 451],
+        )